@@ -3,11 +3,24 @@ from __future__ import annotations
 from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING
 
-from beanie import init_beanie
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
 
-from api import apartments
+from api import (
+    apartments,
+    bulk,
+    cache,
+    export,
+    feed,
+    geo,
+    history,
+    metrics,
+    search,
+    stats,
+)
+from api.indexes import ensure_indexes
+from shared import broadcast, connections, odm
+from shared import history as shared_history
+from shared import rollups
 from shared.odm import ApartmentBeanie
 from shared.settings import Settings
 
@@ -23,11 +36,27 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     https://fastapi.tiangolo.com/advanced/events/#lifespan
     """
     settings = Settings()
-    mongo_client = AsyncIOMotorClient(settings.MONGO_URL)
+    mongo_client = connections.mongo_client(settings)
     database = mongo_client[settings.MONGO_DATABASE]
-    await init_beanie(database=database, document_models=[ApartmentBeanie])  # type: ignore[arg-type]
+    await odm.init(database)
+    await ensure_indexes(ApartmentBeanie.get_motor_collection())
+    await shared_history.ensure_collection(database, settings.MONGO_HISTORY_COLLECTION)
+    stats_collection = database[settings.MONGO_STATS_COLLECTION]
+    response_cache = cache.ResponseCache.from_settings(
+        settings, lambda: rollups.generation(stats_collection)
+    )
+    app.state.response_cache = response_cache
+    app.state.broadcaster = broadcast.Broadcaster(
+        await broadcast.source(
+            database, settings.MONGO_COLLECTION, settings.FEED_POLL_INTERVAL
+        ),
+        buffer_size=settings.FEED_BUFFER_SIZE,
+    )
     yield
-    mongo_client.close()
+    await app.state.broadcaster.close()
+    if response_cache is not None:
+        await response_cache.close()
+    connections.close_mongo_client(mongo_client)
 
 
 app = FastAPI(
@@ -35,6 +64,9 @@ app = FastAPI(
     description="Simple CRUD API for scraped apartments",
     lifespan=lifespan,
 )
+# NOTE: the last added is the outermost one, latency of cache hits is measured too
+app.add_middleware(cache.ResponseCacheMiddleware)
+app.add_middleware(metrics.LatencyMiddleware)
 
 
 @app.get("/")
@@ -42,4 +74,13 @@ async def index() -> str:
     return "It works!"
 
 
+app.include_router(metrics.router)
+# NOTE: static paths first, otherwise `/apartments/{id}` would shadow them
+app.include_router(bulk.router)
+app.include_router(export.router)
+app.include_router(feed.router)
+app.include_router(geo.router)
+app.include_router(history.router)
+app.include_router(search.router)
+app.include_router(stats.router)
 app.include_router(apartments.router)
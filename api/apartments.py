@@ -1,52 +1,111 @@
 from __future__ import annotations
 
-import logging
 from collections.abc import Sequence
 from typing import Literal, cast
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException
-
-from shared.models import Apartment, Source
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from api.filters import (
+    VIEW,
+    ApartmentFilter,
+    ExcludableField,
+    Pagination,
+    View,
+    projection,
+    render,
+)
+from api.history import record as record_history
+from api.responses import RawJSONResponse
+from shared import writes
+from shared.models import Apartment, ApartmentSummary, Source
 from shared.odm import ApartmentBeanie
 
 # NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
 
 
-logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/apartments", tags=["Apartments"])
 
 
-# TODO: filtering
-@router.get("", summary="Get all apartments")
-async def list_() -> Sequence[Apartment]:
-    return await ApartmentBeanie.find_all().to_list()
+@router.get(
+    "",
+    summary="Get apartments",
+    description="Next page is available when `X-Next-Cursor` header is present.",
+    response_model=Sequence[Apartment] | Sequence[ApartmentSummary],
+)
+async def list_(
+    filters: ApartmentFilter = Depends(),
+    page: Pagination = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+    view: View = VIEW,
+) -> Response:
+    cursor = (
+        ApartmentBeanie.get_motor_collection()
+        .find(filters.query() | page.query(), projection(exclude, view))
+        .sort("_id")
+        .limit(page.limit)
+    )
+    items = await cursor.to_list(page.limit)
+    response = RawJSONResponse(render(items, view))
+    if len(items) == page.limit:
+        response.headers["X-Next-Cursor"] = str(items[-1]["_id"])
+    return response
+
+
+@router.get("/{id}", summary="Get one apartment", response_model=Apartment)
+async def get(id: PydanticObjectId) -> Response:
+    collection = ApartmentBeanie.get_motor_collection()
+    if not (item := await collection.find_one({"_id": id}, projection())):
+        raise HTTPException(404)
+    return RawJSONResponse(item)
 
 
-@router.get("/{id}", summary="Get one apartment")
-async def get(id: PydanticObjectId) -> Apartment:
-    if not (item := await ApartmentBeanie.get(id)):
-        raise HTTPException(404)
-    return Apartment.from_orm(item)
+def _raise_for_errors(item: Apartment, upserted: writes.Upserted) -> None:
+    if 0 in upserted.duplicates:
+        raise HTTPException(409, detail=f"{item.url} already exists")
+    if (message := upserted.errors.get(0)) is not None:
+        raise HTTPException(500, detail=message)
 
 
-@router.post("", summary="Insert/create one apartment")
+@router.post(
+    "",
+    summary="Insert/create one apartment",
+    description=(
+        "Upserted by canonical url, as the scraper does,"
+        " id of an already stored apartment is kept and returned."
+    ),
+)
 async def create(item: Apartment) -> PydanticObjectId:
     item.source = Source.API
-    x = ApartmentBeanie.parse_obj(item)
-    await x.insert()
-    return cast(PydanticObjectId, x.id)
+    apartment = ApartmentBeanie.parse_obj(item)
+    collection = ApartmentBeanie.get_motor_collection()
+    upserted = await writes.upsert(collection, [apartment])
+    _raise_for_errors(item, upserted)
+    await record_history([apartment], upserted)
+    if (id_ := upserted.ids.get(0)) is None:  # stored one, not changed
+        stored = await collection.find_one({"url": apartment.url}, {"_id": 1})
+        id_ = stored["_id"]
+    return cast(PydanticObjectId, id_)
+
+
+@router.put(
+    "/{id}",
+    summary="Replace/create one apartment",
+    description="Embedded history of an already stored apartment is kept.",
+)
+async def replace(id: PydanticObjectId, item: Apartment) -> PydanticObjectId:
+    item.id, item.source = id, Source.API
+    apartment = ApartmentBeanie.parse_obj(item)
+    collection = ApartmentBeanie.get_motor_collection()
+    upserted = await writes.upsert(collection, [apartment], by_id=True)
+    _raise_for_errors(item, upserted)
+    await record_history([apartment], upserted)
+    return id
 
 
 @router.delete("/{id}", summary="Delete apartment if exists")
 async def delete(id: PydanticObjectId) -> Literal["OK"]:
-    if not (item := await ApartmentBeanie.get(id)):
+    result = await ApartmentBeanie.get_motor_collection().delete_one({"_id": id})
+    if result.deleted_count != 1:
         raise HTTPException(404)
-    status = await item.delete()
-    if not status or status.deleted_count != 1:
-        logger.error(f"Cannot delete {id}")
-        raise HTTPException(500, detail=f"Error deleting {id}")
     return "OK"
-
-
-# TODO: router.put for update/replace
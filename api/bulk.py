@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from typing import Any, Literal
+
+import orjson
+from beanie import PydanticObjectId
+from fastapi import APIRouter, Body, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+
+from api.history import record as record_history
+from api.responses import RawJSONResponse
+from shared import writes
+from shared.models import Apartment, Source
+from shared.odm import ApartmentBeanie
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Apartments"])
+
+BULK_CHUNK_SIZE = 1000  # rows validated and written by one bulk_write
+MAX_BULK_DELETE = 10_000
+NDJSON_TYPES = {"application/x-ndjson", "application/jsonl"}
+
+
+class BulkRow(BaseModel):
+    row: int  # index of the record in the body, blank lines are not counted
+    status: Literal["created", "updated", "invalid", "error"]
+    id: PydanticObjectId | None
+    detail: Any = None
+
+
+class BulkReport(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    rows: list[BulkRow]
+
+
+class DeleteReport(BaseModel):
+    deleted: int
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Lines of a streamed body, without waiting for the rest of it."""
+    buffer = b""
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def parse(row: bytes | Any) -> ApartmentBeanie:
+    """Raise ValueError (incl. ValidationError) when the row is not an apartment."""
+    item = Apartment.parse_obj(orjson.loads(row) if isinstance(row, bytes) else row)
+    item.source = Source.API
+    return ApartmentBeanie.parse_obj(item)
+
+
+async def write(chunk: list[tuple[int, ApartmentBeanie]]) -> list[dict[str, Any]]:
+    """Upsert the chunk as the scraper pipeline does, report the result of each row."""
+    collection = ApartmentBeanie.get_motor_collection()
+    apartments = [apartment for _, apartment in chunk]
+    upserted = await writes.upsert(collection, apartments)
+    await record_history(apartments, upserted)
+    ids = dict(upserted.ids)
+    # stored ones left, whose tracked fields didn't change
+    unknown = [
+        apartment.url
+        for index, apartment in enumerate(apartments)
+        if index not in ids and index not in upserted.errors
+    ]
+    if unknown:
+        cursor = collection.find({"url": {"$in": unknown}}, {"url": 1})
+        stored = {document["url"]: document["_id"] async for document in cursor}
+        for index, apartment in enumerate(apartments):
+            ids.setdefault(index, stored.get(apartment.url))
+
+    report = []
+    for index, (row, _) in enumerate(chunk):
+        if (message := upserted.errors.get(index)) is not None:
+            report.append(
+                {"row": row, "status": "error", "id": None, "detail": message}
+            )
+        else:
+            status = "created" if index in upserted.created else "updated"
+            report.append({"row": row, "status": status, "id": ids.get(index)})
+    return report
+
+
+async def rows(request: Request) -> AsyncIterator[bytes | Any]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        async for line in ndjson_rows(request.stream()):
+            yield line
+    elif content_type == "application/json":
+        # NOTE: there is no streaming parser in orjson, but it parses fast anyway
+        try:
+            items = orjson.loads(await request.body())
+        except orjson.JSONDecodeError as error:
+            raise HTTPException(400, detail=f"Invalid JSON: {error}") from error
+        if not isinstance(items, list):
+            raise HTTPException(400, detail="JSON array of apartments expected")
+        for item in items:
+            yield item
+    else:
+        raise HTTPException(415, detail="application/json or application/x-ndjson")
+
+
+async def _enumerate(iterable: AsyncIterator[Any]) -> AsyncIterator[tuple[int, Any]]:
+    index = 0
+    async for item in iterable:
+        yield index, item
+        index += 1
+
+
+@router.post(
+    "/bulk",
+    summary="Insert or update many apartments",
+    description=(
+        "Body is a JSON array or NDJSON (`Content-Type: application/x-ndjson`)."
+        " Apartments are upserted by url, every row is reported,"
+        " invalid or failed rows don't stop the others."
+    ),
+    response_model=BulkReport,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/Apartment"},
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk(request: Request) -> Response:
+    report: list[dict[str, Any]] = []
+    chunk: list[tuple[int, ApartmentBeanie]] = []
+    row = -1
+    async for row, raw in _enumerate(rows(request)):
+        try:
+            chunk.append((row, parse(raw)))
+        except ValueError as error:
+            detail = (
+                jsonable_encoder(error.errors())
+                if isinstance(error, ValidationError)
+                else str(error)  # invalid JSON line
+            )
+            report.append(
+                {"row": row, "status": "invalid", "id": None, "detail": detail}
+            )
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            report.extend(await write(chunk))
+            chunk = []
+    if chunk:
+        report.extend(await write(chunk))
+
+    report.sort(key=lambda x: int(x["row"]))
+    counts = {"created": 0, "updated": 0}
+    for x in report:
+        if x["status"] in counts:
+            counts[x["status"]] += 1
+    failed = row + 1 - sum(counts.values())
+    return RawJSONResponse(counts | {"failed": failed, "rows": report})
+
+
+@router.delete(
+    "",
+    summary="Delete many apartments",
+    description="Ids which don't exist are ignored, see the number of deleted ones.",
+    response_model=DeleteReport,
+)
+async def delete_many(
+    ids: list[PydanticObjectId] = Body(..., min_items=1, max_items=MAX_BULK_DELETE),
+) -> Response:
+    collection = ApartmentBeanie.get_motor_collection()
+    result = await collection.delete_many({"_id": {"$in": ids}})
+    return RawJSONResponse({"deleted": result.deleted_count})
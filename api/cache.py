@@ -0,0 +1,357 @@
+"""
+Cache of read endpoints responses, which change only when something is written.
+
+Cached responses are invalidated by successful write requests of the API
+and by a new crawl generation, bumped by the scraper (see `shared.rollups`).
+Each response has an `ETag`, requests with a matching `If-None-Match` get 304.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Protocol
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from pymongo.errors import PyMongoError
+
+from api.metrics import LatencyMiddleware
+from shared.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from typing import Any
+
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    from shared.settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+# path templates of cached routes, see `LatencyMiddleware.route()`
+CACHED_ROUTES = frozenset({"/apartments", "/apartments/search", "/apartments/{id}"})
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    async def clear(self) -> None:
+        ...
+
+    async def epoch(self) -> int:
+        """Incremented by every `clear()`."""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class MemoryBackend:
+    """
+    Process-local TTL cache evicting least recently used entries,
+    also a stand-in for `RedisBackend` in tests and single worker deployments.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._epoch = 0
+
+    async def get(self, key: str) -> bytes | None:
+        if (entry := self._entries.get(key)) is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+
+    async def epoch(self) -> int:
+        return self._epoch
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Cache shared by all API workers (`pip install .[cache]`).
+    `client` is `redis.asyncio.Redis` or anything with the same interface,
+    keys are prefixed by `prefix`, so one redis database can be shared.
+    """
+
+    def __init__(self, client: Any, prefix: str = "apartments-api:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "apartments-api:") -> RedisBackend:
+        try:
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("RedisBackend requires redis package") from e
+
+        return cls(redis.asyncio.Redis.from_url(url), prefix)
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self.client.get(self.prefix + key)
+        return None if value is None else bytes(value)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, px=math.ceil(ttl * 1000))
+
+    @property
+    def epoch_key(self) -> str:
+        return f"{self.prefix}epoch"
+
+    async def clear(self) -> None:
+        # before deleting, so a response read meanwhile is not stored afterwards
+        await self.client.incr(self.epoch_key)
+        keys = [
+            key
+            async for key in self.client.scan_iter(match=f"{self.prefix}*")
+            if key not in {self.epoch_key, self.epoch_key.encode()}
+        ]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def epoch(self) -> int:
+        return int(await self.client.get(self.epoch_key) or 0)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedResponse:
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+    def dumps(self) -> bytes:
+        # NOTE: orjson escapes newlines, so the first one separates the body
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in self.headers]
+        return orjson.dumps([self.status, headers]) + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, value: bytes) -> CachedResponse:
+        meta, body = value.split(b"\n", 1)
+        status, headers = orjson.loads(meta)
+        return cls(
+            status=status,
+            headers=[(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            body=body,
+        )
+
+    def header(self, name: bytes) -> bytes | None:
+        return next((v for k, v in self.headers if k.lower() == name), None)
+
+
+def etag(body: bytes) -> bytes:
+    return b'"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest().encode()
+
+
+def not_modified(scope: Scope, tag: bytes) -> bool:
+    """Whether `If-None-Match` of the request matches the (strong or weak) `tag`."""
+    for name, value in scope["headers"]:
+        if name == b"if-none-match":
+            tags = {t.strip().removeprefix(b"W/") for t in value.split(b",")}
+            return tag in tags or b"*" in tags
+    return False
+
+
+class ResponseCache:
+    """
+    Responses keyed by the crawl generation, path and sorted query.
+    The generation is loaded at most once per `generation_interval` seconds,
+    when it changes, all cached responses are dropped.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: float = 10 * 60,
+        generation: Callable[[], Awaitable[int]] | None = None,
+        generation_interval: float = 5.0,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.load_generation = generation
+        self.generation_interval = generation_interval
+        self._generation = 0
+        self._checked = -math.inf
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, generation: Callable[[], Awaitable[int]] | None
+    ) -> ResponseCache | None:
+        backend: CacheBackend
+        match settings.API_CACHE_BACKEND:
+            case "off":
+                return None
+            case "memory":
+                backend = MemoryBackend(settings.API_CACHE_MAX_ENTRIES)
+            case "redis":
+                backend = RedisBackend.from_url(settings.API_CACHE_REDIS_URL)
+        return cls(
+            backend,
+            ttl=settings.API_CACHE_TTL,
+            generation=generation,
+            generation_interval=settings.API_CACHE_GENERATION_INTERVAL,
+        )
+
+    async def generation(self) -> int:
+        now = time.monotonic()
+        if (
+            self.load_generation is None
+            or now - self._checked < self.generation_interval
+        ):
+            return self._generation
+        self._checked = now
+        try:
+            generation = await self.load_generation()
+        except PyMongoError as error:
+            logger.warning(f"Cannot load crawl generation: {error}")
+            return self._generation
+        if generation != self._generation:
+            self._generation = generation
+            await self.invalidate()
+        return generation
+
+    async def key(self, scope: Scope) -> str:
+        query = parse_qsl(
+            scope["query_string"].decode("latin-1"), keep_blank_values=True
+        )
+        return f"{await self.generation()}:{scope['path']}?{urlencode(sorted(query))}"
+
+    async def get(self, key: str) -> CachedResponse | None:
+        value = await self.backend.get(key)
+        return None if value is None else CachedResponse.loads(value)
+
+    async def set(self, key: str, response: CachedResponse) -> None:
+        await self.backend.set(key, response.dumps(), self.ttl)
+
+    async def invalidate(self) -> None:
+        await self.backend.clear()
+
+    async def epoch(self) -> int:
+        """Changes when the cache is invalidated, by any worker."""
+        return await self.backend.epoch()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+class ResponseCacheMiddleware:
+    """
+    Serves GET requests of `routes` from `app.state.response_cache` (if there is one),
+    successful responses of other requests are passed through and cached.
+    Any successful write request invalidates the whole cache,
+    responses of requests running meanwhile are not cached.
+    """
+
+    def __init__(self, app: ASGIApp, routes: frozenset[str] = CACHED_ROUTES) -> None:
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cache: ResponseCache | None = None
+        if scope["type"] == "http":
+            cache = getattr(scope["app"].state, "response_cache", None)
+        if cache is None:
+            await self.app(scope, receive, send)
+        elif scope["method"] in WRITE_METHODS:
+            await self.write(cache, scope, receive, send)
+        elif scope["method"] == "GET" and LatencyMiddleware.route(scope) in self.routes:
+            await self.read(cache, scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def write(
+        self, cache: ResponseCache, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status < 400:
+                await cache.invalidate()
+
+    async def read(
+        self, cache: ResponseCache, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        key, epoch = await cache.key(scope), await cache.epoch()
+        if (response := await cache.get(key)) is not None:
+            REGISTRY.counter("api_cache_requests_total", "Cached routes").inc(
+                result="hit"
+            )
+            await self.send(response, scope, send, b"HIT")
+            return
+
+        REGISTRY.counter("api_cache_requests_total", "Cached routes").inc(result="miss")
+        start: Message = {}
+        body = bytearray()
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                body.extend(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        headers = list(start.get("headers", []))
+        if start["status"] == 200:
+            headers.append((b"etag", etag(bytes(body))))
+        response = CachedResponse(start["status"], headers, bytes(body))
+        # possibly read before a write which invalidated the cache meanwhile
+        if response.status == 200 and await cache.epoch() == epoch:
+            await cache.set(key, response)
+        await self.send(response, scope, send, b"MISS")
+
+    @staticmethod
+    async def send(
+        response: CachedResponse, scope: Scope, send: Send, result: bytes
+    ) -> None:
+        status, headers, body = response.status, response.headers, response.body
+        if (tag := response.header(b"etag")) is not None and not_modified(scope, tag):
+            status, headers, body = 304, [(b"etag", tag)], b""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [*headers, (b"x-cache", result)],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
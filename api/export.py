@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import csv
+import io
+from collections.abc import AsyncIterator, Callable, Mapping
+from typing import Any, Literal
+
+import orjson
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from api.filters import ApartmentFilter, get_path, projection
+from api.responses import dumps
+from shared.odm import ApartmentBeanie
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Apartments"])
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 10_000
+
+# column -> dotted path in mongo document
+CSV_COLUMNS = {
+    "_id": "_id",
+    "url": "url",
+    "source": "source",
+    "offer_type": "offer_type",
+    "status": "status",
+    "price": "price.price",
+    "currency": "price.currency",
+    "size_usable": "size.usable",
+    "size_total": "size.total",
+    "rooms": "rooms.amount",
+    "floor": "floor",
+    "country_code": "location.country_code",
+    "address": "location.address",
+    "gps": "location.gps.coordinates",
+}
+
+
+def ndjson_rows(documents: list[Mapping[str, Any]]) -> bytes:
+    option = orjson.OPT_APPEND_NEWLINE
+    return b"".join(dumps(document, option=option) for document in documents)
+
+
+def csv_rows(documents: list[Mapping[str, Any]]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for document in documents:
+        row = [get_path(document, path) for path in CSV_COLUMNS.values()]
+        writer.writerow(
+            " ".join(map(str, v)) if isinstance(v, list) else v for v in row
+        )
+    return buffer.getvalue().encode()
+
+
+async def stream(
+    cursor: AsyncIOMotorCursor,
+    encode: Callable[[list[Mapping[str, Any]]], bytes],
+    batch_size: int,
+    header: bytes = b"",
+) -> AsyncIterator[bytes]:
+    """
+    Encode raw documents as they come from the cursor, one chunk per batch,
+    so memory usage doesn't depend on collection size.
+    """
+    if header:
+        yield header
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield encode(batch)
+            batch.clear()
+    if batch:
+        yield encode(batch)
+
+
+@router.get(
+    "/export",
+    summary="Export apartments as NDJSON or CSV stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}, "text/csv": {}}},
+    },
+)
+async def export(
+    filters: ApartmentFilter = Depends(),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+) -> StreamingResponse:
+    fields = (
+        projection() if format == "ndjson" else dict.fromkeys(CSV_COLUMNS.values(), 1)
+    )
+    cursor = (
+        ApartmentBeanie.get_motor_collection()
+        .find(filters.query(), fields, batch_size=batch_size)
+        .sort("_id")
+    )
+    match format:
+        case "ndjson":
+            content = stream(cursor, ndjson_rows, batch_size)
+            media_type = "application/x-ndjson"
+        case "csv":
+            header = ",".join(CSV_COLUMNS).encode() + b"\r\n"
+            content = stream(cursor, csv_rows, batch_size, header=header)
+            media_type = "text/csv"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=apartments.{format}"},
+    )
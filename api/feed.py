@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.requests import HTTPConnection
+
+from api.filters import ApartmentFilter, ExcludableField, projection
+from api.responses import dumps
+from shared.broadcast import Broadcaster, Event, Subscription
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Feed"])
+
+KEEPALIVE_INTERVAL = 15.0  # seconds, so proxies don't close idle connections
+
+AFTER = Query(
+    None, description="token (`id`) of the last received event, to resume after it"
+)
+
+
+def message(event: Event, fields: dict[str, int]) -> dict[str, Any]:
+    """Only fields of the list API, deleted apartments have only `_id`."""
+    data: dict[str, Any] = {}  # reset
+    if event.document is not None:
+        data = {k: v for k, v in event.document.items() if k in fields}
+    elif event.id is not None:
+        data = {"_id": event.id}
+    return {"id": event.token, "event": event.operation, "data": data}
+
+
+async def messages(
+    subscription: Subscription,
+    filters: ApartmentFilter,
+    exclude: list[ExcludableField] | None,
+    keepalive: float | None = None,
+) -> AsyncIterator[dict[str, Any] | None]:
+    """
+    Deletes and resets are not filtered, there is nothing to filter them by.
+    None is yielded when there was no message for `keepalive` seconds.
+    """
+    fields = projection(exclude)
+    loop = asyncio.get_running_loop()
+    deadline = None if keepalive is None else loop.time() + keepalive
+    try:
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                event = await asyncio.wait_for(anext(subscription), timeout)
+            except asyncio.TimeoutError:
+                event = None
+            except StopAsyncIteration:
+                return
+            if event is not None and not (
+                event.document is None or filters.matches(event.document)
+            ):
+                continue
+            if keepalive is not None:
+                deadline = loop.time() + keepalive
+            yield None if event is None else message(event, fields)
+    finally:
+        subscription.close()
+
+
+async def server_sent_events(
+    stream: AsyncIterator[dict[str, Any] | None]
+) -> AsyncIterator[bytes]:
+    async for x in stream:
+        if x is None:
+            yield b": keepalive\n\n"
+            continue
+        yield b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            x["id"].encode(),
+            x["event"].encode(),
+            dumps(x["data"]),
+        )
+
+
+def broadcaster(connection: HTTPConnection) -> Broadcaster:
+    return connection.app.state.broadcaster  # type: ignore[no-any-return]
+
+
+@router.get(
+    "/feed",
+    summary="Stream new and changed apartments",
+    description=(
+        "Server-Sent Events `insert`, `update`, `replace` and `delete` of apartments"
+        " matching the filters. Reconnect with `Last-Event-ID` header (or `after`)"
+        " to resume, `reset` event means some events were lost, reload the list."
+    ),
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def feed(
+    request: Request,
+    filters: ApartmentFilter = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+    after: str | None = AFTER,
+    last_event_id: str | None = Header(None),
+) -> StreamingResponse:
+    subscription = broadcaster(request).subscribe(last_event_id or after)
+    return StreamingResponse(
+        server_sent_events(
+            messages(subscription, filters, exclude, KEEPALIVE_INTERVAL)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/feed/ws")
+async def feed_ws(
+    websocket: WebSocket,
+    filters: ApartmentFilter = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+    after: str | None = AFTER,
+) -> None:
+    """The same events as `/apartments/feed` as JSON messages `{id, event, data}`."""
+    await websocket.accept()
+    subscription = broadcaster(websocket).subscribe(after)
+
+    async def send() -> None:
+        async for x in messages(subscription, filters, exclude):
+            await websocket.send_text(dumps(x).decode())
+
+    async def until_disconnected() -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(send())
+    receiver = asyncio.create_task(until_disconnected())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+    if not sender.cancelled():  # subscription ended, e.g. after reset
+        sender.result()
+        await websocket.close()
@@ -0,0 +1,126 @@
+from collections.abc import Mapping, Sequence
+from typing import Any, Literal
+
+from beanie import PydanticObjectId
+from fastapi import Query
+from pydantic import NonNegativeFloat, NonNegativeInt
+
+from shared.models import SUMMARY_PATHS, Apartment, ApartmentSummary, OfferType, Status
+
+# NOTE: no `from __future__ import annotations` here, fastapi resolves annotations
+# of class dependencies without module globals
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Heavy fields, which may be omitted by `?exclude=` in list views
+ExcludableField = Literal["description", "history", "photos", "details", "location"]
+
+# `summary`: `ApartmentSummary` instead of `Apartment`, for list and map views
+View = Literal["full", "summary"]
+VIEW = Query(
+    "full", description="`summary` has only a few flat fields, `exclude` is ignored"
+)
+
+
+def get_path(document: Mapping[str, Any], path: str) -> Any:
+    """Value of dotted `path`, None when any part of it is missing."""
+    value: Any = document
+    for key in path.split("."):
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _range(minimum: float | None, maximum: float | None) -> dict[str, float]:
+    bounds = {"$gte": minimum, "$lte": maximum}
+    return {op: value for op, value in bounds.items() if value is not None}
+
+
+class ApartmentFilter:
+    """Query parameters filtering apartments, translated to mongo query."""
+
+    def __init__(
+        self,
+        price_min: NonNegativeFloat | None = None,
+        price_max: NonNegativeFloat | None = None,
+        size_min: NonNegativeFloat | None = Query(None, description="usable size"),
+        size_max: NonNegativeFloat | None = Query(None, description="usable size"),
+        rooms_min: NonNegativeInt | None = None,
+        rooms_max: NonNegativeInt | None = None,
+        floor_min: NonNegativeInt | None = None,
+        floor_max: NonNegativeInt | None = None,
+        status: list[Status] | None = Query(None),
+        offer_type: list[OfferType] | None = Query(None),
+    ) -> None:
+        self.ranges = {
+            "price.price": _range(price_min, price_max),
+            "size.usable": _range(size_min, size_max),
+            "rooms.amount": _range(rooms_min, rooms_max),
+            "floor": _range(floor_min, floor_max),
+        }
+        self.status = status
+        self.offer_type = offer_type
+
+    def query(self) -> dict[str, Any]:
+        query: dict[str, Any] = {k: v for k, v in self.ranges.items() if v}
+        if self.status:
+            query["status"] = {"$in": [status.value for status in self.status]}
+        if self.offer_type:
+            query["offer_type"] = {"$in": [offer.value for offer in self.offer_type]}
+        return query
+
+    def matches(self, document: Mapping[str, Any]) -> bool:
+        """Whether `query()` would match the document, without asking mongo."""
+        for path, bounds in self.ranges.items():
+            if not bounds:
+                continue
+            if (value := get_path(document, path)) is None:
+                return False
+            if value < bounds.get("$gte", value) or value > bounds.get("$lte", value):
+                return False
+        if self.status and document.get("status") not in self.status:
+            return False
+        if self.offer_type and document.get("offer_type") not in self.offer_type:
+            return False
+        return True
+
+
+class Pagination:
+    """Keyset pagination: sorted by `_id`, next page starts after the last seen id."""
+
+    def __init__(
+        self,
+        after: PydanticObjectId
+        | None = Query(
+            None, description="`X-Next-Cursor` header value of previous page"
+        ),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ) -> None:
+        self.after = after
+        self.limit = limit
+
+    def query(self) -> dict[str, Any]:
+        return {} if self.after is None else {"_id": {"$gt": self.after}}
+
+
+def projection(
+    exclude: list[ExcludableField] | None = None, view: View = "full"
+) -> dict[str, int]:
+    """Only `Apartment` fields, so other stored fields never reach the API."""
+    if view == "summary":
+        return dict.fromkeys(SUMMARY_PATHS, 1)
+    excluded = set(exclude or ())
+    return {
+        field.alias: 1
+        for name, field in Apartment.__fields__.items()
+        if name not in excluded
+    }
+
+
+def render(documents: Sequence[Mapping[str, Any]], view: View) -> Sequence[Any]:
+    """Documents found by `projection(view=view)` as they are serialised."""
+    if view == "summary":
+        return [ApartmentSummary.from_document(document) for document in documents]
+    return documents
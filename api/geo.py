@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from api.filters import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    VIEW,
+    ApartmentFilter,
+    ExcludableField,
+    Pagination,
+    View,
+    projection,
+    render,
+)
+from api.responses import RawJSONResponse
+from shared.models import Apartment, ApartmentSummary
+from shared.odm import ApartmentBeanie
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Apartments"])
+
+MAX_RADIUS = 100_000  # meters
+MAX_SKIP = 10_000
+MAX_POLYGON_WIDTH = 90  # degrees of longitude, see `bbox_query()`
+
+Latitude = Query(..., ge=-90, le=90)
+Longitude = Query(..., ge=-180, le=180)
+
+
+class NearbyApartment(Apartment):
+    distance: float  # meters
+
+
+def near_pipeline(
+    longitude: float,
+    latitude: float,
+    radius: float,
+    query: dict[str, Any],
+    skip: int,
+    limit: int,
+    fields: dict[str, int],
+) -> list[dict[str, Any]]:
+    """Sorted by distance, `$geoNear` (unlike `$nearSphere`) also returns it."""
+    return [
+        {
+            "$geoNear": {
+                "near": {"type": "Point", "coordinates": [longitude, latitude]},
+                "key": "location.gps",
+                "distanceField": "distance",
+                "maxDistance": radius,
+                "spherical": True,
+                "query": query,
+            }
+        },
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": fields | {"distance": 1}},
+    ]
+
+
+def bbox_query(
+    min_longitude: float,
+    min_latitude: float,
+    max_longitude: float,
+    max_latitude: float,
+) -> dict[str, Any]:
+    """
+    Edges of GeoJSON polygons are great circle arcs, so a polygon 180° of longitude
+    wide or more would be the other side of the globe. Boxes wider than
+    `MAX_POLYGON_WIDTH` are split into several polygons.
+    """
+    count = max(1, math.ceil((max_longitude - min_longitude) / MAX_POLYGON_WIDTH))
+    width = (max_longitude - min_longitude) / count
+    queries: list[dict[str, Any]] = []
+    for i in range(count):
+        west = min_longitude + i * width
+        east = max_longitude if i == count - 1 else west + width
+        ring = [
+            [west, min_latitude],
+            [east, min_latitude],
+            [east, max_latitude],
+            [west, max_latitude],
+            [west, min_latitude],
+        ]
+        polygon = {"type": "Polygon", "coordinates": [ring]}
+        queries.append({"location.gps": {"$geoWithin": {"$geometry": polygon}}})
+    return queries[0] if len(queries) == 1 else {"$or": queries}
+
+
+@router.get(
+    "/near",
+    summary="Get apartments within radius, nearest first",
+    description="Next page is available when `X-Next-Skip` header is present.",
+    response_model=Sequence[NearbyApartment],
+)
+async def near(
+    latitude: float = Latitude,
+    longitude: float = Longitude,
+    radius: float = Query(..., gt=0, le=MAX_RADIUS, description="meters"),
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: ApartmentFilter = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+) -> Response:
+    pipeline = near_pipeline(
+        longitude=longitude,
+        latitude=latitude,
+        radius=radius,
+        query=filters.query(),
+        skip=skip,
+        limit=limit,
+        fields=projection(exclude),
+    )
+    collection = ApartmentBeanie.get_motor_collection()
+    documents = await collection.aggregate(pipeline).to_list(None)
+    response = RawJSONResponse(documents)
+    if len(documents) == limit:
+        response.headers["X-Next-Skip"] = str(skip + limit)
+    return response
+
+
+@router.get(
+    "/within",
+    summary="Get apartments inside of bounding box",
+    description="Next page is available when `X-Next-Cursor` header is present.",
+    response_model=Sequence[Apartment] | Sequence[ApartmentSummary],
+)
+async def within(
+    min_latitude: float = Latitude,
+    min_longitude: float = Longitude,
+    max_latitude: float = Latitude,
+    max_longitude: float = Longitude,
+    filters: ApartmentFilter = Depends(),
+    page: Pagination = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+    view: View = VIEW,
+) -> Response:
+    if min_latitude >= max_latitude or min_longitude >= max_longitude:
+        raise HTTPException(422, detail="min coordinates must be less than max")
+
+    bbox = bbox_query(min_longitude, min_latitude, max_longitude, max_latitude)
+    cursor = (
+        ApartmentBeanie.get_motor_collection()
+        .find(filters.query() | page.query() | bbox, projection(exclude, view))
+        .sort("_id")
+        .limit(page.limit)
+    )
+    items = await cursor.to_list(page.limit)
+    response = RawJSONResponse(render(items, view))
+    if len(items) == page.limit:
+        response.headers["X-Next-Cursor"] = str(items[-1]["_id"])
+    return response
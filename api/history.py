@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import datetime
+import logging
+from collections.abc import Sequence
+
+from beanie import PydanticObjectId
+from fastapi import APIRouter, HTTPException, Query, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from pymongo.errors import PyMongoError
+
+from api.responses import RawJSONResponse
+from shared import history, writes
+from shared.models import Status
+from shared.odm import ApartmentBeanie
+from shared.settings import Settings
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["History"])
+
+HISTORY_COLLECTION = Settings().MONGO_HISTORY_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+class ApartmentTrendPoint(BaseModel):
+    period: str
+    price: float  # last one in the period
+    price_min: float
+    price_max: float
+    status: Status
+    changes: int
+
+
+class GroupTrendPoint(BaseModel):
+    group: str  # project or city
+    period: str
+    price: float  # average
+    price_min: float
+    price_max: float
+    price_per_m2: float
+    apartments: int
+
+
+def history_collection() -> AsyncIOMotorCollection:
+    database = ApartmentBeanie.get_motor_collection().database
+    return database[HISTORY_COLLECTION]
+
+
+async def record(
+    apartments: Sequence[ApartmentBeanie], upserted: writes.Upserted
+) -> None:
+    """New and changed apartments written by the API, as the scraper pipeline does."""
+    try:
+        await writes.record_history(history_collection(), apartments, upserted)
+    except PyMongoError as error:  # apartments are written anyway
+        logger.error(f"Cannot record history of {len(apartments)} apartments: {error}")
+
+
+@router.get(
+    "/trends",
+    summary="Get price trends per project or city",
+    description="Prices of apartments listed or changed in each period.",
+    response_model=Sequence[GroupTrendPoint],
+)
+async def trends(
+    group_by: history.GroupBy = "project",
+    interval: history.Interval = "month",
+    group: str | None = Query(None, description="only this project or city"),
+    since: datetime.datetime | None = None,
+) -> Response:
+    pipeline = history.group_trend_pipeline(group_by, interval, group, since)
+    points = await history_collection().aggregate(pipeline).to_list(None)
+    return RawJSONResponse(points)
+
+
+@router.get(
+    "/{id}/history",
+    summary="Get price history of one apartment",
+    description="Changes downsampled to the last value per period.",
+    response_model=Sequence[ApartmentTrendPoint],
+)
+async def apartment_history(
+    id: PydanticObjectId,
+    interval: history.Interval = "day",
+    since: datetime.datetime | None = None,
+) -> Response:
+    pipeline = history.apartment_trend_pipeline(id, interval, since)
+    points = await history_collection().aggregate(pipeline).to_list(None)
+    if not points:
+        collection = ApartmentBeanie.get_motor_collection()
+        if not await collection.find_one({"_id": id}, {"_id": 1}):
+            raise HTTPException(404)
+    return RawJSONResponse(points)
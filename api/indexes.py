@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from pymongo import ASCENDING, GEOSPHERE, TEXT, IndexModel
+
+from shared import search
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Indexes backing API queries, created at startup.
+# Unique url index is maintained by beanie, see `shared.odm.ApartmentBeanie`.
+INDEXES = [
+    IndexModel([("price.price", ASCENDING)], name="price"),
+    IndexModel([("size.usable", ASCENDING)], name="size"),
+    IndexModel([("rooms.amount", ASCENDING)], name="rooms"),
+    IndexModel([("floor", ASCENDING)], name="floor"),
+    IndexModel(
+        [("status", ASCENDING), ("offer_type", ASCENDING), ("_id", ASCENDING)],
+        name="status_offer_type",
+    ),
+    IndexModel([("location.gps", GEOSPHERE)], name="gps"),
+    # polled by the feed, when change streams are not supported
+    IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    # the only text index a collection can have
+    IndexModel(
+        [(field, TEXT) for field in search.TEXT_FIELDS],
+        name="text",
+        default_language=search.TEXT_LANGUAGE,
+    ),
+]
+
+
+async def ensure_indexes(collection: AsyncIOMotorCollection) -> None:
+    await collection.create_indexes(INDEXES)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def bson_default(value: Any) -> Any:
+    """
+    orjson fallback for types it can't serialise natively.
+    `HttpUrl` (str subclass), `geojson.Point` (dict subclass), enums and datetimes
+    are handled by orjson itself, so only ObjectId (incl. PydanticObjectId) is left
+    for raw mongo documents and pydantic models for anything else.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.dict(by_alias=True, exclude_unset=True)
+    raise TypeError
+
+
+def dumps(content: Any, option: int | None = None) -> bytes:
+    return orjson.dumps(content, default=bson_default, option=option)
+
+
+class RawJSONResponse(Response):
+    """
+    Serialises raw mongo documents by orjson as they are,
+    skipping validation by the response model (which is still used for docs).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from fastapi import APIRouter, Depends, Query, Response
+
+from api.filters import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    ApartmentFilter,
+    ExcludableField,
+    projection,
+)
+from api.responses import RawJSONResponse
+from shared import search as text_search
+from shared.models import Apartment
+from shared.odm import ApartmentBeanie
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Apartments"])
+
+MAX_OFFSET = 10_000  # skipped results are still scored by mongo
+
+
+class SearchResult(Apartment):
+    score: float  # relevance, higher is better
+
+
+async def search_text(
+    query: dict[str, Any],
+    text: str,
+    fields: dict[str, Any],
+    offset: int,
+    limit: int,
+) -> list[Mapping[str, Any]]:
+    score = {"score": {"$meta": "textScore"}}
+    cursor = (
+        ApartmentBeanie.get_motor_collection()
+        .find(query | {"$text": {"$search": text}}, fields | score)
+        .sort([("score", {"$meta": "textScore"}), ("_id", 1)])
+        .skip(offset)
+        .limit(limit)
+    )
+    return await cursor.to_list(limit)
+
+
+async def search_local(
+    query: dict[str, Any],
+    text: str,
+    fields: dict[str, Any],
+    offset: int,
+    limit: int,
+) -> list[Mapping[str, Any]]:
+    """By `shared.search.InvertedIndex` of all matching documents, for mongomock."""
+    cursor = ApartmentBeanie.get_motor_collection().find(query).sort("_id")
+    documents = {document["_id"]: document async for document in cursor}
+    index = text_search.InvertedIndex.from_documents(documents.values())
+    return [
+        {k: v for k, v in documents[id].items() if k in fields} | {"score": score}
+        for id, score in index.search(text)[offset : offset + limit]
+    ]
+
+
+@router.get(
+    "/search",
+    summary="Search apartments by description and address",
+    description=(
+        'Any of the words, all "quoted phrases" and none of -excluded ones,'
+        " case and diacritics insensitive. The most relevant first,"
+        " next page is available when `X-Next-Offset` header is present."
+    ),
+    response_model=Sequence[SearchResult],
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=256),
+    filters: ApartmentFilter = Depends(),
+    exclude: list[ExcludableField] | None = Query(None),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> Response:
+    args = (filters.query(), q, projection(exclude), offset, limit)
+    try:
+        items = await search_text(*args)
+    except NotImplementedError:  # mongomock has no $text
+        items = await search_local(*args)
+    response = RawJSONResponse(items)
+    if len(items) == limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return response
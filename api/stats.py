@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import datetime
+
+from fastapi import APIRouter, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+
+from api.responses import RawJSONResponse
+from shared import rollups
+from shared.models import Status
+from shared.odm import ApartmentBeanie
+from shared.settings import Settings
+
+# NOTE: using typing.TYPE_CHECKING block here will break fastapi type guessing
+
+
+router = APIRouter(prefix="/apartments", tags=["Statistics"])
+
+STATS_COLLECTION = Settings().MONGO_STATS_COLLECTION
+
+
+class Summary(BaseModel):
+    apartments: int
+    price_avg: float
+    price_min: float
+    price_max: float
+    size_avg: float
+    price_per_m2_avg: float
+
+
+class RoomsSummary(Summary):
+    rooms: int
+
+
+class CountrySummary(Summary):
+    country_code: str | None  # not geolocated
+
+
+class StatusCount(BaseModel):
+    status: Status
+    apartments: int
+
+
+class MarketStats(BaseModel):
+    refreshed_at: datetime.datetime
+    overall: Summary | None  # no apartments
+    by_rooms: list[RoomsSummary]
+    by_status: list[StatusCount]
+    by_country: list[CountrySummary]
+
+
+def stats_collection() -> AsyncIOMotorCollection:
+    database = ApartmentBeanie.get_motor_collection().database
+    return database[STATS_COLLECTION]
+
+
+@router.get(
+    "/stats",
+    summary="Get market statistics",
+    description="Materialised at the end of each crawl, see `refreshed_at`.",
+    response_model=MarketStats,
+)
+async def stats() -> Response:
+    collection = stats_collection()
+    document = await collection.find_one({"_id": rollups.ROLLUP_ID}, {"_id": 0})
+    if document is None:  # nothing crawled yet
+        document = await rollups.refresh(
+            ApartmentBeanie.get_motor_collection(), collection
+        )
+        del document["_id"]
+    return RawJSONResponse(document)
@@ -0,0 +1,126 @@
+"""
+Compares serialisation of API responses:
+    validated: ApartmentBeanie -> Apartment.from_orm -> response model validation -> json
+    raw: mongo document -> orjson (`api.responses.RawJSONResponse`)
+
+Usage: python -m benchmarks.api_serialisation [--items 500] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import timeit
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+import geojson
+from beanie import init_beanie
+from beanie.odm.utils.dump import get_dict
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from mongomock_motor import AsyncMongoMockClient
+
+from api.filters import projection
+from api.responses import RawJSONResponse
+from shared.models import (
+    Apartment,
+    Change,
+    Location,
+    OfferType,
+    Price,
+    Rooms,
+    Size,
+    Source,
+    Status,
+)
+from shared.odm import ApartmentBeanie
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+
+def make_document(i: int) -> dict[str, Any]:
+    apartment = ApartmentBeanie.parse_obj(
+        Apartment(
+            url=f"https://www.yit.sk/en/flats-for-sale/bratislava/foo/bar/{i}",  # type: ignore[arg-type]
+            source=Source.SCRAPER,
+            offer_type=OfferType.SELL,
+            status=Status.FREE,
+            price=Price(price=300_000 + i, currency="EUR"),
+            size=Size(usable=60, total=70.3),
+            rooms=Rooms(amount=3),
+            floor=3,
+            location=Location(
+                country_code="sk",
+                gps=geojson.Point((17.1077, 48.1486)),
+                address="Bratislava, Slovensko",
+            ),
+            description="some description " * 20,
+            photos=[f"photos/{i}/{n}.jpg" for n in range(10)],
+            history=[Change(what={"price": 310_000})],
+        )
+    )
+    document: dict[str, Any] = get_dict(apartment, to_db=True)
+    return {k: v for k, v in document.items() if k in projection()}
+
+
+async def serialise_validated(
+    documents: Sequence[dict[str, Any]], response_model: Any
+) -> bytes:
+    """What FastAPI does with a returned model + `response_model`."""
+    items = [Apartment.from_orm(ApartmentBeanie.parse_obj(d)) for d in documents]
+    content = await serialize_response(
+        field=create_response_field("response", response_model),
+        response_content=items if response_model is not Apartment else items[0],
+        is_coroutine=True,
+    )
+    return JSONResponse(content).body
+
+
+async def serialise_raw(
+    documents: Sequence[dict[str, Any]], response_model: Any
+) -> bytes:
+    content = documents if response_model is not Apartment else documents[0]
+    return RawJSONResponse(content).body
+
+
+def measure(
+    function: Callable[..., Any], *args: Any, number: int, repeat: int
+) -> float:
+    """Best time of one call in milliseconds."""
+    loop = asyncio.new_event_loop()
+    call = lambda: loop.run_until_complete(function(*args))
+    best = min(timeit.repeat(call, number=number, repeat=repeat)) / number
+    loop.close()
+    return best * 1_000
+
+
+async def setup() -> None:
+    await init_beanie(AsyncMongoMockClient()["benchmark"], document_models=[ApartmentBeanie])  # type: ignore[arg-type]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(setup())
+    documents = [make_document(i) for i in range(args.items)]
+
+    cases = {
+        "single": (documents[:1], Apartment, 200),
+        f"list of {args.items}": (documents, Sequence[Apartment], 3),
+    }
+    print(f"{'endpoint':<16}{'validated ms':>14}{'raw ms':>10}{'speedup':>10}")
+    for name, (docs, model, number) in cases.items():
+        kwargs = {"number": number, "repeat": args.repeat}
+        validated = measure(serialise_validated, docs, model, **kwargs)
+        raw = measure(serialise_raw, docs, model, **kwargs)
+        print(f"{name:<16}{validated:>14.3f}{raw:>10.3f}{validated / raw:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
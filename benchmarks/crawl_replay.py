@@ -0,0 +1,240 @@
+"""
+End-to-end crawl by `yit.sk` spider replayed from a HAR archive (`scraper.replay`),
+through the real pages and pipelines against local stand-ins (mongomock,
+in-memory S3, offline geocoder), so it runs without network, e.g. in CI.
+Reports items/s, latency of stages and peak RSS:
+    listing: `process_listing` of one API page
+    item: `yield_item` of one detail page (geolocation, page object, `to_item`)
+    photos: photos pipeline per item
+    mongo: mongo pipeline per item (incl. waiting for its bulk write)
+    mongo write: one bulk write
+
+The archive is synthetic unless --archive points to one recorded by
+`scrapy run -s REPLAY_MODE=record -s REPLAY_ARCHIVE=path.har.json`.
+
+Usage: python -m benchmarks.crawl_replay [--archive PATH] [--apartments 500]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import resource
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from mongomock_motor import AsyncMongoMockClient
+from scrapy import Request
+from scrapy.crawler import CrawlerProcess
+from scrapy.http import HtmlResponse, Response, TextResponse
+from scrapy.utils.project import get_project_settings
+
+from scraper.pipelines.minio import SaveToMinioApartmentPhotos
+from scraper.pipelines.mongo import PendingWrite, SaveToMongoWithDuplicatesCheck
+from scraper.replay import Archive
+from scraper.spiders.yit import YitSkFlatsForSale
+from shared.cache import DiskCache
+from shared.s3 import InMemoryS3Client
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+    from typing import Any
+
+    from scrapy import Spider
+    from scrapy.crawler import Crawler
+    from scrapy.http import TextResponse as TextResponseType
+    from typing_extensions import Self
+
+    from shared.models import Apartment
+
+BUCKET = "benchmark"
+APARTMENTS_PER_PROJECT = 20  # projects share photos and coordinates
+LOGO_URL = "https://www.yit.sk/logo.svg"  # in the footer of every detail page
+PHOTOS_PER_APARTMENT = 8
+
+TIMINGS: defaultdict[str, list[float]] = defaultdict(list)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TIMINGS[stage].append(time.perf_counter() - start)
+
+
+class TimedYitSkFlatsForSale(YitSkFlatsForSale):
+    def process_listing(self, response: TextResponseType) -> Iterator[Request]:
+        with timed("listing"):
+            requests = list(super().process_listing(response))
+        yield from requests
+
+    async def yield_item(
+        self, response: TextResponseType, json_data: dict[str, Any]
+    ) -> AsyncIterator[Apartment]:
+        with timed("item"):
+            items = [item async for item in super().yield_item(response, json_data)]
+        for item in items:
+            yield item
+
+
+class InMemoryPhotos(SaveToMinioApartmentPhotos):
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        s3 = InMemoryS3Client()
+        s3.create_bucket(Bucket=BUCKET)
+        pipeline = cls(s3=s3, bucket=BUCKET, index=DiskCache(":memory:"))
+        pipeline.crawler = crawler
+        return pipeline
+
+    async def process_item(self, item: Apartment, spider: Spider) -> Apartment:
+        with timed("photos"):
+            return await super().process_item(item, spider)
+
+
+class MockMongo(SaveToMongoWithDuplicatesCheck):
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(
+            client=AsyncMongoMockClient(),
+            database=BUCKET,
+            bulk_size=crawler.settings.getint("MONGO_BULK_SIZE", 0),
+            flush_interval=crawler.settings.getfloat("MONGO_BULK_FLUSH_INTERVAL", 1.0),
+            stats=crawler.stats,
+        )
+
+    async def process_item(self, item: Apartment, spider: Spider) -> Apartment:
+        with timed("mongo"):
+            return await super().process_item(item, spider)
+
+    async def write(self, batch: list[PendingWrite]) -> None:
+        with timed("mongo write"):
+            await super().write(batch)
+
+
+def fields(index: int) -> dict[str, Any]:
+    project = index // APARTMENTS_PER_PROJECT
+    return {
+        "ProductItemForSale": True,
+        "ProductItemForRent": False,
+        "ReservationStatusKey": "Free",
+        "WebProjectStatusKey": ("ReadyToMoveIn", "ToBeReady")[index % 2],
+        "SalesPrice": 100_000 + index * 1_000,
+        "ApartmentSize": 30 + index % 70,
+        "TotalAreaSize": 35.5 + index % 70,
+        "FloorNumberCorrectedFrom": index % 12,
+        "NumberOfRooms": ("1", "1,5", "2", "3", "4")[index % 5],
+        "ProjectCoordinatesLatitude": 48.1 + project / 100,
+        "ProjectCoordinatesLongitude": 17.1 + project / 100,
+        "ProjectMarketingDescription": f"Project {project}. " * 20,
+        "MarketingDescription": f"Apartment {index}. " * 10,
+        "_Url": f"/en/flats-for-sale/bratislava/project-{project}/{index}",
+    }
+
+
+def detail_page(photos: list[str], paragraphs: int = 500) -> bytes:
+    gallery = "".join(f'<img src="data:," data-src="{url}">' for url in photos)
+    text = "".join(
+        f"<section><p>Lorem <b>ipsum</b> {i}</p></section>" for i in range(paragraphs)
+    )
+    footer = f'<footer><img data-src="{LOGO_URL}"></footer>'
+    return f"<html><body>{gallery}{text}{footer}</body></html>".encode()
+
+
+def synthetic_archive(apartments: int, page_size: int) -> Archive:
+    archive = Archive()
+    spider = YitSkFlatsForSale(page_size=page_size)
+    hits = [{"Fields": fields(index)} for index in range(apartments)]
+    for page in range(max(1, math.ceil(apartments / page_size))):
+        request = spider._api_request(page, page_size, callback=spider.parse)
+        data = {
+            "TotalHits": apartments,
+            "Hits": hits[page * page_size : (page + 1) * page_size],
+        }
+        body = json.dumps(data).encode()
+        archive.add(request, TextResponse(request.url, body=body))
+
+    photo_urls = {LOGO_URL}
+    for index, hit in enumerate(hits):
+        project = index // APARTMENTS_PER_PROJECT
+        photos = [
+            f"https://www.yit.sk/render/{project}/{photo}.jpg"
+            for photo in range(PHOTOS_PER_APARTMENT)
+        ]
+        photo_urls.update(photos)
+        url = "https://www.yit.sk" + hit["Fields"]["_Url"]
+        archive.add(Request(url), HtmlResponse(url, body=detail_page(photos)))
+    for url in photo_urls:
+        body = b"\xff\xd8\xff" + url.encode() * 1_000  # fake jpeg
+        archive.add(Request(url), Response(url, body=body))
+    return archive
+
+
+def report(stats: dict[str, Any]) -> None:
+    items = stats.get("item_scraped_count", 0)
+    elapsed = stats["elapsed_time_seconds"]
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{items} items in {elapsed:.2f} s: {items / elapsed:,.0f} items/s")
+    print(f"peak RSS {peak:,.0f} MiB, {stats.get('replay/missing', 0)} not recorded")
+    print(f"{'stage':<14}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, timings in TIMINGS.items():
+        ms = [timing * 1000 for timing in timings]
+        p95 = statistics.quantiles(ms, n=20)[-1] if len(ms) > 1 else ms[0]
+        print(
+            f"{stage:<14}{len(ms):>8}{statistics.mean(ms):>10.2f}"
+            f"{statistics.median(ms):>10.2f}{p95:>10.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archive", type=Path)
+    parser.add_argument("--apartments", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=YitSkFlatsForSale.PER_PAGE)
+    args = parser.parse_args()
+
+    # NOTE: read by `shared.geocoding.get_geocoder()` on first use
+    os.environ["GEOCODING_BACKEND"] = "offline"
+    os.environ["GEOCODING_CACHE_PATH"] = ":memory:"
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = args.archive
+        if archive is None:
+            archive = Path(directory) / "synthetic.har.json"
+            synthetic_archive(args.apartments, args.page_size).save(archive)
+
+        settings = get_project_settings()
+        settings.setdict(
+            {
+                "REPLAY_MODE": "replay",
+                "REPLAY_ARCHIVE": str(archive),
+                "YIT_PAGE_SIZE": args.page_size,
+                "HTTPCACHE_ENABLED": False,
+                "ROBOTSTXT_OBEY": False,
+                "AUTOTHROTTLE_ENABLED": False,
+                "INCREMENTAL": False,
+                "FEEDS": {},
+                "ITEM_PIPELINES": {
+                    f"{__name__}.InMemoryPhotos": 500,
+                    f"{__name__}.MockMongo": 600,
+                },
+                "LOG_LEVEL": "WARNING",
+            },
+            priority="cmdline",
+        )
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(TimedYitSkFlatsForSale)
+        process.crawl(crawler)
+        process.start()
+    report(crawler.stats.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares daily feed formats (`FEEDS` in `scraper/settings.py`) by write time and size:
+    json: the former indented JSON by json.dumps with `default=pydantic_encoder`
+    jsonl.gz / jsonl.zst: NDJSON by orjson (`scraper.feeds.JsonLinesExporter`), compressed
+    parquet: `scraper.feeds.ParquetItemExporter`, zstd compressed row groups
+zstd and parquet are skipped unless `zstandard` and `pyarrow` are installed.
+
+Usage: python -m benchmarks.feed_export [--items 10000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import time
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+from pydantic.json import pydantic_encoder
+from scrapy.exporters import JsonItemExporter
+from scrapy.extensions.postprocessing import PostProcessingManager
+
+from benchmarks.api_serialisation import make_document, setup
+from scraper.feeds import JsonLinesExporter, ParquetItemExporter
+from shared.models import Apartment
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any, BinaryIO
+
+    Exporter = Callable[[BinaryIO], Any]
+
+
+def formats() -> dict[str, tuple[Exporter, list[str]]]:
+    json_exporter = lambda file: JsonItemExporter(
+        file, indent=2, default=pydantic_encoder, ensure_ascii=False
+    )
+    result: dict[str, tuple[Exporter, list[str]]] = {
+        "json": (json_exporter, []),
+        "jsonl.gz": (JsonLinesExporter, ["scraper.feeds.GzipPlugin"]),
+    }
+    if find_spec("zstandard"):
+        result["jsonl.zst"] = (JsonLinesExporter, ["scraper.feeds.ZstdPlugin"])
+    if find_spec("pyarrow"):
+        result["parquet"] = (ParquetItemExporter, [])
+    return result
+
+
+def write(apartments: list[Apartment], exporter: Exporter, plugins: list[str]) -> int:
+    file = io.BytesIO()
+    target: Any = PostProcessingManager(plugins, file, {}) if plugins else file
+    exporter_instance = exporter(target)
+    exporter_instance.start_exporting()
+    for apartment in apartments:
+        exporter_instance.export_item(apartment)
+    exporter_instance.finish_exporting()
+    if plugins:
+        target.close()
+    return len(file.getvalue())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000)
+    args = parser.parse_args()
+
+    asyncio.run(setup())
+    apartments = [Apartment.parse_obj(make_document(i)) for i in range(args.items)]
+    print(f"{'format':<12}{'seconds':>10}{'KiB':>10}")
+    for name, (exporter, plugins) in formats().items():
+        start = time.perf_counter()
+        size = write(apartments, exporter, plugins)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}{elapsed:>10.3f}{size / 1024:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
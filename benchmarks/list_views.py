@@ -0,0 +1,84 @@
+"""
+Compares per-item cost and size of list responses (`/apartments?view=`):
+    validated: full documents -> Apartment -> json, the cost of response model validation
+    full: full documents (`projection()`) -> orjson, the default view
+    summary: `SUMMARY_PATHS` documents -> `ApartmentSummary` -> orjson
+fetch is `find().to_list()` by mongomock, so it's only indicative of copying less data.
+
+Usage: python -m benchmarks.list_views [--items 500] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import timeit
+from typing import TYPE_CHECKING
+
+from mongomock_motor import AsyncMongoMockClient
+
+from api.filters import projection, render
+from api.responses import dumps
+from benchmarks.api_serialisation import make_document, setup
+from shared.models import Apartment
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from typing import Any
+
+    from api.filters import View
+
+
+def serialise_validated(documents: Sequence[dict[str, Any]]) -> bytes:
+    return dumps([Apartment.parse_obj(document) for document in documents])
+
+
+def serialise(documents: Sequence[dict[str, Any]], view: View) -> bytes:
+    return dumps(render(documents, view))
+
+
+def per_item(call: Callable[[], Any], items: int, number: int, repeat: int) -> float:
+    """Best time of one item in microseconds."""
+    return min(timeit.repeat(call, number=number, repeat=repeat)) / number / items * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(setup())
+    loop = asyncio.new_event_loop()
+    collection = AsyncMongoMockClient()["benchmark"]["apartments"]
+    documents = [make_document(i) for i in range(args.items)]
+    loop.run_until_complete(collection.insert_many(documents))
+
+    def fetch(view: View) -> list[dict[str, Any]]:
+        cursor = collection.find({}, projection(view=view)).sort("_id")
+        return loop.run_until_complete(cursor.to_list(None))
+
+    fetched = {"full": fetch("full"), "summary": fetch("summary")}
+    cases: dict[str, tuple[Callable[[], Any] | None, Callable[[], bytes]]] = {
+        "validated": (None, lambda: serialise_validated(fetched["full"])),
+        "full": (lambda: fetch("full"), lambda: serialise(fetched["full"], "full")),
+        "summary": (
+            lambda: fetch("summary"),
+            lambda: serialise(fetched["summary"], "summary"),
+        ),
+    }
+    print(f"{'view':<12}{'fetch µs':>10}{'render µs':>11}{'bytes':>8}{'size':>8}")
+    full_size = len(serialise(fetched["full"], "full"))
+    for name, (fetch_, render_) in cases.items():
+        kwargs = {"items": args.items, "number": 3, "repeat": args.repeat}
+        fetched_in = "-" if fetch_ is None else f"{per_item(fetch_, **kwargs):.1f}"
+        rendered_in = per_item(render_, **kwargs)
+        size = len(render_())
+        print(
+            f"{name:<12}{fetched_in:>10}{rendered_in:>11.2f}"
+            f"{size // args.items:>8}{size / full_size:>8.0%}"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
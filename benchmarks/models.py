@@ -0,0 +1,81 @@
+"""
+Compares `Apartment` construction throughput with country code validated
+by `countryinfo` on every call (legacy) and by precomputed `country_codes()`.
+
+Usage: python -m benchmarks.models [--number 200] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+from typing import Any
+
+import countryinfo
+import geojson
+from pydantic import validator
+
+from shared.models import (
+    Apartment,
+    Location,
+    OfferType,
+    Price,
+    Rooms,
+    Size,
+    Source,
+    Status,
+)
+
+
+class LegacyLocation(Location):
+    @validator("country_code")
+    def validate_country(cls, value: str, **kwargs: Any) -> str:
+        try:
+            countryinfo.CountryInfo(value).area()
+        except KeyError as error:
+            raise ValueError("Not existing country code!") from error
+        return value
+
+
+class LegacyApartment(Apartment):
+    location: LegacyLocation | None
+
+
+def make(model: type[Apartment], location: type[Location]) -> Apartment:
+    return model(
+        url="https://www.yit.sk/en/flats-for-sale/bratislava/foo/bar/1",  # type: ignore[arg-type]
+        source=Source.SCRAPER,
+        offer_type=OfferType.SELL,
+        status=Status.FREE,
+        price=Price(price=300_000, currency="EUR"),
+        size=Size(usable=60, total=70.3),
+        rooms=Rooms(amount=3),
+        floor=3,
+        location=location(
+            country_code="sk",
+            gps=geojson.Point((17.1077, 48.1486)),
+            address="Bratislava, Slovensko",
+        ),
+        details=None,
+        description="some description",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "legacy": lambda: make(LegacyApartment, LegacyLocation),
+        "memoized": lambda: make(Apartment, Location),
+    }
+    print(f"{'validation':<12}{'apartments/s':>14}")
+    for name, construct in cases.items():
+        construct()  # warm-up, e.g. loading of country codes
+        best = min(timeit.repeat(construct, number=args.number, repeat=args.repeat))
+        print(f"{name:<12}{args.number / best:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
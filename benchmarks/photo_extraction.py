@@ -0,0 +1,92 @@
+"""
+Compares extraction of photo urls from apartment detail pages:
+    selector: parsel `response.css("img::attr(data-src)")`, builds whole lxml tree
+    streaming: `scraper.pages.html.scan`, finds only <img> start tags
+
+Pages are read from scrapy's http cache (`.scrapy/httpcache/yit.sk` after a crawl,
+see `scraper.httpcache`) or any directory with *.html files,
+a synthetic page is generated when there are none.
+Each method runs in a fresh process, so peak RSS is not shared between them.
+
+Usage: python -m benchmarks.photo_extraction [--pages DIR] [--repeat 20]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+import parsel
+
+from scraper.pages.html import scan
+from scraper.pages.yit import YitSkJsonApartmentPage
+
+DEFAULT_PAGES = Path(".scrapy/httpcache/yit.sk")
+
+
+def synthetic_page(photos: int = 30, paragraphs: int = 2_000) -> bytes:
+    gallery = "".join(
+        f'<figure><img src="data:," data-src="/render/{i}.jpg"></figure>'
+        for i in range(photos)
+    )
+    text = "".join(
+        f"<section><h2>{i}</h2><p>Lorem <b>ipsum</b> dolor sit amet.</p></section>"
+        for i in range(paragraphs)
+    )
+    footer = '<footer><img data-src="/logo.svg"></footer>'
+    return f"<html><body>{gallery}{text}{footer}</body></html>".encode()
+
+
+def load_pages(directory: Path) -> list[bytes]:
+    cached = sorted(directory.glob("*/*/response_body"))
+    pages = [gzip.decompress(path.read_bytes()) for path in cached]
+    pages += [path.read_bytes() for path in sorted(directory.glob("*.html"))]
+    return pages or [synthetic_page()]
+
+
+def selector(body: bytes) -> list[str]:
+    return parsel.Selector(body=body).css("img::attr(data-src)").getall()
+
+
+def streaming(body: bytes) -> list[str]:
+    return scan(body, YitSkJsonApartmentPage.HTML_FIELDS)["photos"]
+
+
+METHODS = {"selector": selector, "streaming": streaming}
+
+
+def run(method: str, pages: list[bytes], repeat: int) -> tuple[float, int, int]:
+    """CPU seconds per page, photos found and peak RSS increase in KiB."""
+    extract = METHODS[method]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.process_time()
+    found = 0
+    for _ in range(repeat):
+        found = sum(len(extract(page)) for page in pages)
+    elapsed = (time.process_time() - start) / (repeat * len(pages))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return elapsed, found, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=Path, default=DEFAULT_PAGES)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    size = sum(map(len, pages)) / len(pages) / 1024
+    print(f"{len(pages)} page(s), {size:,.0f} KiB on average")
+    print(f"{'method':<12}{'ms/page':>10}{'photos':>10}{'peak RSS KiB':>14}")
+    context = multiprocessing.get_context("spawn")
+    for method in METHODS:
+        with context.Pool(1) as pool:
+            elapsed, found, peak = pool.apply(run, (method, pages, args.repeat))
+        print(f"{method:<12}{elapsed * 1000:>10.2f}{found:>10}{peak:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import scrapy.commands
+
+from shared import connections, writes
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from typing import Any
+
+    from shared.settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+
+async def dedupe(settings: Settings) -> int:
+    client = connections.mongo_client(settings)
+    try:
+        database = client[settings.MONGO_DATABASE]
+        return await writes.dedupe(
+            database[settings.MONGO_COLLECTION],
+            database[settings.MONGO_HISTORY_COLLECTION],
+        )
+    finally:
+        connections.close_mongo_client(client)
+
+
+class Command(scrapy.commands.ScrapyCommand):
+    """
+    Usage: scrapy dedupe
+
+    Collapses apartments stored under urls which are the same once canonicalized,
+    see `shared.writes.dedupe()`. Needed once for databases filled before urls
+    were canonicalized, otherwise the unique url index can't be created
+    (`init_beanie()` fails with DuplicateKeyError). Safe to run again.
+    """
+
+    requires_project = True
+
+    def short_desc(self) -> str:
+        return "Collapse apartments with the same canonical url [custom command]"
+
+    def run(self, _: Any, opts: Namespace) -> None:
+        deleted = asyncio.run(dedupe(self.settings["DOTENV_SETTINGS"]))
+        logger.info(f"Deleted {deleted} apartments with duplicate canonical urls")
@@ -1,15 +1,135 @@
 from __future__ import annotations
 
+import dataclasses
+import datetime
+import logging
+import multiprocessing
+import os
+import pprint
 from typing import TYPE_CHECKING
 
 import scrapy.commands
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings as ScrapySettings
 
-from shared.s3 import ensure_s3_bucket_exists, get_s3_client
+from scraper.httpcache import hit_ratio
+from scraper.metrics import metrics_file
+from shared.connections import s3_client
+from shared.s3 import ensure_s3_bucket_exists
+from shared.settings import Settings
 
 if TYPE_CHECKING:
-    from argparse import Namespace
+    from argparse import ArgumentParser, Namespace
+    from collections.abc import Iterable, Iterator
     from typing import Any
 
+    from scrapy.spiderloader import SpiderLoader
+
+
+logger = logging.getLogger(__name__)
+
+# stats which are not counters of a worker (set, not incremented),
+# the largest value of all workers is kept instead of their sum
+MAX_STATS = frozenset(
+    {
+        "yit/page_size",
+        "mongo/generation",
+        "httpcache/size_bytes",
+    }
+)
+MAX_STATS_PREFIXES = ("memusage/",)
+
+
+@dataclasses.dataclass(frozen=True)
+class Job:
+    spider: str
+    kwargs: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+    job: Job
+    exitcode: int
+    stats: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+def plan(
+    spider_loader: SpiderLoader, workers: int, kwargs: dict[str, Any]
+) -> Iterator[Job]:
+    """
+    One job per spider, spiders with `SHARDABLE = True` are split
+    into `workers` jobs, each crawling only its `shard` of listing pages.
+    """
+    for name in spider_loader.list():
+        shards = workers if getattr(spider_loader.load(name), "SHARDABLE", False) else 1
+        if shards == 1:
+            yield Job(name, kwargs)
+            continue
+        for shard in range(shards):
+            yield Job(name, kwargs | {"shard": shard, "shards": shards})
+
+
+def crawl(job: Job, settings: dict[str, Any], workers: int) -> Result:
+    """
+    Runs single job in a fresh worker process (twisted reactor can't be restarted),
+    so every worker has its own reactor and its own Mongo/MinIO/geocoding clients
+    created by pipelines and `shared` modules in that process.
+    """
+    # NOTE: geocoder throttles requests per process, keep the overall rate the same
+    interval = Settings().GEOCODING_MIN_INTERVAL * workers
+    os.environ["GEOCODING_MIN_INTERVAL"] = str(interval)
+    if path := settings.get("METRICS_FILE"):
+        shard = job.kwargs.get("shard")
+        settings = settings | {"METRICS_FILE": metrics_file(path, job.spider, shard)}
+
+    process = CrawlerProcess(ScrapySettings(settings))
+    crawler = process.create_crawler(job.spider)
+    try:
+        process.crawl(crawler, **job.kwargs)
+        process.start()
+    except Exception:
+        logger.exception(f"Worker running {job} failed")
+        return Result(job, exitcode=1)
+
+    stats = crawler.stats.get_stats() if crawler.stats is not None else {}
+    failed = process.bootstrap_failed or stats.get("finish_reason") != "finished"
+    return Result(job, exitcode=int(failed), stats=stats)
+
+
+def merge_stats(stats: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Counters are summed, the largest values of `MAX_STATS` are kept,
+    so are earliest start and latest finish time. Ratios are computed again
+    from the summed counters.
+    """
+    merged: dict[str, Any] = {}
+    for worker_stats in stats:
+        for key, value in worker_stats.items():
+            if key not in merged:
+                merged[key] = value
+                continue
+            match value:
+                case bool():
+                    merged[key] = merged[key] or value
+                case int() | float() if (
+                    key in MAX_STATS or key.startswith(MAX_STATS_PREFIXES)
+                ):
+                    merged[key] = max(merged[key], value)
+                case int() | float():
+                    merged[key] += value
+                case datetime.datetime() if key == "start_time":
+                    merged[key] = min(merged[key], value)
+                case datetime.datetime():
+                    merged[key] = max(merged[key], value)
+                case _ if value != merged[key]:
+                    merged[key] = f"{merged[key]}, {value}"
+    if "start_time" in merged and "finish_time" in merged:
+        elapsed = merged["finish_time"] - merged["start_time"]
+        merged["elapsed_time_seconds"] = elapsed.total_seconds()
+    if (ratio := hit_ratio(merged)) is not None:
+        merged["httpcache/hit_ratio"] = ratio
+    return merged
+
 
 class Command(scrapy.commands.ScrapyCommand):
     """
@@ -20,7 +140,12 @@ class Command(scrapy.commands.ScrapyCommand):
     Name of the command defines filename where `Command` implementation is located.
     Examples (standard CLI commands): https://github.com/scrapy/scrapy/tree/master/scrapy/commands
 
-    Usage: scrapy run
+    Usage: scrapy run [--workers N]
+
+    With `--workers N` spiders (and listing pages of shardable spiders) are crawled
+    by up to N processes, as parsing and validation are CPU-bound and a single
+    `CrawlerProcess` uses only one core. Stats of shards are merged per spider
+    and exit code is non-zero if any of the workers failed.
 
     Other options to implement this pattern:
         Sequential crawling from shell.
@@ -39,19 +164,63 @@ class Command(scrapy.commands.ScrapyCommand):
     def short_desc(self) -> str:
         return "Run all spiders [custom command]"
 
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            metavar="N",
+            help="number of crawling processes (default: 1, in this process)",
+        )
+
     def run(self, _: Any, opts: Namespace) -> None:
         settings = self.crawler_process.settings
         ensure_s3_bucket_exists(
-            get_s3_client(
+            s3_client(
                 settings["AWS_ACCESS_KEY_ID"],
                 settings["AWS_SECRET_ACCESS_KEY"],
                 settings["AWS_ENDPOINT_URL"],
+                settings["DOTENV_SETTINGS"],
             ),
             settings["BUCKET"],
         )
 
+        kwargs = vars(opts).copy()
+        workers = kwargs.pop("workers")
+        if workers > 1:
+            self.run_parallel(workers, kwargs)
+            return
+
         for spider_name in self.crawler_process.spider_loader.list():
-            self.crawler_process.crawl(spider_name, **vars(opts))
+            self.crawler_process.crawl(spider_name, **kwargs)
         self.crawler_process.start()
+        if self.crawler_process.bootstrap_failed:
+            self.exitcode = 1
         # TODO(logs to minio): create temp file, send it as param to .crawl() to redirect logs,
         # then maybe print it and upload to S3/Minio
+
+    def run_parallel(self, workers: int, kwargs: dict[str, Any]) -> None:
+        jobs = list(plan(self.crawler_process.spider_loader, workers, kwargs))
+        settings = self.crawler_process.settings.copy_to_dict()
+        # NOTE: spawn, forked children would inherit installed reactor and open sockets
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            processes=min(workers, len(jobs)), maxtasksperchild=1
+        ) as pool:
+            results = pool.starmap(
+                crawl, ((job, settings, workers) for job in jobs), chunksize=1
+            )
+
+        for spider in dict.fromkeys(result.job.spider for result in results):
+            spider_results = [
+                result for result in results if result.job.spider == spider
+            ]
+            stats = merge_stats(result.stats for result in spider_results)
+            failed = sum(result.exitcode != 0 for result in spider_results)
+            logger.info(
+                f"{spider}: {len(spider_results)} worker(s), {failed} failed, "
+                f"merged stats:\n{pprint.pformat(stats)}"
+            )
+        self.exitcode = max(result.exitcode for result in results)
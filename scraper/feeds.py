@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import datetime
+import enum
+from typing import TYPE_CHECKING
+
+import geojson
+import orjson
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+from pydantic.json import pydantic_encoder
+from scrapy.exceptions import NotConfigured
+from scrapy.exporters import BaseItemExporter
+from scrapy.extensions.feedexport import S3FeedStorage
+from scrapy.utils.misc import load_object
+
+from shared.s3 import MULTIPART_PART_SIZE, upload_file
+
+if TYPE_CHECKING:
+    from typing import Any, BinaryIO
+
+    import pyarrow
+    from pydantic.fields import ModelField
+    from scrapy import Spider
+    from scrapy.crawler import Crawler
+    from typing_extensions import Self
+
+
+def uri_params(params: dict[str, Any], spider: Spider) -> dict[str, Any]:
+    """
+    FEED_URI_PARAMS, adds `%(shard)s`, so shards of the same spider
+    crawled by `scrapy run --workers N` don't overwrite each other's feed.
+    """
+    shard, shards = getattr(spider, "shard", 0), getattr(spider, "shards", 1)
+    return params | {"shard": f".{shard + 1}-of-{shards}" if shards > 1 else ""}
+
+
+class JsonLinesExporter(BaseItemExporter):
+    """
+    NDJSON serialised by orjson, several times faster than scrapy's
+    `JsonLinesItemExporter` with `default=pydantic_encoder` for nested models.
+    """
+
+    def __init__(self, file: BinaryIO, **kwargs: Any) -> None:
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+
+    def export_item(self, item: Any) -> None:
+        itemdict = dict(self._get_serialized_fields(item))
+        option = orjson.OPT_APPEND_NEWLINE
+        self.file.write(orjson.dumps(itemdict, default=pydantic_encoder, option=option))
+
+
+class GzipPlugin:
+    """
+    Feed postprocessing plugin, like `scrapy.extensions.postprocessing.GzipPlugin`,
+    but the target file is left open, because scrapy 2.9 passes the very same
+    (then closed and deleted) temporary file to S3 feed storage for upload.
+    Options: `gzip_compresslevel` (6 by default, 9 is a lot slower for ~2% less).
+    """
+
+    def __init__(self, file: BinaryIO, feed_options: dict[str, Any]) -> None:
+        import gzip
+
+        self.file = file
+        self.compressor = gzip.GzipFile(
+            fileobj=file,
+            mode="wb",
+            compresslevel=feed_options.get("gzip_compresslevel", 6),
+            mtime=0,  # reproducible output
+        )
+
+    def write(self, data: bytes) -> int:
+        return self.compressor.write(data)
+
+    def close(self) -> None:
+        self.compressor.close()
+        self.file.flush()
+
+
+class ZstdPlugin:
+    """
+    Feed postprocessing plugin compressing by zstd (`pip install zstandard`),
+    faster than gzip at a better ratio. Options: `zstd_level` (3 by default).
+    """
+
+    def __init__(self, file: BinaryIO, feed_options: dict[str, Any]) -> None:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise NotConfigured("ZstdPlugin requires zstandard package") from e
+
+        self.file = file
+        compressor = zstandard.ZstdCompressor(level=feed_options.get("zstd_level", 3))
+        self.compressor = compressor.stream_writer(file, closefd=False)
+
+    def write(self, data: bytes) -> int:
+        return int(self.compressor.write(data))
+
+    def close(self) -> None:
+        self.compressor.close()
+        self.file.flush()
+
+
+def _arrow_type(field: ModelField) -> pyarrow.DataType:
+    import pyarrow as pa
+
+    type_ = field.type_
+    if isinstance(type_, type) and issubclass(type_, BaseModel):
+        arrow_type = pa.struct(list(arrow_schema(type_)))
+    elif type_ is geojson.Point:
+        arrow_type = pa.struct(
+            [("type", pa.string()), ("coordinates", pa.list_(pa.float64()))]
+        )
+    elif type_ is bool:
+        arrow_type = pa.bool_()
+    elif isinstance(type_, type) and issubclass(type_, int):
+        arrow_type = pa.int64()
+    elif isinstance(type_, type) and issubclass(type_, float):
+        arrow_type = pa.float64()
+    elif type_ is datetime.datetime:
+        arrow_type = pa.timestamp("us")
+    else:  # str, enums, urls, ObjectId
+        arrow_type = pa.string()
+
+    if field.shape == SHAPE_LIST:
+        return pa.list_(arrow_type)
+    if field.shape != SHAPE_SINGLETON:  # e.g. dict[str, Any], as JSON
+        return pa.string()
+    return arrow_type
+
+
+def arrow_schema(model: type[BaseModel]) -> pyarrow.Schema:
+    """Fixed Arrow schema of a pydantic model, nested models are structs."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field(name, _arrow_type(field), nullable=not field.required)
+            for name, field in model.__fields__.items()
+        ]
+    )
+
+
+def _arrow_value(field: ModelField, value: Any) -> Any:
+    if value is None:
+        return None
+    if field.shape == SHAPE_LIST:
+        return [_arrow_singleton(v) for v in value]
+    if field.shape != SHAPE_SINGLETON:
+        return orjson.dumps(value, default=pydantic_encoder).decode()
+    return _arrow_singleton(value)
+
+
+def _arrow_singleton(value: Any) -> Any:
+    match value:
+        case BaseModel():
+            return {
+                name: _arrow_value(subfield, getattr(value, name))
+                for name, subfield in value.__fields__.items()
+            }
+        case geojson.Point():
+            return {"type": value["type"], "coordinates": list(value["coordinates"])}
+        case enum.Enum():
+            return value.value
+        case bool() | int() | float() | datetime.datetime():
+            return value
+        case _:
+            return str(value)
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """
+    Parquet (`pip install pyarrow`) with a fixed schema derived from the item
+    model (`shared.models.Apartment` by default), written in row groups of
+    `row_group_size` items, so memory doesn't depend on number of items.
+    Options: `item_model`, `row_group_size`, `compression` (zstd by default).
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        item_model: type[BaseModel] | str = "shared.models.Apartment",
+        row_group_size: int = 5_000,
+        compression: str = "zstd",
+        **kwargs: Any,
+    ) -> None:
+        try:
+            import pyarrow.parquet
+        except ImportError as e:
+            raise NotConfigured("ParquetItemExporter requires pyarrow package") from e
+
+        super().__init__(dont_fail=True, **kwargs)
+        self.model: type[BaseModel] = load_object(item_model)
+        self.schema = arrow_schema(self.model)
+        self.row_group_size = row_group_size
+        self.rows: list[dict[str, Any]] = []
+        self.writer = pyarrow.parquet.ParquetWriter(
+            file, self.schema, compression=compression
+        )
+
+    def export_item(self, item: BaseModel) -> None:
+        self.rows.append(
+            {
+                name: _arrow_value(field, getattr(item, name))
+                for name, field in self.model.__fields__.items()
+            }
+        )
+        if len(self.rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self) -> None:
+        import pyarrow as pa
+
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, self.schema))
+            self.rows.clear()
+
+    def finish_exporting(self) -> None:
+        self._write_row_group()
+        # NOTE: writes the footer, file object passed by scrapy is left open
+        self.writer.close()
+
+
+class MultipartS3FeedStorage(S3FeedStorage):
+    """
+    S3 feed storage uploading the temporary feed file by parts of
+    FEED_STORAGE_S3_PART_SIZE bytes (`shared.s3.upload_file`), instead of
+    a single put_object of the whole file.
+    """
+
+    def __init__(
+        self, uri: str, *args: Any, part_size: int = MULTIPART_PART_SIZE, **kwargs: Any
+    ) -> None:
+        super().__init__(uri, *args, **kwargs)
+        self.part_size = part_size
+
+    @classmethod
+    def from_crawler(
+        cls, crawler: Crawler, uri: str, *, feed_options: dict[str, Any] | None = None
+    ) -> Self:
+        storage: Self = super().from_crawler(crawler, uri, feed_options=feed_options)
+        storage.part_size = crawler.settings.getint(
+            "FEED_STORAGE_S3_PART_SIZE", MULTIPART_PART_SIZE
+        )
+        return storage
+
+    def _store_in_thread(self, file: BinaryIO) -> None:
+        file.seek(0)
+        kwargs = {"ACL": self.acl} if self.acl else {}
+        upload_file(
+            self.s3_client,
+            file,
+            self.bucketname,
+            self.keyname,
+            part_size=self.part_size,
+            **kwargs,
+        )
+        file.close()
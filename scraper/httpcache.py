@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from scrapy import signals
+from scrapy.extensions.httpcache import FilesystemCacheStorage
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from typing import Any
+
+    from scrapy import Spider
+    from scrapy.crawler import Crawler
+    from scrapy.http import Request, Response
+    from scrapy.settings import BaseSettings
+    from scrapy.statscollectors import StatsCollector
+    from typing_extensions import Self
+
+
+class BoundedFilesystemCacheStorage(FilesystemCacheStorage):
+    """
+    Scrapy's filesystem HTTP cache storage (gzipped by HTTPCACHE_GZIP) limited
+    to HTTPCACHE_MAX_SIZE bytes (0 = unlimited) per spider. When the limit
+    is exceeded, least recently used entries are evicted down to 90 % of it,
+    so the eviction (sorting all entries) doesn't run on every stored response.
+
+    Revalidation (If-None-Match/If-Modified-Since, 304) is done by
+    `HttpCacheMiddleware` with `RFC2616Policy`, see settings.
+    """
+
+    def __init__(self, settings: BaseSettings) -> None:
+        super().__init__(settings)
+        self.max_size = settings.getint("HTTPCACHE_MAX_SIZE")
+        self.stats: StatsCollector | None = None
+        # entry directory -> (last used, size in bytes), filled in `open_spider`
+        self._entries: dict[Path, tuple[float, int]] = {}
+        self.size = 0  # bytes
+
+    def _add(self, entry: Path, used: float) -> None:
+        _, previous = self._entries.get(entry, (0, 0))
+        size = sum(file.stat().st_size for file in entry.iterdir())
+        self._entries[entry] = (used, size)
+        self.size += size - previous
+
+    def open_spider(self, spider: Spider) -> None:
+        super().open_spider(spider)
+        self.stats = spider.crawler.stats
+        spider_dir = Path(self.cachedir, spider.name)
+        for meta in spider_dir.glob("*/*/pickled_meta"):
+            self._add(meta.parent, meta.parent.stat().st_mtime)
+        self._evict()
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Response | None:
+        response = super().retrieve_response(spider, request)
+        if response is not None:
+            entry = Path(self._get_request_path(spider, request))
+            # NOTE: directory mtime is the "last used" mark, pickled_meta mtime
+            # is used by scrapy for expiration, so it must not be touched
+            os.utime(entry)
+            self._add(entry, time.time())
+        return response
+
+    def store_response(
+        self, spider: Spider, request: Request, response: Response
+    ) -> None:
+        super().store_response(spider, request, response)
+        self._add(Path(self._get_request_path(spider, request)), time.time())
+        self._evict()
+
+    def _evict(self) -> None:
+        if not self.max_size or self.size <= self.max_size:
+            return
+        for entry, (_, size) in sorted(self._entries.items(), key=lambda e: e[1][0]):
+            if self.size <= 0.9 * self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            del self._entries[entry]
+            self.size -= size
+            if self.stats is not None:
+                self.stats.inc_value("httpcache/evicted")
+
+    def close_spider(self, spider: Spider) -> None:
+        if self.stats is not None:
+            self.stats.set_value("httpcache/size_bytes", self.size)
+        super().close_spider(spider)
+
+
+def hit_ratio(stats: Mapping[str, Any]) -> float | None:
+    """Responses served from the cache (fresh or revalidated by 304) of all lookups."""
+    cached = stats.get("httpcache/hit", 0) + stats.get("httpcache/revalidate", 0)
+    lookups = (
+        cached + stats.get("httpcache/miss", 0) + stats.get("httpcache/invalidate", 0)
+    )
+    return round(cached / lookups, 4) if lookups else None
+
+
+class HttpCacheHitRatio:
+    """
+    Extension adding `httpcache/hit_ratio` stat: responses served from
+    the cache (fresh or revalidated by 304) out of all cacheable requests.
+    Workers of `scrapy run --workers N` recompute it from their merged counters.
+    """
+
+    def __init__(self, stats: StatsCollector) -> None:
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        extension = cls(crawler.stats)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_closed(self, spider: Spider) -> None:
+        if (ratio := hit_ratio(self.stats.get_stats())) is not None:
+            self.stats.set_value("httpcache/hit_ratio", ratio)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from typing import Any
+
+    from shared.cache import DiskCache
+
+State = Literal["new", "changed", "skipped"]
+
+
+class Fingerprints:
+    """
+    Fingerprints of listing data (API `Fields`) of already scraped apartments,
+    so unchanged ones don't have to be requested and processed again.
+    Entries are `url -> {"fingerprint", "last_seen"}`, apartments which weren't
+    listed for cache's `ttl` are forgotten.
+    """
+
+    def __init__(self, cache: DiskCache) -> None:
+        self.cache = cache
+
+    @staticmethod
+    def fingerprint(fields: Mapping[str, Any]) -> str:
+        """Hash of all listing fields (price, status, size, ...), key order independent."""
+        dump = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(dump.encode()).hexdigest()
+
+    def check(self, url: str, fields: Mapping[str, Any]) -> tuple[State, str]:
+        fingerprint = self.fingerprint(fields)
+        match self.cache.get(url):
+            case None:
+                state: State = "new"
+            case {"fingerprint": stored} if stored == fingerprint:
+                state = "skipped"
+            case _:
+                state = "changed"
+        return state, fingerprint
+
+    def seen(self, url: str, fingerprint: str) -> None:
+        self.cache.set(url, {"fingerprint": fingerprint, "last_seen": time.time()})
+
+    def close(self) -> None:
+        self.cache.close()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from twisted.internet import task
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+from shared.metrics import REGISTRY, Counter, F, Gauge
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from scrapy import Spider
+    from scrapy.crawler import Crawler
+    from scrapy.statscollectors import StatsCollector
+    from typing_extensions import Self
+
+    from shared.metrics import Labels, Registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def _observe(registry: Registry, pipeline: str, start: float, outcome: str) -> None:
+    registry.histogram("pipeline_seconds", "Item pipelines process_item").observe(
+        time.perf_counter() - start, pipeline=pipeline
+    )
+    registry.counter(
+        "pipeline_items_total", "Items processed by item pipelines"
+    ).inc(pipeline=pipeline, outcome=outcome)
+
+
+def timed_pipeline(registry: Registry = REGISTRY) -> Callable[[F], F]:
+    """
+    Observes `process_item` (sync, async or returning Deferred) of a pipeline:
+        `pipeline_seconds{pipeline}` histogram
+        `pipeline_items_total{pipeline, outcome="ok|dropped|error"}` counter
+    """
+
+    def outcome(error: BaseException | Failure) -> str:
+        if isinstance(error, Failure):
+            return "dropped" if error.check(DropItem) else "error"
+        return "dropped" if isinstance(error, DropItem) else "error"
+
+    def decorator(method: F) -> F:
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def async_wrapper(self: object, *args: Any, **kwargs: Any) -> Any:
+                pipeline, start = type(self).__name__, time.perf_counter()
+                try:
+                    result = await method(self, *args, **kwargs)
+                except Exception as error:
+                    _observe(registry, pipeline, start, outcome(error))
+                    raise
+                _observe(registry, pipeline, start, "ok")
+                return result
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(method)
+        def wrapper(self: object, *args: Any, **kwargs: Any) -> Any:
+            pipeline, start = type(self).__name__, time.perf_counter()
+
+            def succeeded(item: Any) -> Any:
+                _observe(registry, pipeline, start, "ok")
+                return item
+
+            def failed(failure: Failure) -> Failure:
+                _observe(registry, pipeline, start, outcome(failure))
+                return failure
+
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception as error:
+                _observe(registry, pipeline, start, outcome(error))
+                raise
+            if isinstance(result, Deferred):
+                return result.addCallbacks(succeeded, failed)
+            return succeeded(result)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def to_stats(registry: Registry, stats: StatsCollector) -> None:
+    """
+    Only additive values (counters, histogram sums and counts) are copied,
+    so stats of `scrapy run --workers N` can still be merged by summing.
+    Gauges are left out, they are in METRICS_FILE.
+    """
+
+    def key(name: str, labels: Labels) -> str:
+        return "/".join([f"metrics/{name}", *(f"{k}={v}" for k, v in labels)])
+
+    for metric in registry.metrics.values():
+        if isinstance(metric, Gauge):
+            continue
+        if isinstance(metric, Counter):
+            for labels, value in metric.values.items():
+                stats.set_value(key(metric.name, labels), value)
+            continue
+        for labels, (_, total, count) in metric.values.items():
+            stats.set_value(f"{key(metric.name, labels)}/count", count)
+            stats.set_value(f"{key(metric.name, labels)}/sum", round(total, 6))
+
+
+class PipelineMetrics:
+    """
+    Process metrics (`shared.metrics.REGISTRY`, e.g. item pipelines timed by
+    `timed_pipeline()`, page fields, geocoding, photo downloads, bulk writes)
+    are copied to stats when spider closes and written to METRICS_FILE
+    in Prometheus text format every METRICS_INTERVAL seconds
+    (e.g. for node_exporter textfile collector).
+    Workers of `scrapy run --workers N` write their own files, see `metrics_file()`.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        path: str | None = None,
+        interval: float = 15.0,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        self.crawler = crawler
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._writer: task.LoopingCall | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        extension = cls(
+            crawler,
+            path=crawler.settings.get("METRICS_FILE"),
+            interval=crawler.settings.getfloat("METRICS_INTERVAL", 15.0),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider: Spider) -> None:
+        if self.path:
+            self._writer = task.LoopingCall(self.write)
+            self._writer.start(self.interval, now=False)
+
+    def write(self) -> None:
+        """
+        Atomically, so collectors never read half-written file, by a temporary file
+        of its own, failing to write it doesn't stop the periodic writes.
+        """
+        if not self.path:
+            return
+        path = Path(self.path)
+        temporary: str | None = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+            ) as file:
+                temporary = file.name
+                file.write(self.registry.render())
+            os.replace(temporary, path)
+        except OSError as error:
+            logger.warning(f"Cannot write metrics to {path}: {error}")
+            if temporary is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(temporary)
+
+    def spider_closed(self, spider: Spider) -> None:
+        if self._writer is not None and self._writer.running:
+            self._writer.stop()
+        self.write()
+        if self.crawler.stats is not None:
+            to_stats(self.registry, self.crawler.stats)
+
+
+def metrics_file(path: str, spider: str, shard: int | None = None) -> str:
+    """METRICS_FILE of one worker, e.g. `.cache/scraper.yit-0.prom`."""
+    name = spider if shard is None else f"{spider}-{shard}"
+    file = Path(path)
+    return str(file.with_name(f"{file.stem}.{name}{file.suffix}"))
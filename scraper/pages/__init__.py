@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import functools
 from abc import abstractmethod
-from typing import TYPE_CHECKING
+from functools import cached_property
+from typing import TYPE_CHECKING, ClassVar, TypeVar
 
 from web_poet.pages import WebPage
 
+from scraper.pages.html import HtmlAttribute, scan
+from shared.metrics import REGISTRY
 from shared.models import Apartment
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from typing import Any
 
     from scrapy.http import Response
@@ -23,17 +28,43 @@ if TYPE_CHECKING:
         Status,
     )
 
+T = TypeVar("T")
+
+
+def timed_field(function: Callable[[Any], T]) -> Callable[[Any], T]:
+    """Observes `page_field_seconds{page, field}`, put it under `@property`."""
+
+    @functools.wraps(function)
+    def wrapper(self: Any) -> T:
+        histogram = REGISTRY.histogram(
+            "page_field_seconds", "Page object fields extraction"
+        )
+        with histogram.time(page=type(self).__name__, field=function.__name__):
+            return function(self)
+
+    return wrapper
+
 
 # Separation of scraping and data cleaning logic
 # More: https://web-poet.readthedocs.io/
 class ApartmentPage(WebPage[Apartment]):
     response: Response | None  # type: ignore[assignment]
     data: dict[str, Any]
+    # fields extracted from response html by a single streaming scan, see `.html`
+    HTML_FIELDS: ClassVar[dict[str, HtmlAttribute]] = {}
 
     def __init__(self, data: dict[str, Any], *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.data = data
 
+    @cached_property
+    def html(self) -> dict[str, list[str]]:
+        """Values of `HTML_FIELDS`, without building DOM of the response."""
+        if self.response is None or not self.HTML_FIELDS:
+            return {name: [] for name in self.HTML_FIELDS}
+        encoding = getattr(self.response, "encoding", None)
+        return scan(self.response.body, self.HTML_FIELDS, encoding=encoding)
+
     @property
     @abstractmethod
     def url(self) -> str:
@@ -94,6 +125,7 @@ class ApartmentPage(WebPage[Apartment]):
     def photos(self) -> list[str] | None:
         ...
 
+    @timed_field
     def to_item(self) -> Apartment:  # type: ignore[override]
         return Apartment(
             url=self.url,  # type: ignore[arg-type]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import dataclasses
+import html
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterator, Mapping
+
+
+@dataclasses.dataclass(frozen=True)
+class HtmlAttribute:
+    """
+    Values of `attribute` of all `tag` elements in document order (`tag::attr(attribute)`),
+    scanning stops at the start of `stop_at` element or after `limit` values.
+    """
+
+    tag: str
+    attribute: str
+    stop_at: str | None = None
+    limit: int | None = None
+
+
+# raw text elements and comments, tags inside of them are not tags
+_SKIPPED = {
+    b"<script": re.compile(rb"</script", re.IGNORECASE),
+    b"<style": re.compile(rb"</style", re.IGNORECASE),
+    b"<!--": re.compile(rb"-->"),
+}
+_TAG_END = frozenset(" \t\n\r\f/>")
+_TAG_END_BYTES = frozenset(char.encode() for char in _TAG_END)
+# rest of a start tag after its name, `>` in quoted values doesn't end it
+_TAG_REST = re.compile(rb"""(?:[^>"']|"[^"]*"|'[^']*')*>""")
+
+
+def _attributes(text: str, position: int) -> tuple[dict[str, str], int]:
+    """Attributes of start tag from `position` (after tag name) and position after `>`."""
+    attributes: dict[str, str] = {}
+    length = len(text)
+    while position < length:
+        char = text[position]
+        if char == ">":
+            return attributes, position + 1
+        if char.isspace() or char == "/":
+            position += 1
+            continue
+        end = position
+        while end < length and text[end] not in _TAG_END and text[end] != "=":
+            end += 1
+        name, value, position = text[position:end].lower(), "", end
+        while position < length and text[position].isspace():
+            position += 1
+        if position < length and text[position] == "=":
+            position += 1
+            while position < length and text[position].isspace():
+                position += 1
+            if position < length and text[position] in "\"'":
+                end = text.find(text[position], position + 1)
+                end = length if end == -1 else end
+                value, position = text[position + 1 : end], end + 1
+            else:
+                end = position
+                while end < length and not text[end].isspace() and text[end] != ">":
+                    end += 1
+                value, position = text[position:end], end
+        attributes.setdefault(name, html.unescape(value))  # first one wins
+    return attributes, length
+
+
+def start_tags(
+    body: bytes, tags: Collection[str], encoding: str = "utf-8"
+) -> Iterator[tuple[str, dict[str, str]]]:
+    """
+    Start tags of `tags` elements with their attributes in document order.
+    Not a full tokenizer: the document is searched only for declared tags
+    (and comments, scripts and styles to skip), everything else is never looked at.
+    Searched as bytes (ASCII compatible `encoding`), only the found tags are decoded.
+    """
+    markers = {f"<{tag.lower()}".encode() for tag in tags} | set(_SKIPPED)
+    # longer first, so `<abbr` is not found as `<a`
+    pattern = re.compile(
+        b"|".join(re.escape(m) for m in sorted(markers, key=len, reverse=True)),
+        re.IGNORECASE,
+    )
+    position, length = 0, len(body)
+    while (match := pattern.search(body, position)) is not None:
+        marker, position = match.group().lower(), match.end()
+        if (end_marker := _SKIPPED.get(marker)) is not None:
+            end = end_marker.search(body, position)
+            position = length if end is None else end.start()
+            continue
+        if position < length and body[position : position + 1] not in _TAG_END_BYTES:
+            continue  # e.g. <imgx> is not <img>
+        rest = _TAG_REST.match(body, position)
+        end = length if rest is None else rest.end()
+        attributes, _ = _attributes(body[position:end].decode(encoding, "replace"), 0)
+        position = end
+        yield marker[1:].decode(), attributes
+
+
+class _Collector:
+    def __init__(self, fields: Mapping[str, HtmlAttribute]) -> None:
+        self.fields = fields
+        self.values: dict[str, list[str]] = {name: [] for name in fields}
+        self.stopped: set[str] = set()
+
+    @property
+    def done(self) -> bool:
+        return len(self.stopped) == len(self.fields)
+
+    def start(self, tag: str, attributes: Mapping[str, str]) -> None:
+        for name, field in self.fields.items():
+            if name in self.stopped:
+                continue
+            if tag == field.stop_at:
+                self.stopped.add(name)
+            elif tag == field.tag and (value := attributes.get(field.attribute)):
+                self.values[name].append(value)
+                if field.limit is not None and len(self.values[name]) >= field.limit:
+                    self.stopped.add(name)
+
+
+def scan(
+    body: bytes, fields: Mapping[str, HtmlAttribute], encoding: str | None = None
+) -> dict[str, list[str]]:
+    """
+    Extracts declared fields from html without parsing it into a tree (like parsel does),
+    cost depends on number of matching tags, not on size of the whole document,
+    and scanning ends as soon as all fields are stopped.
+    """
+    collector = _Collector(fields)
+    tags = {field.tag for field in fields.values()}
+    tags |= {field.stop_at for field in fields.values() if field.stop_at is not None}
+    encoding = encoding or "utf-8"
+    if "<>".encode(encoding, errors="replace") != b"<>":  # e.g. utf-16
+        body, encoding = body.decode(encoding, errors="replace").encode(), "utf-8"
+    for tag, attributes in start_tags(body, tags, encoding):
+        collector.start(tag, attributes)
+        if collector.done:
+            break
+    return collector.values
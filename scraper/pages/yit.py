@@ -3,7 +3,8 @@ from __future__ import annotations
 from functools import cached_property
 from typing import cast
 
-from scraper.pages import ApartmentPage
+from scraper.pages import ApartmentPage, timed_field
+from scraper.pages.html import HtmlAttribute
 from shared.models import (
     Details,
     Location,
@@ -17,6 +18,10 @@ from shared.models import (
 
 
 class YitSkJsonApartmentPage(ApartmentPage):
+    # NOTE: lazy loaded gallery, the whole page is scanned as by the former
+    # `response.css("img::attr(data-src)")`, footer logos included
+    HTML_FIELDS = {"photos": HtmlAttribute("img", "data-src")}
+
     @property
     def url(self) -> str:
         return "https://www.yit.sk" + cast(str, self.data["_Url"])
@@ -67,6 +72,7 @@ class YitSkJsonApartmentPage(ApartmentPage):
         return self.data.get("FloorNumberCorrectedFrom")
 
     @cached_property
+    @timed_field
     def location(self) -> Location | None:
         return Location.geolocate(
             latitude=self.data["ProjectCoordinatesLatitude"],
@@ -90,7 +96,8 @@ class YitSkJsonApartmentPage(ApartmentPage):
         return combined or None
 
     @property
+    @timed_field
     def photos(self) -> list[str] | None:
         if self.response is None:
             return None
-        return cast(list[str], self.response.css("img::attr(data-src)").getall())
+        return self.html["photos"]
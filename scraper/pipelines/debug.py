@@ -3,6 +3,8 @@ from __future__ import annotations
 import pprint
 from typing import TYPE_CHECKING
 
+from scraper.metrics import timed_pipeline
+
 if TYPE_CHECKING:
     from scrapy import Spider
 
@@ -10,6 +12,7 @@ if TYPE_CHECKING:
 
 
 class PrettyPrintPydantic:
+    @timed_pipeline()
     def process_item(self, item: Apartment, _: Spider) -> Apartment:
         pprint.pprint(item.dict(exclude_unset=True, exclude_none=True))
         return item
@@ -1,34 +1,181 @@
 from __future__ import annotations
 
-from pathlib import Path
+import asyncio
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
 from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
+import botocore.client
 import scrapy
-from scrapy.pipelines.images import ImagesPipeline
+from scrapy.utils.defer import maybe_deferred_to_future
+
+from scraper.metrics import timed_pipeline
+from shared.cache import DiskCache
+from shared.connections import s3_client
+from shared.metrics import timed
+from shared.s3 import is_not_found
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
-    from typing import Any
+    from collections.abc import Awaitable, Callable
+    from typing import Any, TypeVar
 
-    from scrapy import Request
-    from scrapy.pipelines.media import MediaPipeline
+    from scrapy import Spider
+    from scrapy.crawler import Crawler
+    from typing_extensions import Self
 
     from shared.models import Apartment
 
+    T = TypeVar("T")
+
+
+logger = logging.getLogger(__name__)
+
+
+# NOTE: used to be scrapy's ImagesPipeline, which re-downloaded and re-uploaded
+# every photo of every apartment on every crawl, although YIT reuses the same
+# project renders across dozens of apartments.
+class SaveToMinioApartmentPhotos:
+    """
+    Saves apartment photos to MinIO and replaces their urls in `Apartment.photos`
+    by object keys. Photos are content-addressed (`<prefix><sha1 of body><ext>`), so:
+        - already seen url is not downloaded again (url -> key index persisted on disk)
+        - the same photo under different urls is stored once
+        - objects already present in the bucket are not uploaded again (HEAD,
+          results cached with their ETags)
+    Concurrent items sharing a photo wait for one download, uploads are done
+    by a bounded thread pool, so blocking botocore calls never block the reactor.
+
+    Scrapy settings: PHOTOS_PREFIX, PHOTOS_CONCURRENCY, PHOTOS_INDEX_PATH.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        settings = crawler.settings
+        pipeline = cls(
+            s3=s3_client(
+                settings["AWS_ACCESS_KEY_ID"],
+                settings["AWS_SECRET_ACCESS_KEY"],
+                settings["AWS_ENDPOINT_URL"],
+                settings["DOTENV_SETTINGS"],
+            ),
+            bucket=settings["BUCKET"],
+            prefix=settings.get("PHOTOS_PREFIX", "photos/"),
+            index=DiskCache(
+                settings.get("PHOTOS_INDEX_PATH", ":memory:"), table="photos"
+            ),
+            concurrency=settings.getint("PHOTOS_CONCURRENCY", 8),
+        )
+        pipeline.crawler = crawler
+        return pipeline
+
+    def __init__(
+        self,
+        s3: botocore.client.BaseClient,
+        bucket: str,
+        prefix: str = "photos/",
+        index: DiskCache | None = None,
+        concurrency: int = 8,
+    ) -> None:
+        self.crawler: Crawler | None = None
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.index = index if index is not None else DiskCache(":memory:")
+        self._uploader = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="photos"
+        )
+        # url / object key -> pending download / upload shared by concurrent items
+        self._downloads: dict[str, asyncio.Future[str]] = {}
+        self._uploads: dict[str, asyncio.Future[None]] = {}
+
+    @timed("photos_download_seconds")
+    async def download(self, url: str) -> bytes:
+        if self.crawler is None or self.crawler.engine is None:
+            raise RuntimeError("Pipeline is not bound to a running crawler")
+        response = await maybe_deferred_to_future(
+            self.crawler.engine.download(
+                # already indexed by url, no need to keep them in http cache too
+                scrapy.Request(url, meta={"dont_cache": True})
+            )
+        )
+        if response.status != 200:
+            raise ValueError(f"Unexpected status {response.status}")
+        return bytes(response.body)
+
+    def key(self, url: str, body: bytes) -> str:
+        extension = PurePosixPath(urlparse(url).path).suffix.lower() or ".jpg"
+        return f"{self.prefix}{hashlib.sha1(body).hexdigest()}{extension}"
+
+    async def _run(self, function: Callable[..., T], **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._uploader, lambda: function(**kwargs))
+
+    @staticmethod
+    async def _once(
+        inflight: dict[str, asyncio.Future[T]],
+        key: str,
+        function: Callable[[], Awaitable[T]],
+    ) -> T:
+        if (future := inflight.get(key)) is None:
+            future = inflight[key] = asyncio.ensure_future(function())
+            future.add_done_callback(lambda _: inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def upload(self, key: str, body: bytes) -> None:
+        """Upload unless the object exists, known objects are cached with ETags."""
+        if f"s3:{key}" in self.index:
+            return
+        await self._once(self._uploads, key, lambda: self._upload(key, body))
+
+    async def _upload(self, key: str, body: bytes) -> None:
+        try:
+            head = await self._run(self.s3.head_object, Bucket=self.bucket, Key=key)
+        except botocore.client.ClientError as error:
+            if not is_not_found(error):
+                raise
+            content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+            head = await self._run(
+                self.s3.put_object,
+                Bucket=self.bucket,
+                Key=key,
+                Body=body,
+                ContentType=content_type,
+            )
+        self.index.set(f"s3:{key}", head.get("ETag"))
+
+    async def _store(self, url: str) -> str:
+        body = await self.download(url)
+        key = self.key(url, body)
+        await self.upload(key, body)
+        self.index.set(f"url:{url}", key)
+        return key
+
+    async def store(self, url: str) -> str:
+        """Object key of the stored photo."""
+        if (key := self.index.get(f"url:{url}")) is not None:
+            return str(key)
+        return await self._once(self._downloads, url, lambda: self._store(url))
+
+    @timed_pipeline()
+    async def process_item(self, item: Apartment, _: Spider) -> Apartment:
+        results = await asyncio.gather(
+            *(self.store(url) for url in item.photos), return_exceptions=True
+        )
+        photos = []
+        for url, result in zip(item.photos, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Cannot save photo {url} of {item.url}: {result!r}")
+                if self.crawler is not None and self.crawler.stats is not None:
+                    self.crawler.stats.inc_value("photos/errors")
+                continue
+            photos.append(result)
+        item.photos = list(dict.fromkeys(photos))  # same photo under several urls
+        return item
 
-# NOTE: if twisted downloading & botocore uploading are slow,
-# rewrite this pipeline(s) without using FilesPipeline/ImagesPipeline,
-# so downloading is done by aiohttp/httpx and saving to MinIO by aiobotocore
-class SaveToMinioApartmentPhotos(ImagesPipeline):
-    def get_media_requests(
-        self, item: Apartment, _: MediaPipeline.SpiderInfo
-    ) -> Iterator[Request]:
-        photos = item.photos.copy()
-        item.photos.clear()
-        for url in photos:
-            yield scrapy.Request(url)
-
-    def file_path(self, request: Request, item: Apartment, *_: Any, **__: Any) -> str:
-        img_filename = Path(urlparse(request.url).path).name
-        return f"{str(item.id)}/{img_filename}"
+    def close_spider(self, _: Spider) -> None:
+        self._uploader.shutdown(wait=True)
+        self.index.close()
@@ -1,57 +1,226 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
+import logging
 from typing import TYPE_CHECKING
 
-from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
 from scrapy.exceptions import DropItem
+from twisted.internet.defer import Deferred
 
+from scraper.metrics import timed_pipeline
+from shared import connections, history, odm, rollups, writes
+from shared.metrics import timed
 from shared.odm import ApartmentBeanie
 
 if TYPE_CHECKING:
+    from collections.abc import Coroutine
+    from typing import Any
+
+    from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
     from scrapy import Spider
     from scrapy.crawler import Crawler
+    from scrapy.statscollectors import StatsCollector
     from typing_extensions import Self
 
     from shared.models import Apartment
     from shared.settings import Settings
 
 
+logger = logging.getLogger(__name__)
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, None]) -> Deferred[None] | None:
+    """
+    Run coroutine from synchronous scrapy hooks (open_spider/close_spider).
+    With running loop (asyncio reactor) returns a Deferred scrapy waits for.
+    """
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        # https://docs.python.org/3/library/asyncio-task.html#asyncio.create_task
+        # Seems like `asyncio.ensure_future` is getting deprecated/is not recommended.
+        return Deferred.fromFuture(asyncio.create_task(coroutine))
+    loop.run_until_complete(coroutine)
+    return None
+
+
+@dataclasses.dataclass
+class PendingWrite:
+    item: Apartment
+    future: asyncio.Future[None]
+    apartment: ApartmentBeanie
+
+
 class SaveToMongoWithDuplicatesCheck:
+    """
+    Apartments are deduplicated by unique canonical url (see `shared.writes`),
+    repeated scraping of the same apartment only updates it.
+
+    With `bulk_size` > 1 items are buffered and written by one unordered
+    `bulk_write` when the buffer is full, `flush_interval` seconds after
+    the first buffered item, or when the spider is closed.
+    `process_item` still resolves per item, failed writes drop only their items.
+
+    New and changed apartments are also recorded to the history collection,
+    whether they are is told by results of the writes themselves
+    (see `shared.writes.upsert()`), so concurrent flushes never record
+    the same change twice.
+    Market statistics (`shared.rollups`) are refreshed when the spider is closed
+    and the crawl generation is bumped, which invalidates cached API responses.
+
+    Scrapy settings: MONGO_BULK_SIZE (0 = one insert per item), MONGO_BULK_FLUSH_INTERVAL.
+    """
+
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
         settings: Settings = crawler.settings["DOTENV_SETTINGS"]
         return cls(
-            client=AsyncIOMotorClient(settings.MONGO_URL),
+            client=connections.mongo_client(settings),
             database=settings.MONGO_DATABASE,
+            history_collection=settings.MONGO_HISTORY_COLLECTION,
+            stats_collection=settings.MONGO_STATS_COLLECTION,
+            bulk_size=crawler.settings.getint("MONGO_BULK_SIZE", 0),
+            flush_interval=crawler.settings.getfloat("MONGO_BULK_FLUSH_INTERVAL", 1.0),
+            stats=crawler.stats,
         )
 
-    def __init__(self, client: AsyncIOMotorClient, database: str) -> None:
+    def __init__(
+        self,
+        client: AsyncIOMotorClient,
+        database: str,
+        history_collection: str = "apartments_history",
+        stats_collection: str | None = "apartments_stats",
+        bulk_size: int = 0,
+        flush_interval: float = 1.0,
+        stats: StatsCollector | None = None,
+    ) -> None:
         self.client = client
         self.database = database
+        self.history_collection = history_collection
+        self.history: AsyncIOMotorCollection | None = None
+        self.stats_collection = stats_collection
+        self.bulk_size = bulk_size
+        self.flush_interval = flush_interval
+        self.stats = stats
+        self._buffer: list[PendingWrite] = []
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task[None]] = set()
 
-    def open_spider(self, _: Spider) -> None:
-        loop = asyncio.get_event_loop()
-        coroutine = init_beanie(self.client[self.database], document_models=[ApartmentBeanie])  # type: ignore[arg-type]
-        if loop.is_running():
-            # https://docs.python.org/3/library/asyncio-task.html#asyncio.create_task
-            # Seems like `asyncio.ensure_future` is getting deprecated/is not recommended.
-            asyncio.create_task(coroutine)
-        else:
-            loop.run_until_complete(coroutine)
+    async def _open(self) -> None:
+        database = self.client[self.database]
+        await odm.init(database)
+        self.history = await history.ensure_collection(
+            database, self.history_collection
+        )
 
-    async def is_duplicate(self, item: Apartment) -> bool:
-        is_duplicate = False  # TODO duplicates checker
-        return is_duplicate
+    def open_spider(self, _: Spider) -> Deferred[None] | None:
+        return run_coroutine(self._open())
 
+    @timed_pipeline()
     async def process_item(self, item: Apartment, _: Spider) -> Apartment:
         apartment = ApartmentBeanie.parse_obj(item)
-        is_duplicate = await self.is_duplicate(apartment)
-        if is_duplicate:
-            raise DropItem(f"{item.id} is duplicate!")
-        await apartment.insert()
+        loop = asyncio.get_running_loop()
+        pending = PendingWrite(item, loop.create_future(), apartment)
+        if self.bulk_size > 1:
+            await self.buffer(pending)
+        else:
+            await self.write([pending])
+            await pending.future
         return item
 
-    def close_spider(self, _: Spider) -> None:
-        self.client.close()
+    async def buffer(self, pending: PendingWrite) -> None:
+        """Wait until the operations are flushed, raise DropItem if they failed."""
+        loop = asyncio.get_running_loop()
+        self._buffer.append(pending)
+        if len(self._buffer) >= self.bulk_size:
+            self._schedule_flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(
+                self.flush_interval, self._schedule_flush
+            )
+        await pending.future
+
+    def _schedule_flush(self) -> None:
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+
+        self._inc_stats("mongo/bulk_flushes")
+        await self.write(batch)
+
+    @timed("mongo_bulk_write_seconds")
+    async def write(self, batch: list[PendingWrite]) -> None:
+        """Write all apartments by one bulk request, resolve futures of their items."""
+        apartments = [pending.apartment for pending in batch]
+        collection = ApartmentBeanie.get_motor_collection()
+        upserted = await writes.upsert(collection, apartments)
+        inserted, updated = len(upserted.created), upserted.modified
+        self._inc_stats("mongo/inserted", inserted)
+        self._inc_stats("mongo/updated", updated)
+        # NOTE: one apartment may modify the document by both of its updates
+        self._inc_stats(
+            "mongo/unchanged",
+            max(0, len(batch) - len(upserted.errors) - inserted - updated),
+        )
+        await self.record_history(apartments, upserted)
+
+        for index, pending in enumerate(batch):
+            if pending.future.done():  # cancelled meanwhile
+                continue
+            if (message := upserted.errors.get(index)) is None:
+                pending.future.set_result(None)
+                continue
+            logger.error(f"Cannot save {pending.item.url} to mongo: {message}")
+            self._inc_stats("mongo/write_errors")
+            pending.future.set_exception(DropItem(f"{pending.item.id}: {message}"))
+
+    async def record_history(
+        self, batch: list[ApartmentBeanie], upserted: writes.Upserted
+    ) -> None:
+        """New and changed apartments, failing to record them doesn't drop items."""
+        if self.history is None:
+            return
+        try:
+            points = await writes.record_history(self.history, batch, upserted)
+        except PyMongoError as error:
+            logger.error(f"Cannot record history of {len(batch)} apartments: {error}")
+            self._inc_stats("mongo/history_errors")
+        else:
+            if points:
+                self._inc_stats("mongo/history_points", points)
+
+    def _inc_stats(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    async def refresh_stats(self) -> None:
+        if self.stats_collection is None:
+            return
+        collection = self.client[self.database][self.stats_collection]
+        try:
+            await rollups.refresh(ApartmentBeanie.get_motor_collection(), collection)
+            generation = await rollups.bump_generation(collection)
+        except PyMongoError as error:
+            logger.error(f"Cannot refresh market statistics: {error}")
+        else:
+            self._inc_stats("mongo/stats_refreshed")
+            if self.stats is not None:
+                self.stats.set_value("mongo/generation", generation)
+
+    async def _close(self) -> None:
+        await self.flush()
+        await asyncio.gather(*self._flushes)
+        await self.refresh_stats()
+        connections.close_mongo_client(self.client)
+
+    def close_spider(self, _: Spider) -> Deferred[None] | None:
+        return run_coroutine(self._close())
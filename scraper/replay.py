@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+
+if TYPE_CHECKING:
+    from typing import Any, Literal
+
+    from scrapy import Request, Spider
+    from scrapy.crawler import Crawler
+    from scrapy.http import Response
+    from scrapy.statscollectors import StatsCollector
+    from typing_extensions import Self
+
+    Key = tuple[str, str, bytes]
+
+
+logger = logging.getLogger(__name__)
+
+# already decoded by downloader middlewares, must not be applied twice
+_DROPPED_HEADERS = {b"content-encoding", b"content-length", b"transfer-encoding"}
+
+
+class Archive:
+    """
+    Recorded responses keyed by request method, url and body.
+    Saved as a subset of HAR 1.2 (http://www.softwareishard.com/blog/har-12-spec/),
+    so it can be inspected by any HAR viewer; binary bodies are base64 encoded.
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[Key, dict[str, Any]] = {}
+
+    @staticmethod
+    def key(method: str, url: str, body: bytes) -> Key:
+        return method.upper(), url, body
+
+    def add(self, request: Request, response: Response, url: str | None = None) -> None:
+        """`url` overrides the request url, e.g. for the url before redirect."""
+        url = url or request.url
+        headers = [
+            {"name": name.decode(), "value": value.decode("latin-1")}
+            for name, values in response.headers.items()
+            if name.lower() not in _DROPPED_HEADERS
+            for value in values
+        ]
+        try:
+            content = {"text": response.body.decode()}
+        except UnicodeDecodeError:
+            content = {"text": base64.b64encode(response.body).decode()}
+            content["encoding"] = "base64"
+        self.entries[self.key(request.method, url, request.body)] = {
+            "request": {
+                "method": request.method,
+                "url": url,
+                "postData": {"text": request.body.decode()},
+            },
+            "response": {
+                "status": response.status,
+                "headers": headers,
+                "content": content,
+            },
+        }
+
+    def get(self, request: Request) -> Response | None:
+        entry = self.entries.get(self.key(request.method, request.url, request.body))
+        if entry is None:
+            return None
+        content = entry["response"]["content"]
+        body = (
+            base64.b64decode(content["text"])
+            if content.get("encoding") == "base64"
+            else content["text"].encode()
+        )
+        headers = Headers()
+        for header in entry["response"]["headers"]:
+            headers.appendlist(header["name"], header["value"])
+        cls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return cls(
+            url=request.url,
+            status=entry["response"]["status"],
+            headers=headers,
+            body=body,
+            request=request,
+            flags=["replayed"],
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def dump(self) -> dict[str, Any]:
+        return {"log": {"version": "1.2", "entries": list(self.entries.values())}}
+
+    def save(self, path: str | Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.dump(), ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path: str | Path) -> Self:
+        archive = cls()
+        for entry in json.loads(Path(path).read_text())["log"]["entries"]:
+            request = entry["request"]
+            key = cls.key(
+                request["method"], request["url"], request["postData"]["text"].encode()
+            )
+            archive.entries[key] = entry
+        return archive
+
+
+class ReplayMiddleware:
+    """
+    Downloader middleware for crawling without network:
+        REPLAY_MODE = "record": responses are saved to REPLAY_ARCHIVE when spider closes
+        REPLAY_MODE = "replay": responses are served from REPLAY_ARCHIVE,
+            requests which were not recorded are ignored (`replay/missing` stat)
+
+    Example: `scrapy run -s REPLAY_MODE=record -s REPLAY_ARCHIVE=yit.har.json`
+    """
+
+    def __init__(
+        self,
+        mode: Literal["record", "replay"],
+        path: str | Path,
+        stats: StatsCollector | None = None,
+    ) -> None:
+        self.mode = mode
+        self.path = path
+        self.stats = stats
+        self.archive = Archive.load(path) if mode == "replay" else Archive()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        mode = crawler.settings.get("REPLAY_MODE")
+        if mode not in ("record", "replay"):
+            raise NotConfigured
+        middleware = cls(mode, crawler.settings["REPLAY_ARCHIVE"], crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _inc(self, key: str) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(f"replay/{key}")
+
+    def process_request(self, request: Request, spider: Spider) -> Response | None:
+        if self.mode != "replay":
+            return None
+        response = self.archive.get(request)
+        if response is None:
+            self._inc("missing")
+            raise IgnoreRequest(f"Not recorded: {request}")
+        self._inc("hit")
+        return response
+
+    def process_response(
+        self, request: Request, response: Response, spider: Spider
+    ) -> Response:
+        if self.mode == "record" and "replayed" not in response.flags:
+            # NOTE: redirects are followed before this middleware gets the response,
+            # final one is recorded also for the original urls
+            for url in [*request.meta.get("redirect_urls", ()), request.url]:
+                self.archive.add(request, response, url=url)
+            self._inc("recorded")
+        return response
+
+    def spider_closed(self, spider: Spider) -> None:
+        if self.mode == "record":
+            self.archive.save(self.path)
+            logger.info(f"Recorded {len(self.archive)} responses to {self.path}")
@@ -1,6 +1,6 @@
 import datetime
-
-from pydantic.json import pydantic_encoder
+from importlib.util import find_spec
+from typing import Any
 
 from shared.settings import Settings
 
@@ -20,6 +20,28 @@ ROBOTSTXT_OBEY = True
 CONCURRENT_REQUESTS = 16
 AUTOTHROTTLE_ENABLED = True
 
+# detail pages are revalidated by ETag/Last-Modified (304) instead of re-downloaded,
+# listing API and photos are not cached (`dont_cache`)
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+HTTPCACHE_STORAGE = f"{PROJECT_NAME}.httpcache.BoundedFilesystemCacheStorage"
+HTTPCACHE_DIR = "httpcache"  # in .scrapy/
+HTTPCACHE_GZIP = True
+HTTPCACHE_MAX_SIZE = 512 * 1024 * 1024  # bytes, least recently used are evicted
+HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS = ["no-cache", "no-store"]
+# offline crawls: REPLAY_MODE = "record" | "replay", see `scraper.replay`
+# (disable HTTPCACHE_ENABLED when replaying, so replayed responses are not stored)
+DOWNLOADER_MIDDLEWARES = {f"{PROJECT_NAME}.replay.ReplayMiddleware": 50}
+REPLAY_MODE = None
+REPLAY_ARCHIVE = ".cache/replay.har.json"
+EXTENSIONS = {
+    f"{PROJECT_NAME}.httpcache.HttpCacheHitRatio": 500,
+    f"{PROJECT_NAME}.metrics.PipelineMetrics": 500,
+}
+# timings of pipelines, page fields, geocoding, ... in Prometheus text format
+METRICS_FILE = ".cache/scraper.prom"
+METRICS_INTERVAL = 15  # seconds
+
 LOG_LEVEL = "INFO"
 LOG_SHORT_NAMES = True
 
@@ -27,7 +49,9 @@ DOTENV_SETTINGS = Settings()
 
 BUCKET = DOTENV_SETTINGS.MINIO_BUCKET
 FILES_STORE = f"s3://{BUCKET}/"
-IMAGES_STORE = f"s3://{BUCKET}/photos/"
+PHOTOS_PREFIX = "photos/"
+PHOTOS_CONCURRENCY = 8  # parallel uploads to MinIO
+PHOTOS_INDEX_PATH = ".cache/photos.sqlite3"  # already stored photo urls
 
 AWS_ACCESS_KEY_ID = DOTENV_SETTINGS.MINIO_LOGIN
 AWS_SECRET_ACCESS_KEY = DOTENV_SETTINGS.MINIO_PASSWORD
@@ -37,20 +61,51 @@ AWS_USE_SSL, AWS_VERIFY = True, True
 ITEM_PIPELINES: dict[str, int] = {
     # f"{PROJECT_NAME}.pipelines.debug.PrettyPrintPydantic": 0,
     "scrapy.pipelines.files.FilesPipeline": 1,  # NOTE: required by FEEDS below
+    # before mongo, so saved apartments point at stored photos
+    f"{PROJECT_NAME}.pipelines.minio.SaveToMinioApartmentPhotos": 500,
     f"{PROJECT_NAME}.pipelines.mongo.SaveToMongoWithDuplicatesCheck": 600,
-    f"{PROJECT_NAME}.pipelines.minio.SaveToMinioApartmentPhotos": 700,
 }
 
+# buffer items and save them by unordered bulk writes (0 disables buffering)
+MONGO_BULK_SIZE = 100
+MONGO_BULK_FLUSH_INTERVAL = 1.0  # seconds since the first buffered item
+
+# apartments per listing API request, smaller page is used if API caps it
+YIT_PAGE_SIZE = 100
+
+# skip apartments with unchanged listing data since last crawl (-s INCREMENTAL=True),
+# NOTE: skipped apartments are not in the FEEDS snapshot below
+INCREMENTAL = False
+INCREMENTAL_STORE_PATH = ".cache/incremental.sqlite3"
+INCREMENTAL_TTL = 7 * 24 * 60 * 60  # forget apartments not listed for a week
+
+# NOTE: `%(shard)s` is empty unless spider is sharded by `scrapy run --workers N`
+FEED_URI_PARAMS = f"{PROJECT_NAME}.feeds.uri_params"
+FEED_EXPORTERS = {
+    "jsonl": f"{PROJECT_NAME}.feeds.JsonLinesExporter",
+    "parquet": f"{PROJECT_NAME}.feeds.ParquetItemExporter",
+}
+# uploaded by multipart upload, in parts of FEED_STORAGE_S3_PART_SIZE bytes
+FEED_STORAGES = {"s3": f"{PROJECT_NAME}.feeds.MultipartS3FeedStorage"}
+FEED_STORAGE_S3_PART_SIZE = 8 * 1024 * 1024
 today_str = datetime.date.strftime(datetime.date.today(), "%d.%m.%Y")
-FEEDS = {
-    f"{FILES_STORE}/apartments/%(name)s.{today_str}.json": {
-        "format": "json",
-        "encoding": "utf-8",
-        "indent": 2,
+# compressed NDJSON, zstd if `zstandard` is installed (`pip install .[feeds]`)
+compression, extension = (
+    (f"{PROJECT_NAME}.feeds.ZstdPlugin", "zst")
+    if find_spec("zstandard")
+    else (f"{PROJECT_NAME}.feeds.GzipPlugin", "gz")
+)
+FEEDS: dict[str, dict[str, Any]] = {
+    f"{FILES_STORE}/apartments/%(name)s%(shard)s.{today_str}.jsonl.{extension}": {
+        "format": "jsonl",
         "store_empty": True,
-        "item_export_kwargs": {
-            "default": pydantic_encoder,  # fixes json.dumps(pydantic_model)
-            "ensure_ascii": False,  # let utf-8 be readable in mongo-express
-        },
+        "postprocessing": [compression],
     }
 }
+# columnar copy for analytics, schema derived from `shared.models.Apartment`
+if find_spec("pyarrow"):
+    FEEDS[f"{FILES_STORE}/apartments/%(name)s%(shard)s.{today_str}.parquet"] = {
+        "format": "parquet",
+        "store_empty": True,
+        "item_export_kwargs": {"row_group_size": 5_000},
+    }
@@ -6,15 +6,21 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 import scrapy
+from scrapy import signals
 from scrapy.http import JsonRequest, Request
 
+from scraper.incremental import Fingerprints
 from scraper.pages.yit import YitSkJsonApartmentPage
+from shared.cache import DiskCache
+from shared.models import Location
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import AsyncIterator, Iterator
     from typing import Any, Callable
 
+    from scrapy.crawler import Crawler
     from scrapy.http import Response, TextResponse
+    from typing_extensions import Self
 
     from shared.models import Apartment
 
@@ -23,21 +29,79 @@ class YitSkFlatsForSale(scrapy.Spider):
     name = "yit.sk"
     allowed_domains = ("yit.sk",)
 
+    SHARDABLE = True  # listing pages can be split between `scrapy run` workers
+
     API_URL = "https://www.yit.sk/api/v1/productsearch/apartments"
-    PER_PAGE = 10
+    PER_PAGE = 100  # default of YIT_PAGE_SIZE setting/`page_size` spider arg
+    LISTING_PRIORITY = 10
     BODY = json.loads(
         (Path(__file__).parent / "resources" / "yit.request_body.json").read_text()
     )
 
+    def __init__(
+        self,
+        *args: Any,
+        shard: int | str = 0,
+        shards: int | str = 1,
+        page_size: int | str = PER_PAGE,
+        **kwargs: Any,
+    ) -> None:
+        """`shard` of `shards` (spider args) limits crawled listing pages."""
+        super().__init__(*args, **kwargs)
+        self.page_size = int(page_size)
+        self.shard, self.shards = int(shard), int(shards)
+        if not 0 <= self.shard < self.shards:
+            raise ValueError(f"Invalid shard {self.shard} of {self.shards}")
+        self.fingerprints: Fingerprints | None = None
+        self._pending: dict[str, str] = {}  # url -> fingerprint of requested apartment
+
     @classmethod
+    def from_crawler(cls, crawler: Crawler, *args: Any, **kwargs: Any) -> Self:
+        """
+        Incremental mode (INCREMENTAL setting) skips apartments whose listing
+        data haven't changed since the last crawl, see `scraper.incremental`.
+        """
+        kwargs.setdefault(
+            "page_size", crawler.settings.getint("YIT_PAGE_SIZE", cls.PER_PAGE)
+        )
+        spider: Self = super().from_crawler(crawler, *args, **kwargs)
+        settings = crawler.settings
+        if settings.getbool("INCREMENTAL"):
+            spider.fingerprints = Fingerprints(
+                DiskCache(
+                    settings.get("INCREMENTAL_STORE_PATH", ":memory:"),
+                    ttl=settings.getfloat("INCREMENTAL_TTL") or None,
+                    table="fingerprints",
+                )
+            )
+            crawler.signals.connect(spider.item_scraped, signal=signals.item_scraped)
+        return spider
+
+    def item_scraped(self, item: Apartment) -> None:
+        """Fingerprint is saved only when item went through all pipelines."""
+        fingerprint = self._pending.pop(str(item.url), None)
+        if self.fingerprints is not None and fingerprint is not None:
+            self.fingerprints.seen(str(item.url), fingerprint)
+
+    def closed(self, _: str) -> None:
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+
+    def _is_own_page(self, page: int) -> bool:
+        return page % self.shards == self.shard
+
     def _api_request(
-        cls, page: int, callback: Callable[[Response], Any]
+        self, page: int, page_size: int, callback: Callable[[Response], Any]
     ) -> JsonRequest:
         return JsonRequest(
-            url=cls.API_URL,
-            data=cls.BODY | {"StartPage": page, "PageSize": cls.PER_PAGE},
+            url=self.API_URL,
+            data=self.BODY | {"StartPage": page, "PageSize": page_size},
             method="POST",
             callback=callback,
+            # NOTE: listing pages first, so all detail requests are known early
+            # and scheduler is never starved waiting for the listing tail
+            priority=self.LISTING_PRIORITY,
+            meta={"dont_cache": True},  # listing is always fresh
         )
 
     def start_requests(self) -> tuple[Request]:
@@ -45,7 +109,11 @@ class YitSkFlatsForSale(scrapy.Spider):
         Make first request to API to determine how many apartments/pages are there
         and delegate the response to next method where additional request are made.
         """
-        return (self._api_request(page=0, callback=self.continue_requests),)
+        return (
+            self._api_request(
+                page=0, page_size=self.page_size, callback=self.continue_requests
+            ),
+        )
 
     def continue_requests(self, response: TextResponse) -> Iterator[Request]:
         """
@@ -53,18 +121,34 @@ class YitSkFlatsForSale(scrapy.Spider):
         Calculate how many pages with content are there, so it's not infinite loop
         or `itertools.count()` which should be interrupted with `raise CloseSpider`
         (which doesn't really work as I'd expect) and make the rest of requests.
+        If API returned less hits than requested while there are more, it caps
+        the page size, so the rest of pages are requested by the capped size.
+        Every shard needs the first page for the count, but only its own pages are processed.
         """
-        yield from self.process_listing(response)
-        last_page_plus_one = math.ceil(response.json()["TotalHits"] / self.PER_PAGE)
+        data = response.json()
+        total, hits = data["TotalHits"], len(data.get("Hits") or ())
+        page_size = hits if 0 < hits < min(self.page_size, total) else self.page_size
+        if page_size != self.page_size:
+            self.logger.info(f"API caps page size to {page_size}")
+        if (crawler := getattr(self, "crawler", None)) and crawler.stats is not None:
+            crawler.stats.set_value("yit/page_size", page_size)
+
+        # whole page plan at once, before detail requests of the first page
         yield from (
-            self._api_request(page=page, callback=self.process_listing)
-            for page in range(1, last_page_plus_one)
+            self._api_request(
+                page=page, page_size=page_size, callback=self.process_listing
+            )
+            for page in range(1, math.ceil(total / page_size))
+            if self._is_own_page(page)
         )
+        if self._is_own_page(0):
+            yield from self.process_listing(response)
 
     def process_listing(self, response: TextResponse) -> Iterator[Request]:
         """
-        Yield up to self.PER_PAGE items from single response.
+        Yield up to `page_size` items from single response.
         For each item additionally make a request to its html page to get all photos links.
+        In incremental mode only new and changed apartments are requested.
         """
         data = response.json()
 
@@ -78,14 +162,32 @@ class YitSkFlatsForSale(scrapy.Spider):
                 continue
 
             apartment_html_url = "https://www.yit.sk" + apartment["Fields"]["_Url"]
+            if self.fingerprints is not None:
+                state, fingerprint = self.fingerprints.check(
+                    apartment_html_url, apartment["Fields"]
+                )
+                self.crawler.stats.inc_value(f"incremental/{state}")
+                if state == "skipped":
+                    self.fingerprints.seen(apartment_html_url, fingerprint)
+                    continue
+                self._pending[apartment_html_url] = fingerprint
+
             yield Request(
                 apartment_html_url,  # for photos
                 callback=self.yield_item,
                 cb_kwargs={"json_data": apartment["Fields"]},
             )
 
-    def yield_item(
+    async def yield_item(
         self, response: TextResponse, json_data: dict[str, Any]
-    ) -> Iterator[Apartment]:
-        """Delegate parsing/cleaning part to web-poet pattern implementation."""
+    ) -> AsyncIterator[Apartment]:
+        """
+        Delegate parsing/cleaning part to web-poet pattern implementation.
+        Geolocation is awaited beforehand, so the blocking lookup is done
+        by geocoder's worker thread and the page object only hits the cache.
+        """
+        await Location.ageolocate(
+            latitude=json_data["ProjectCoordinatesLatitude"],
+            longitude=json_data["ProjectCoordinatesLongitude"],
+        )
         yield YitSkJsonApartmentPage(response=response, data=json_data).to_item()
@@ -0,0 +1,254 @@
+"""
+Push feed of new and changed apartments: one source of events read by one task,
+fanned out to any number of subscribers.
+
+Change streams need a replica set or a sharded cluster, standalone servers
+(and mongomock) are polled for new and changed apartments by `updated_at` instead.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import dataclasses
+import datetime
+import logging
+from typing import TYPE_CHECKING, Protocol
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Mapping
+    from typing import Any
+
+    from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = {"insert", "update", "replace", "delete"}
+
+
+@dataclasses.dataclass(frozen=True)
+class Event:
+    token: str  # to resume after this event
+    operation: str  # one of OPERATIONS or "reset", when events were lost
+    id: Any = None
+    document: Mapping[str, Any] | None = None  # None for deletes
+
+
+RESET = Event(token="", operation="reset")
+
+
+class Source(Protocol):
+    def events(self) -> AsyncIterator[Event]:
+        """
+        Endless, when it fails, the next call continues after the last event.
+        Yields RESET when it cannot continue and events may have been lost.
+        """
+        ...
+
+
+class ChangeStreamSource:
+    """
+    Resumes after the last event, unless the stream was invalidated (collection
+    dropped or renamed) or its token is not in the oplog anymore.
+    Then events may have been lost, RESET is yielded and a new stream is started.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection) -> None:
+        self.collection = collection
+        self.token: str | None = None
+
+    async def events(self) -> AsyncIterator[Event]:
+        while True:
+            try:
+                async for event in self._stream():
+                    yield event
+            except OperationFailure as error:
+                # resumable errors are retried by the driver, these are not
+                # (e.g. ChangeStreamHistoryLost), nothing to reset without a token
+                if self.token is None:
+                    raise
+                logger.warning(f"Cannot resume changes of apartments: {error}")
+            self.token = None
+            yield RESET
+
+    async def _stream(self) -> AsyncIterator[Event]:
+        """Events until the stream is invalidated."""
+        resume_after = None if self.token is None else {"_data": self.token}
+        async with self.collection.watch(
+            full_document="updateLookup", resume_after=resume_after
+        ) as stream:
+            async for change in stream:
+                if (operation := change["operationType"]) == "invalidate":
+                    return
+                self.token = change["_id"]["_data"]
+                if operation in OPERATIONS:
+                    yield Event(
+                        token=change["_id"]["_data"],
+                        operation=operation,
+                        id=change["documentKey"]["_id"],
+                        document=change.get("fullDocument"),
+                    )
+
+
+class PollingSource:
+    """
+    New and changed apartments, found by `updated_at` every `interval` seconds.
+    It is set by the writers of `shared.writes` (not by the server) when an apartment
+    is inserted or its tracked fields change, so each poll looks `overlap` seconds
+    back for writes stored late (or by a writer with a late clock) and skips
+    already seen ones. Untracked fields (description, photos, ...) and deletes
+    are not reported, neither are apartments stored before the first poll.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        interval: float = 1.0,
+        overlap: float = 5.0,
+    ) -> None:
+        self.collection = collection
+        self.interval = interval
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self._since: datetime.datetime | None = None  # the latest `updated_at` seen
+        self._seen: set[tuple[ObjectId, datetime.datetime]] = set()
+
+    async def events(self) -> AsyncIterator[Event]:
+        while True:
+            first = self._since is None
+            # naive UTC, as `updated_at` is stored
+            since = (self._since or datetime.datetime.utcnow()) - self.overlap
+            cursor = self.collection.find({"updated_at": {"$gte": since}})
+            documents = await cursor.sort("updated_at").to_list(None)
+            self._seen = {seen for seen in self._seen if seen[1] >= since}
+            for document in documents:
+                id_, updated_at = document["_id"], document["updated_at"]
+                if (id_, updated_at) in self._seen:
+                    continue
+                self._seen.add((id_, updated_at))
+                self._since = max(self._since or updated_at, updated_at)
+                if not first:
+                    # changes of tracked fields are appended to embedded history
+                    operation = "update" if document.get("history") else "insert"
+                    token = f"{id_}-{updated_at.isoformat()}"
+                    yield Event(token, operation, id_, document)
+            self._since = self._since or since + self.overlap
+            await asyncio.sleep(self.interval)
+
+
+async def supports_change_streams(database: AsyncIOMotorDatabase) -> bool:
+    try:
+        hello = await database.command("hello")
+    except (PyMongoError, NotImplementedError):  # mongomock
+        return False
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+async def source(
+    database: AsyncIOMotorDatabase, name: str, interval: float = 1.0
+) -> Source:
+    """Change stream of the collection when the server supports it, polling otherwise."""
+    if await supports_change_streams(database):
+        return ChangeStreamSource(database[name])
+    logger.info("Change streams are not supported, polling for changed apartments")
+    return PollingSource(database[name], interval)
+
+
+class Subscription:
+    """Events of one subscriber, ends after RESET when it was too slow to read them."""
+
+    def __init__(self, broadcaster: Broadcaster, max_pending: int) -> None:
+        self.broadcaster = broadcaster
+        self.max_pending = max_pending
+        self.queue: asyncio.Queue[Event | None] = asyncio.Queue()
+
+    def put(self, event: Event) -> None:
+        if self.queue.qsize() < self.max_pending:
+            self.queue.put_nowait(event)
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESET)
+        self.close()
+
+    def close(self) -> None:
+        self.broadcaster.unsubscribe(self)
+        self.queue.put_nowait(None)
+
+    def __aiter__(self) -> Subscription:
+        return self
+
+    async def __anext__(self) -> Event:
+        if (event := await self.queue.get()) is None:
+            raise StopAsyncIteration
+        return event
+
+
+class Broadcaster:
+    """
+    Reads `source` by one task (started by the first subscriber)
+    and keeps the last `buffer_size` events, so a subscriber can resume
+    after a token of any of them. Older or unknown tokens start with RESET,
+    the subscriber has to reload what it needs by the list API then.
+    So does a subscriber with more than `max_pending` unread events,
+    and every subscriber, when the source yields RESET (it lost events).
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        buffer_size: int = 1000,
+        max_pending: int | None = None,
+        retry_interval: float = 1.0,
+    ) -> None:
+        self.source = source
+        self.buffer_size = buffer_size
+        self.max_pending = buffer_size if max_pending is None else max_pending
+        self.retry_interval = retry_interval
+        self._buffer: collections.deque[Event] = collections.deque(maxlen=buffer_size)
+        self._subscriptions: set[Subscription] = set()
+        self._task: asyncio.Task[None] | None = None
+
+    def subscribe(self, after: str | None = None) -> Subscription:
+        subscription = Subscription(self, self.max_pending)
+        if after is not None:
+            tokens = [event.token for event in self._buffer]
+            if after in tokens:
+                for event in list(self._buffer)[tokens.index(after) + 1 :]:
+                    subscription.put(event)
+            else:
+                subscription.put(RESET)
+        self._subscriptions.add(subscription)
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: Event) -> None:
+        if event == RESET:  # events were lost, none of the buffered ones resume
+            self._buffer.clear()
+        else:
+            self._buffer.append(event)
+        for subscription in list(self._subscriptions):
+            subscription.put(event)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async for event in self.source.events():
+                    self.publish(event)
+            except PyMongoError as error:
+                logger.warning(f"Cannot read changes of apartments: {error}")
+            await asyncio.sleep(self.retry_interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for subscription in list(self._subscriptions):
+            subscription.close()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+
+class DiskCache:
+    """
+    Small sqlite-backed key/value store for JSON-serialisable values.
+
+    Entries older than `ttl` seconds are treated as missing and removed on access.
+    When there are more than `max_entries` rows, least recently used ones are evicted.
+    Hits are mostly reads: access time is updated only when it's older than
+    `touch_interval` seconds, so LRU order is that precise. Eviction runs after every
+    `evict_every` (default 10 % of `max_entries`) sets of this instance, until then
+    there may be that many entries more than `max_entries`.
+    Use `path=":memory:"` for a process-local cache (tests, offline runs).
+    Safe to share between threads (e.g. an asyncio loop and its executor)
+    and between processes (`scrapy run --workers N`): files are in WAL mode,
+    so readers don't block the writer, writers wait up to `timeout` seconds
+    for each other instead of failing with "database is locked".
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+        table: str = "cache",
+        timeout: float = 30.0,
+        touch_interval: float = 60.0,
+        evict_every: int | None = None,
+    ) -> None:
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.table = table
+        self.touch_interval = touch_interval
+        self.evict_every = evict_every or max(1, (max_entries or 0) // 10)
+        self._sets = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        if str(path) != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                "stored REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)"
+            )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"SELECT value, stored, accessed FROM {self.table} WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return default
+            value, stored, accessed = row
+            if self.ttl is not None and stored + self.ttl < now:
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return default
+            if accessed + self.touch_interval <= now:
+                self._db.execute(
+                    f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key)
+                )
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._sets += 1
+            if self.max_entries is not None and self._sets % self.evict_every == 0:
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __contains__(self, key: object) -> bool:
+        sentinel = object()
+        return isinstance(key, str) and self.get(key, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        with self._lock:
+            [count] = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return int(count)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,216 @@
+"""
+Clients of MongoDB and S3 configured by `shared.settings.Settings` and shared
+by everything in one process (API lifespan, scraper pipelines and commands),
+so connection pools are opened once instead of by each user.
+
+Pool utilisation is recorded to `shared.metrics.REGISTRY`:
+    mongo_pool_connections, mongo_pool_in_use and mongo_pool_max_size per server,
+    mongo_pool_checkout_failures_total per server and reason ("timeout" when exhausted),
+    s3_requests_in_flight and s3_pool_max_size per endpoint.
+"""
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+import botocore.config
+import botocore.session
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from shared.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable
+    from typing import Any
+
+    import botocore.client
+
+    from shared.settings import Settings
+
+
+_lock = threading.Lock()
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else seconds * 1000
+
+
+def _address(address: tuple[str, int | None]) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connections of each server pool, pymongo calls it synchronously and from its threads."""
+
+    def __init__(self) -> None:
+        self.connections = REGISTRY.gauge("mongo_pool_connections", "Open connections")
+        self.in_use = REGISTRY.gauge("mongo_pool_in_use", "Checked out connections")
+        self.max_size = REGISTRY.gauge("mongo_pool_max_size", "maxPoolSize")
+        self.failures = REGISTRY.counter(
+            "mongo_pool_checkout_failures_total", "Connections not checked out"
+        )
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        # NOTE: only options which are not default
+        max_size = event.options.get("maxPoolSize", 100)
+        self.max_size.set(max_size, address=_address(event.address))
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        self.connections.set(0, address=_address(event.address))
+        self.in_use.set(0, address=_address(event.address))
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self.connections.inc(address=_address(event.address))
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self.connections.dec(address=_address(event.address))
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        pass
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        self.failures.inc(address=_address(event.address), reason=event.reason)
+
+    def connection_checked_out(
+        self, event: monitoring.ConnectionCheckedOutEvent
+    ) -> None:
+        self.in_use.inc(address=_address(event.address))
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self.in_use.dec(address=_address(event.address))
+
+
+def mongo_options(settings: Settings) -> dict[str, Any]:
+    """Keyword arguments of `MongoClient`, they take precedence over MONGO_URL options."""
+    options: dict[str, Any] = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": _ms(settings.MONGO_MAX_IDLE_TIME),
+        "waitQueueTimeoutMS": _ms(settings.MONGO_WAIT_QUEUE_TIMEOUT),
+        "connectTimeoutMS": _ms(settings.MONGO_CONNECT_TIMEOUT),
+        "socketTimeoutMS": _ms(settings.MONGO_SOCKET_TIMEOUT),
+        "serverSelectionTimeoutMS": _ms(settings.MONGO_SERVER_SELECTION_TIMEOUT),
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+
+_mongo_clients: dict[Hashable, AsyncIOMotorClient] = {}
+_mongo_users: dict[int, tuple[Hashable, int]] = {}  # id of client -> key, users
+
+
+def mongo_client(settings: Settings) -> AsyncIOMotorClient:
+    """
+    One client of the same MONGO_URL and options until all of its users
+    released it by `close_mongo_client()` (instead of `.close()`).
+    Motor binds a client to the event loop of its first use,
+    so its users have to share the loop, as they do in one API or scraper process.
+    """
+    options = mongo_options(settings)
+    key = (AsyncIOMotorClient, settings.MONGO_URL, tuple(sorted(options.items())))
+    with _lock:
+        if (client := _mongo_clients.get(key)) is None:
+            client = AsyncIOMotorClient(
+                settings.MONGO_URL, event_listeners=[PoolMetrics()], **options
+            )
+            _mongo_clients[key] = client
+        _, users = _mongo_users.get(id(client), (key, 0))
+        _mongo_users[id(client)] = key, users + 1
+    return client
+
+
+def close_mongo_client(client: AsyncIOMotorClient) -> None:
+    """Closes the client after its last user, clients not made by `mongo_client()` at once."""
+    with _lock:
+        if (shared := _mongo_users.get(id(client))) is not None:
+            key, users = shared
+            if users > 1:
+                _mongo_users[id(client)] = key, users - 1
+                return
+            del _mongo_users[id(client)]
+            del _mongo_clients[key]
+    client.close()
+
+
+def s3_config(settings: Settings) -> botocore.config.Config:
+    return botocore.config.Config(
+        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        connect_timeout=settings.S3_CONNECT_TIMEOUT,
+        read_timeout=settings.S3_READ_TIMEOUT,
+        retries={"total_max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+        tcp_keepalive=True,
+    )
+
+
+_session: botocore.session.Session | None = None
+_s3_clients: dict[Hashable, botocore.client.BaseClient] = {}
+
+
+def s3_client(
+    aws_access_key_id: str,
+    aws_secret_access_key: str,
+    endpoint_url: str,
+    settings: Settings,
+) -> botocore.client.BaseClient:
+    """
+    One client of the same credentials, endpoint and S3_* settings per process.
+    botocore clients are thread safe, their keep-alive connections are reused
+    by all threads, up to S3_MAX_POOL_CONNECTIONS at once.
+    """
+    global _session
+    key = (
+        aws_access_key_id,
+        aws_secret_access_key,
+        endpoint_url,
+        settings.S3_MAX_POOL_CONNECTIONS,
+        settings.S3_CONNECT_TIMEOUT,
+        settings.S3_READ_TIMEOUT,
+        settings.S3_MAX_ATTEMPTS,
+    )
+    with _lock:
+        if (client := _s3_clients.get(key)) is not None:
+            return client
+        # NOTE: sessions are not thread safe, loading of their data is slow
+        if _session is None:
+            _session = botocore.session.Session()
+        client = _session.create_client(
+            "s3",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            endpoint_url=endpoint_url,
+            config=s3_config(settings),
+        )
+        _s3_clients[key] = client
+    _instrument(client, endpoint_url, settings.S3_MAX_POOL_CONNECTIONS)
+    return client
+
+
+def _instrument(
+    client: botocore.client.BaseClient, endpoint_url: str, max_pool_connections: int
+) -> None:
+    in_flight = REGISTRY.gauge("s3_requests_in_flight", "HTTP requests being sent")
+    REGISTRY.gauge("s3_pool_max_size", "max_pool_connections").set(
+        max_pool_connections, endpoint=endpoint_url
+    )
+    started = lambda **_: in_flight.inc(endpoint=endpoint_url)
+    finished = lambda **_: in_flight.dec(endpoint=endpoint_url)
+    # NOTE: both are emitted for each attempt, "needs-retry" also after failed ones
+    client.meta.events.register("before-send.s3", started)
+    client.meta.events.register("needs-retry.s3", finished)
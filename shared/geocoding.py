@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING, Protocol
+
+import geopy
+
+from shared.cache import DiskCache
+from shared.metrics import REGISTRY
+from shared.settings import Settings
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+
+@dataclasses.dataclass(frozen=True)
+class Place:
+    """Minimal result of reverse geocoding, cheap to cache as JSON."""
+
+    country_code: str
+    address: str | None
+
+
+class GeocodingBackend(Protocol):
+    """Blocking reverse geocoding service, called from a worker thread."""
+
+    def reverse(self, latitude: float, longitude: float) -> Place | None:
+        ...
+
+
+class NominatimBackend:
+    def __init__(self, user_agent: str = "my test app", timeout: float = 10) -> None:
+        # NOTE: single client for the whole process, not one per apartment
+        self._geolocator = geopy.Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def reverse(self, latitude: float, longitude: float) -> Place | None:
+        if not (place := self._geolocator.reverse((latitude, longitude))):
+            return None
+        return Place(
+            country_code=place.raw["address"]["country_code"], address=place.address
+        )
+
+
+class OfflineBackend:
+    """
+    Local stand-in for tests and offline runs.
+    Serves places from a mapping keyed by rounded (latitude, longitude),
+    falls back to `default` and counts how many lookups reached it.
+    """
+
+    def __init__(
+        self,
+        places: Mapping[tuple[float, float], Place] | None = None,
+        default: Place | None = None,
+        precision: int = 4,
+    ) -> None:
+        self.precision = precision
+        self.places = {
+            (round(lat, precision), round(lng, precision)): place
+            for (lat, lng), place in (places or {}).items()
+        }
+        self.default = default
+        self.calls = 0
+
+    def reverse(self, latitude: float, longitude: float) -> Place | None:
+        self.calls += 1
+        key = (round(latitude, self.precision), round(longitude, self.precision))
+        return self.places.get(key, self.default)
+
+
+class Geocoder:
+    """
+    Reverse geocoding with a coordinate-keyed cache in front of a backend.
+
+    Coordinates are rounded to `precision` decimal places (4 is ~11 m),
+    so apartments of one project share a single cache entry.
+    Misses are serialised through one worker thread, which keeps at least
+    `min_interval` seconds between backend calls (Nominatim allows 1 req/s).
+    Concurrent `areverse()` calls for the same key share one lookup.
+    """
+
+    def __init__(
+        self,
+        backend: GeocodingBackend,
+        cache: DiskCache | None = None,
+        precision: int = 4,
+        min_interval: float = 1.0,
+    ) -> None:
+        self.backend = backend
+        self.cache = cache if cache is not None else DiskCache(":memory:")
+        self.precision = precision
+        self.min_interval = min_interval
+        self._last_call = 0.0
+        self._throttle = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocoder")
+        self._inflight: dict[str, asyncio.Future[Place | None]] = {}
+
+    def key(self, latitude: float, longitude: float) -> str:
+        return f"{latitude:.{self.precision}f},{longitude:.{self.precision}f}"
+
+    def cached(self, latitude: float, longitude: float) -> tuple[bool, Place | None]:
+        """Return (hit, place) without ever calling the backend."""
+        match self.cache.get(self.key(latitude, longitude), default=False):
+            case False:
+                return False, None
+            case None:
+                return True, None  # negative result is cached as well
+            case dict() as raw:
+                return True, Place(**raw)
+            case _:
+                return False, None
+
+    def reverse(self, latitude: float, longitude: float) -> Place | None:
+        """Blocking lookup, do not call it from the event loop on a cache miss."""
+        hit, place = self.cached(latitude, longitude)
+        if hit:
+            return place
+
+        with self._throttle:
+            # someone could resolve the same key while we were waiting for the lock
+            hit, place = self.cached(latitude, longitude)
+            if hit:
+                return place
+
+            if (delay := self._last_call + self.min_interval - time.monotonic()) > 0:
+                REGISTRY.counter(
+                    "geocoding_throttled_seconds_total",
+                    "Time spent waiting to respect backend rate limit",
+                ).inc(delay)
+                time.sleep(delay)
+            backend = type(self.backend).__name__
+            try:
+                with REGISTRY.histogram(
+                    "geocoding_backend_seconds", "Reverse geocoding backend calls"
+                ).time(backend=backend):
+                    place = self.backend.reverse(latitude, longitude)
+            finally:
+                self._last_call = time.monotonic()
+
+        value = None if place is None else dataclasses.asdict(place)
+        self.cache.set(self.key(latitude, longitude), value)
+        return place
+
+    async def areverse(self, latitude: float, longitude: float) -> Place | None:
+        """Non-blocking lookup, backend calls are done by the worker thread."""
+        hit, place = self.cached(latitude, longitude)
+        if hit:
+            return place
+
+        key = self.key(latitude, longitude)
+        if (inflight := self._inflight.get(key)) is not None:
+            return await asyncio.shield(inflight)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._worker, self.reverse, latitude, longitude)
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    def close(self) -> None:
+        self._worker.shutdown(wait=False, cancel_futures=True)
+        self.cache.close()
+
+
+@cache
+def get_geocoder() -> Geocoder:
+    """Process-wide geocoder configured by `shared.settings.Settings`."""
+    settings = Settings()
+    backend: GeocodingBackend
+    min_interval = settings.GEOCODING_MIN_INTERVAL
+    match settings.GEOCODING_BACKEND:
+        case "offline":
+            backend = OfflineBackend()
+            min_interval = 0  # no remote service to be polite to
+        case "nominatim":
+            backend = NominatimBackend(user_agent=settings.GEOCODING_USER_AGENT)
+    return Geocoder(
+        backend=backend,
+        cache=DiskCache(
+            settings.GEOCODING_CACHE_PATH,
+            ttl=settings.GEOCODING_CACHE_TTL,
+            max_entries=settings.GEOCODING_CACHE_MAX_ENTRIES,
+            table="geocoding",
+        ),
+        precision=settings.GEOCODING_PRECISION,
+        min_interval=min_interval,
+    )
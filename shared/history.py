@@ -0,0 +1,186 @@
+"""
+Price/status history of apartments, one point per change, stored outside of
+apartment documents (which keep only the last `EMBEDDED_HISTORY_LIMIT` changes).
+Points are kept in a time-series collection (MongoDB 5.0+), or in a plain
+collection with the same index on older servers:
+    {"when": datetime, "meta": {"apartment": ObjectId, "project": str, "city": str},
+     "price": float, "currency": str, "size": float, "status": str}
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+from typing import TYPE_CHECKING, Literal
+from urllib.parse import urlsplit
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from bson import ObjectId
+    from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+    from shared.models import Apartment
+
+
+EMBEDDED_HISTORY_LIMIT = 10
+
+# changes of these fields are recorded to `Apartment.history` (last few of them)
+# and to the history collection (all of them)
+TRACKED_FIELDS = {"price", "status", "size"}
+
+# path segment followed by city and project in urls of listed apartments
+LISTING_SEGMENTS = {"flats-for-sale", "flats-for-rent"}
+
+INDEXES = [
+    IndexModel(
+        [("meta.apartment", ASCENDING), ("when", ASCENDING)], name="apartment_when"
+    ),
+    IndexModel([("meta.project", ASCENDING), ("when", ASCENDING)], name="project"),
+    IndexModel([("meta.city", ASCENDING), ("when", ASCENDING)], name="city"),
+]
+
+Interval = Literal["hour", "day", "month"]
+GroupBy = Literal["project", "city"]
+
+# `$dateToString` rather than `$dateTrunc` (MongoDB 5.0+), periods sort as strings
+PERIOD_FORMATS: dict[Interval, str] = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+async def ensure_collection(
+    database: AsyncIOMotorDatabase, name: str
+) -> AsyncIOMotorCollection:
+    if name not in await database.list_collection_names():
+        try:
+            await database.create_collection(
+                name,
+                timeseries={
+                    "timeField": "when",
+                    "metaField": "meta",
+                    "granularity": "hours",
+                },
+            )
+        except CollectionInvalid:  # created meanwhile
+            pass
+        except (OperationFailure, NotImplementedError):  # MongoDB < 5.0, mongomock
+            await database.create_collection(name)
+    collection = database[name]
+    await collection.create_indexes(INDEXES)
+    return collection
+
+
+def content_hash(apartment: Apartment) -> str:
+    """Stored by every writer of apartments, tells whether tracked fields changed."""
+    return hashlib.sha1(apartment.json(include=TRACKED_FIELDS).encode()).hexdigest()
+
+
+def url_groups(url: str) -> tuple[str, str]:
+    """
+    City and project of apartment by its url, listings are structured as
+    `.../flats-for-sale/{city}/{project}/...`, e.g. `/en/flats-for-sale/bratislava/x/1`.
+    Empty strings for urls of other shapes.
+    """
+    segments = urlsplit(url).path.strip("/").split("/")
+    for index, segment in enumerate(segments):
+        if segment in LISTING_SEGMENTS:
+            city, project = (segments[index + 1 : index + 3] + ["", ""])[:2]
+            return city, project
+    return "", ""
+
+
+def point(
+    apartment_id: ObjectId, apartment: Apartment, when: datetime.datetime
+) -> dict[str, Any]:
+    city, project = url_groups(apartment.url)
+    return {
+        "when": when,
+        "meta": {"apartment": apartment_id, "project": project, "city": city},
+        "price": apartment.price.price,
+        "currency": apartment.price.currency,
+        "size": apartment.size.usable,
+        "status": apartment.status.value,
+    }
+
+
+APARTMENT_TREND = ("price", "price_min", "price_max", "status", "changes")
+GROUP_TREND = ("price", "price_min", "price_max", "price_per_m2", "apartments")
+
+
+def _period(interval: Interval) -> dict[str, Any]:
+    return {"$dateToString": {"format": PERIOD_FORMATS[interval], "date": "$when"}}
+
+
+def _since(query: dict[str, Any], since: datetime.datetime | None) -> dict[str, Any]:
+    return query | ({"when": {"$gte": since}} if since is not None else {})
+
+
+def apartment_trend_pipeline(
+    apartment_id: ObjectId, interval: Interval, since: datetime.datetime | None = None
+) -> list[dict[str, Any]]:
+    """Changes of one apartment downsampled to the last value per period."""
+    return [
+        {"$match": _since({"meta.apartment": apartment_id}, since)},
+        {"$sort": {"when": ASCENDING}},
+        {
+            "$group": {
+                "_id": _period(interval),
+                "price": {"$last": "$price"},
+                "price_min": {"$min": "$price"},
+                "price_max": {"$max": "$price"},
+                "status": {"$last": "$status"},
+                "changes": {"$sum": 1},
+            }
+        },
+        {"$sort": {"_id": ASCENDING}},
+        {"$project": {"_id": 0, "period": "$_id"} | dict.fromkeys(APARTMENT_TREND, 1)},
+    ]
+
+
+def group_trend_pipeline(
+    group_by: GroupBy,
+    interval: Interval,
+    value: str | None = None,
+    since: datetime.datetime | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Per project/city and period: prices of apartments which were listed
+    or changed in that period, every apartment counted once (its last value).
+    """
+    field = f"meta.{group_by}"
+    query = {field: value} if value is not None else {}
+    return [
+        {"$match": _since(query, since)},
+        {"$sort": {"when": ASCENDING}},
+        {
+            "$group": {
+                "_id": {
+                    "group": f"${field}",
+                    "period": _period(interval),
+                    "apartment": "$meta.apartment",
+                },
+                "price": {"$last": "$price"},
+                "size": {"$last": "$size"},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"group": "$_id.group", "period": "$_id.period"},
+                "price": {"$avg": "$price"},
+                "price_min": {"$min": "$price"},
+                "price_max": {"$max": "$price"},
+                "price_per_m2": {"$avg": {"$divide": ["$price", "$size"]}},
+                "apartments": {"$sum": 1},
+            }
+        },
+        {"$sort": {"_id.group": ASCENDING, "_id.period": ASCENDING}},
+        {
+            "$project": {"_id": 0, "group": "$_id.group", "period": "$_id.period"}
+            | dict.fromkeys(GROUP_TREND, 1)
+        },
+    ]
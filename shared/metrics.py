@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, TypeVar, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+    Labels = tuple[tuple[str, str], ...]
+
+F = TypeVar("F", bound="Callable[..., object]")
+
+# seconds, from a cached lookup to a slow remote call
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _labels(labels: dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _value(value: float) -> str:
+    """Without losing precision of large counts, as `f"{value:g}"` would."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format(name: str, labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return name
+    escaped = (
+        (key, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for key, value in pairs
+    )
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help
+        self._lock = lock
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[tuple[str, float]]:
+        for labels, value in self.values.items():
+            yield _format(self.name, labels), value
+
+
+class Gauge(Counter):
+    """Current value, which may go down, e.g. connections in use."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative buckets, sum and count per label set, like Prometheus histograms."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        lock: threading.Lock,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self._lock = lock
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label set -> (counts per bucket, not cumulative; sum; count)
+        self.values: dict[Labels, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _labels(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts, total, count = self.values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            counts[index] += 1
+            self.values[key] = counts, total + value, count + 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels: object) -> float | None:
+        """Estimated by linear interpolation inside of the bucket, as `histogram_quantile`."""
+        empty: tuple[list[int], float, int] = ([], 0.0, 0)
+        counts, _, count = self.values.get(_labels(labels), empty)
+        if not count:
+            return None
+        rank, cumulative, lower = q * count, 0, 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return lower
+
+    def samples(self) -> Iterator[tuple[str, float]]:
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = "+Inf" if math.isinf(bound) else repr(bound)
+                yield _format(f"{self.name}_bucket", labels, (("le", le),)), cumulative
+            yield _format(f"{self.name}_sum", labels), total
+            yield _format(f"{self.name}_count", labels), count
+
+
+class Registry:
+    """
+    Process-wide metrics, thread safe (geocoding and uploads run in executors).
+    Rendered in Prometheus text exposition format by `.render()`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        with self._lock:
+            metric = self.metrics.setdefault(name, Counter(name, help, self._lock))
+        return cast(Counter, metric)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        with self._lock:
+            metric = self.metrics.setdefault(name, Gauge(name, help, self._lock))
+        return cast(Gauge, metric)
+
+    def histogram(
+        self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        with self._lock:
+            metric = self.metrics.setdefault(
+                name, Histogram(name, help, self._lock, buckets)
+            )
+        return cast(Histogram, metric)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for metric in self.metrics.values():
+                if metric.help:
+                    lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(
+                    f"{name} {_value(value)}" for name, value in metric.samples()
+                )
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self.metrics.clear()
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram: str, **labels: object) -> Callable[[F], F]:
+    """Observes duration of every call (sync or async) of decorated function."""
+
+    def decorator(function: F) -> F:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args: object, **kwargs: object) -> object:
+                with REGISTRY.histogram(histogram).time(**labels):
+                    return await function(*args, **kwargs)  # type: ignore[misc]
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            with REGISTRY.histogram(histogram).time(**labels):
+                return function(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+import dataclasses
 import datetime
 import enum
-from typing import Any
+from functools import cache
+from typing import TYPE_CHECKING, Any
 
 import countryinfo
 import geojson
-import geopy
 from beanie import PydanticObjectId
 from pydantic import (
     BaseModel,
@@ -18,6 +19,13 @@ from pydantic import (
     validator,
 )
 
+from shared.geocoding import get_geocoder
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from shared.geocoding import Place
+
 
 class Source(str, enum.Enum):
     """Source where real estate came into DB from."""
@@ -48,6 +56,23 @@ class Status(str, enum.Enum):
     # ...
 
 
+@cache
+def country_codes() -> frozenset[str]:
+    """
+    Lowercase country names and alternative spellings (incl. ISO alpha-2 codes),
+    which `countryinfo.CountryInfo(value).area()` accepts.
+    `countryinfo` re-reads its whole dataset on every instantiation,
+    so it's read only once here, on first validation.
+    """
+    codes: set[str] = set()
+    for name, country in countryinfo.CountryInfo().all().items():
+        if "area" not in country:
+            continue
+        codes.add(name)
+        codes.update(spelling.lower() for spelling in country.get("altSpellings", ()))
+    return frozenset(codes)
+
+
 class StrictBaseModel(
     BaseModel,
     extra="forbid",
@@ -64,24 +89,41 @@ class Location(StrictBaseModel, arbitrary_types_allowed=True):
     gps: geojson.Point | None
     address: str | None
 
+    @staticmethod
+    def _are_coordinates(latitude: Any, longitude: Any) -> bool:
+        float_or_int = lambda x: isinstance(x, float | int)
+        return float_or_int(latitude) and float_or_int(longitude)
+
+    @classmethod
+    def _from_place(
+        cls, place: Place | None, latitude: float | int, longitude: float | int
+    ) -> Location | None:
+        if place is None:
+            return None
+        return cls(
+            country_code=place.country_code,
+            gps=geojson.Point((longitude, latitude)),  # GeoJSON order is lng, lat
+            address=place.address,
+        )
+
     @classmethod
     def geolocate(
         cls, latitude: float | int, longitude: float | int
     ) -> Location | None:
-        float_or_int = lambda x: isinstance(x, float | int)
-        if not float_or_int(latitude) or not float_or_int(longitude):
+        """Blocking on cache miss, prefer `.ageolocate()` inside of event loop."""
+        if not cls._are_coordinates(latitude, longitude):
             return None
+        place = get_geocoder().reverse(latitude, longitude)
+        return cls._from_place(place, latitude, longitude)
 
-        point = (latitude, longitude)
-        geolocator = geopy.Nominatim(user_agent="my test app")
-        if not (place := geolocator.reverse(point)):
+    @classmethod
+    async def ageolocate(
+        cls, latitude: float | int, longitude: float | int
+    ) -> Location | None:
+        if not cls._are_coordinates(latitude, longitude):
             return None
-
-        return cls(
-            country_code=place.raw["address"]["country_code"],
-            gps=geojson.Point(point),
-            address=place.address,
-        )
+        place = await get_geocoder().areverse(latitude, longitude)
+        return cls._from_place(place, latitude, longitude)
 
     @validator("gps")
     def validate_point(cls, value: Any, **kwargs: Any) -> geojson.Point | None:
@@ -100,10 +142,8 @@ class Location(StrictBaseModel, arbitrary_types_allowed=True):
 
     @validator("country_code")
     def validate_country(cls, value: str, **kwargs: Any) -> str:
-        try:
-            countryinfo.CountryInfo(value).area()
-        except KeyError as error:
-            raise ValueError("Not existing country code!") from error
+        if value.lower() not in country_codes():
+            raise ValueError("Not existing country code!")
         return value
 
 
@@ -188,3 +228,57 @@ class Apartment(StrictBaseModel):
                 ],
             }
         }
+
+
+@dataclasses.dataclass(slots=True)
+class ApartmentSummary:
+    """
+    Slim read model of list and map views (`?view=summary`).
+    Built by `from_document()` from trusted mongo documents projected to
+    `SUMMARY_PATHS`, nothing is validated; orjson serialises it natively.
+    """
+
+    id: PydanticObjectId
+    url: str
+    offer_type: OfferType
+    status: Status
+    price: float
+    currency: str
+    size: float  # usable
+    rooms: int
+    floor: int | None
+    gps: list[float] | None  # GeoJSON order: longitude, latitude
+
+    @classmethod
+    def from_document(cls, document: Mapping[str, Any]) -> ApartmentSummary:
+        location = document.get("location") or {}
+        gps = location.get("gps") or {}
+        price = document["price"]
+        # NOTE: positional arguments in order of fields, keywords take twice as long
+        return cls(
+            document["_id"],
+            document["url"],
+            document["offer_type"],
+            document["status"],
+            price["price"],
+            price["currency"],
+            document["size"]["usable"],
+            document["rooms"]["amount"],
+            document.get("floor"),
+            gps.get("coordinates"),
+        )
+
+
+# stored fields of `ApartmentSummary`, projected by mongo
+SUMMARY_PATHS = (
+    "_id",
+    "url",
+    "offer_type",
+    "status",
+    "price.price",
+    "price.currency",
+    "size.usable",
+    "rooms.amount",
+    "floor",
+    "location.gps.coordinates",
+)
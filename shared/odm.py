@@ -1,12 +1,42 @@
 from __future__ import annotations
 
-from beanie import Document
+import datetime
+import logging
+from typing import TYPE_CHECKING
+
+from beanie import Document, init_beanie
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
 
 from shared.models import Apartment
 from shared.settings import Settings
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
 
 class ApartmentBeanie(Document, Apartment):  # type: ignore[misc]
+    # hash of fields tracked in history, maintained by the scraper pipeline
+    content_hash: str | None = Field(default=None, hidden=True)
+    # when it was inserted or its tracked fields changed, see `shared.writes`
+    updated_at: datetime.datetime | None = Field(default=None, hidden=True)
+
     class Settings:
         name = Settings().MONGO_COLLECTION
         use_state_management = True
+        indexes = [IndexModel([("url", ASCENDING)], name="url_unique", unique=True)]
+
+
+async def init(database: AsyncIOMotorDatabase) -> None:
+    """`init_beanie()`, failing clearly when the unique url index can't be created."""
+    try:
+        await init_beanie(database, document_models=[ApartmentBeanie])  # type: ignore[arg-type]
+    except DuplicateKeyError:
+        logger.error(
+            "Cannot create unique index of apartment urls, some of them are"
+            " the same once canonicalized, collapse them by `scrapy dedupe`"
+        )
+        raise
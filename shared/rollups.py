@@ -0,0 +1,100 @@
+"""
+Market statistics of all apartments computed by one `$facet` aggregation and
+materialised into a rollup collection, so reading them is a single `find_one`.
+Refreshed by the scraper when a crawl ends, see `SaveToMongoWithDuplicatesCheck`,
+which also bumps a crawl generation counter kept in the same collection,
+so the API knows when its cached responses are outdated.
+"""
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING
+
+from pymongo import ASCENDING, ReturnDocument
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+ROLLUP_ID = "market"
+GENERATION_ID = "generation"
+
+
+def _summary(group_by: str | None) -> dict[str, Any]:
+    return {
+        "$group": {
+            "_id": group_by,
+            "apartments": {"$sum": 1},
+            "price_avg": {"$avg": "$price.price"},
+            "price_min": {"$min": "$price.price"},
+            "price_max": {"$max": "$price.price"},
+            "size_avg": {"$avg": "$size.usable"},
+            "price_per_m2_avg": {"$avg": {"$divide": ["$price.price", "$size.usable"]}},
+        }
+    }
+
+
+def _grouped(group: dict[str, Any], key: str) -> list[dict[str, Any]]:
+    """Sorted by the group, which is renamed from `_id` to `key`."""
+    fields = [field for field in group["$group"] if field != "_id"]
+    return [
+        group,
+        {"$sort": {"_id": ASCENDING}},
+        {"$project": {"_id": 0, key: "$_id"} | dict.fromkeys(fields, 1)},
+    ]
+
+
+def stats_pipeline() -> list[dict[str, Any]]:
+    return [
+        {
+            "$facet": {
+                "overall": [_summary(None), {"$project": {"_id": 0}}],
+                "by_rooms": _grouped(_summary("$rooms.amount"), "rooms"),
+                "by_status": _grouped(
+                    {"$group": {"_id": "$status", "apartments": {"$sum": 1}}}, "status"
+                ),
+                "by_country": _grouped(
+                    _summary("$location.country_code"), "country_code"
+                ),
+            }
+        }
+    ]
+
+
+async def refresh(
+    apartments: AsyncIOMotorCollection, rollups: AsyncIOMotorCollection
+) -> dict[str, Any]:
+    """Recompute the statistics and replace the materialised ones."""
+    [facets] = await apartments.aggregate(stats_pipeline()).to_list(None)
+    now = datetime.datetime.utcnow()
+    document = {
+        "_id": ROLLUP_ID,
+        # BSON dates have millisecond precision, the same as what is stored
+        "refreshed_at": now.replace(microsecond=now.microsecond // 1000 * 1000),
+        # NOTE: `next()`, because mongomock yields a group of nothing for empty input
+        "overall": next((x for x in facets["overall"] if x["apartments"]), None),
+        "by_rooms": facets["by_rooms"],
+        "by_status": facets["by_status"],
+        "by_country": facets["by_country"],
+    }
+    await rollups.replace_one({"_id": ROLLUP_ID}, document, upsert=True)
+    return document
+
+
+async def bump_generation(rollups: AsyncIOMotorCollection) -> int:
+    """Increment the crawl generation, return the new one."""
+    document = await rollups.find_one_and_update(
+        {"_id": GENERATION_ID},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(document["value"])
+
+
+async def generation(rollups: AsyncIOMotorCollection) -> int:
+    """Current crawl generation, 0 if nothing was crawled yet."""
+    document = await rollups.find_one({"_id": GENERATION_ID})
+    return 0 if document is None else int(document["value"])
@@ -1,20 +1,15 @@
 from __future__ import annotations
 
+import hashlib
+from typing import TYPE_CHECKING
+
 import botocore.client
-import botocore.session
 
+if TYPE_CHECKING:
+    from typing import Any, BinaryIO
 
-def get_s3_client(
-    aws_access_key_id: str,
-    aws_secret_access_key: str,
-    endpoint_url: str,
-) -> botocore.client.BaseClient:
-    return botocore.session.Session().create_client(
-        "s3",
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        endpoint_url=endpoint_url,
-    )
+# S3 minimum size of all parts but the last one is 5 MiB
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
 
 
 def ensure_s3_bucket_exists(s3: botocore.client.BaseClient, bucket_name: str) -> None:
@@ -22,3 +17,140 @@ def ensure_s3_bucket_exists(s3: botocore.client.BaseClient, bucket_name: str) ->
         s3.head_bucket(Bucket=bucket_name)
     except botocore.client.ClientError:
         s3.create_bucket(Bucket=bucket_name)
+
+
+def is_not_found(error: botocore.client.ClientError) -> bool:
+    code = error.response.get("Error", {}).get("Code")
+    return code in {"404", "NoSuchKey", "NotFound", "NoSuchBucket"}
+
+
+def upload_file(
+    s3: botocore.client.BaseClient,
+    file: BinaryIO,
+    bucket: str,
+    key: str,
+    part_size: int = MULTIPART_PART_SIZE,
+    **kwargs: Any,
+) -> None:
+    """
+    Multipart upload of a file read part by part, so only one part is held
+    in memory; files smaller than `part_size` are uploaded by single put.
+    `kwargs` are passed to put_object/create_multipart_upload, e.g. ACL.
+    """
+    body = file.read(part_size)
+    if len(body) < part_size:
+        s3.put_object(Bucket=bucket, Key=key, Body=body, **kwargs)
+        return
+
+    upload = s3.create_multipart_upload(Bucket=bucket, Key=key, **kwargs)
+    upload_id = upload["UploadId"]
+    parts: list[dict[str, Any]] = []
+    try:
+        while body:
+            response = s3.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=body,
+            )
+            parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+            body = file.read(part_size)
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        # NOTE: otherwise already uploaded parts are kept (and billed) by S3
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+class InMemoryS3Client:
+    """
+    Local stand-in for the subset of botocore S3 client used by this project,
+    for tests and offline runs. Objects are kept in `.buckets[bucket][key]`.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: dict[str, dict[str, bytes]] = {}
+        self.calls: list[str] = []
+        # multipart upload id -> part number -> body
+        self.uploads: dict[str, dict[int, bytes]] = {}
+
+    @staticmethod
+    def _error(operation: str, code: str = "404") -> botocore.client.ClientError:
+        response = {"Error": {"Code": code, "Message": "Not Found"}}
+        return botocore.client.ClientError(response, operation)
+
+    def _bucket(self, operation: str, bucket: str) -> dict[str, bytes]:
+        self.calls.append(operation)
+        if bucket not in self.buckets:
+            raise self._error(operation, "NoSuchBucket")
+        return self.buckets[bucket]
+
+    def head_bucket(self, *, Bucket: str) -> dict[str, Any]:
+        self._bucket("HeadBucket", Bucket)
+        return {}
+
+    def create_bucket(self, *, Bucket: str) -> dict[str, Any]:
+        self.calls.append("CreateBucket")
+        self.buckets.setdefault(Bucket, {})
+        return {}
+
+    def head_object(self, *, Bucket: str, Key: str) -> dict[str, Any]:
+        if (body := self._bucket("HeadObject", Bucket).get(Key)) is None:
+            raise self._error("HeadObject")
+        return {
+            "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+            "ContentLength": len(body),
+        }
+
+    def get_object(self, *, Bucket: str, Key: str) -> dict[str, Any]:
+        if (body := self._bucket("GetObject", Bucket).get(Key)) is None:
+            raise self._error("GetObject", "NoSuchKey")
+        return {"Body": body, "ContentLength": len(body)}
+
+    def put_object(
+        self, *, Bucket: str, Key: str, Body: bytes, **_: Any
+    ) -> dict[str, Any]:
+        self._bucket("PutObject", Bucket)[Key] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def create_multipart_upload(
+        self, *, Bucket: str, Key: str, **_: Any
+    ) -> dict[str, Any]:
+        self._bucket("CreateMultipartUpload", Bucket)
+        upload_id = f"{Key}:{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self, *, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes
+    ) -> dict[str, Any]:
+        self._bucket("UploadPart", Bucket)
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        UploadId: str,
+        MultipartUpload: dict[str, list[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        parts = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        body = b"".join(parts[number] for number in numbers)
+        self._bucket("CompleteMultipartUpload", Bucket)[Key] = body
+        return {}
+
+    def abort_multipart_upload(
+        self, *, Bucket: str, Key: str, UploadId: str
+    ) -> dict[str, Any]:
+        self._bucket("AbortMultipartUpload", Bucket)
+        self.uploads.pop(UploadId, None)
+        return {}
@@ -0,0 +1,125 @@
+"""
+Full-text search of apartments by a MongoDB text index over `TEXT_FIELDS`.
+
+MongoDB has no stemmer for Slovak, so the index uses language "none"
+(no stemming and no stop words); version 3 text indexes are case and diacritic
+insensitive, "byt" matches "Byt" and "pekny" matches "pekný".
+`InvertedIndex` does the same in process, where `$text` is not supported (mongomock).
+"""
+from __future__ import annotations
+
+import collections
+import math
+import re
+import unicodedata
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Iterable
+    from typing import Any
+
+
+TEXT_FIELDS = ("description", "location.address")
+TEXT_LANGUAGE = "none"
+
+_WORD = re.compile(r"\w+")
+_QUERY = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+
+
+def fold(text: str) -> str:
+    """Lower case without diacritics, like MongoDB text index version 3."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(fold(text))
+
+
+def text(document: Mapping[str, Any]) -> str:
+    """All `TEXT_FIELDS` of a raw document."""
+    texts = []
+    for field in TEXT_FIELDS:
+        value: Any = document
+        for key in field.split("."):
+            value = value.get(key) if isinstance(value, Mapping) else None
+        if isinstance(value, str):
+            texts.append(value)
+    return " ".join(texts)
+
+
+class TextQuery:
+    """
+    `$search` syntax of MongoDB: any of the terms, all "quoted phrases",
+    none of -negated terms or phrases.
+    """
+
+    def __init__(self, query: str) -> None:
+        self.terms: set[str] = set()
+        self.phrases: list[str] = []
+        self.excluded_terms: set[str] = set()
+        self.excluded_phrases: list[str] = []
+        for match in _QUERY.finditer(query):
+            negated_phrase, phrase, negated, word = match.groups()
+            if phrase is not None:
+                phrases = self.excluded_phrases if negated_phrase else self.phrases
+                if phrase := " ".join(tokenize(phrase)):
+                    phrases.append(phrase)
+                continue
+            tokens = tokenize(word)
+            (self.excluded_terms if negated else self.terms).update(tokens)
+        # NOTE: words of phrases count for the score too
+        self.terms.update(t for phrase in self.phrases for t in phrase.split())
+
+    def matches(self, text: str) -> bool:
+        """Whether folded and tokenized `text` has phrases and no excluded ones."""
+        padded = f" {text} "
+        return all(f" {p} " in padded for p in self.phrases) and not any(
+            f" {p} " in padded for p in self.excluded_phrases
+        )
+
+
+class InvertedIndex:
+    """
+    Term -> {document id: term frequency} of texts added by `add()`,
+    scored by tf-idf, which orders results similarly to `textScore`.
+    """
+
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[Hashable, int]] = collections.defaultdict(dict)
+        self.texts: dict[Hashable, str] = {}
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Mapping[str, Any]]) -> InvertedIndex:
+        index = cls()
+        for document in documents:
+            index.add(document["_id"], text(document))
+        return index
+
+    def add(self, id: Hashable, text: str) -> None:
+        tokens = tokenize(text)
+        self.texts[id] = " ".join(tokens)
+        for term, count in collections.Counter(tokens).items():
+            self.postings[term][id] = count
+
+    def search(self, query: str) -> list[tuple[Hashable, float]]:
+        """Ids with scores, the best ones first."""
+        parsed = TextQuery(query)
+        scores: dict[Hashable, float] = collections.defaultdict(float)
+        for term in parsed.terms:
+            if not (postings := self.postings.get(term)):
+                continue
+            idf = math.log(1 + len(self.texts) / len(postings))
+            for id, count in postings.items():
+                scores[id] += count * idf
+
+        excluded = {
+            id for term in parsed.excluded_terms for id in self.postings.get(term, ())
+        }
+        results = [
+            (id, score)
+            for id, score in scores.items()
+            if id not in excluded and parsed.matches(self.texts[id])
+        ]
+        return sorted(results, key=lambda x: -x[1])
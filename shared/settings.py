@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import AnyHttpUrl, BaseSettings, MongoDsn
 
 
@@ -8,8 +10,52 @@ class Settings(BaseSettings):
     MONGO_URL: MongoDsn
     MONGO_DATABASE: str
     MONGO_COLLECTION: str
+    # price/status changes, see `shared.history`
+    MONGO_HISTORY_COLLECTION: str = "apartments_history"
+    # materialised market statistics, see `shared.rollups`
+    MONGO_STATS_COLLECTION: str = "apartments_stats"
+    # connection pool of each process, see `shared.connections`
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0  # kept open even when idle
+    MONGO_MAX_IDLE_TIME: float | None = 5 * 60  # seconds, None = forever
+    MONGO_WAIT_QUEUE_TIMEOUT: float | None = 10.0  # for a free connection
+    MONGO_CONNECT_TIMEOUT: float = 5.0
+    MONGO_SOCKET_TIMEOUT: float | None = None  # None = forever
+    MONGO_SERVER_SELECTION_TIMEOUT: float = 10.0
+    # e.g. "zstd,snappy,zlib", the first one the server supports is used;
+    # zstd needs `zstandard` (`pip install .[feeds]`), snappy `python-snappy`
+    MONGO_COMPRESSORS: str = ""
+    MONGO_READ_PREFERENCE: Literal[
+        "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+    ] = "primary"
 
     MINIO_URL: AnyHttpUrl
     MINIO_LOGIN: str
     MINIO_PASSWORD: str
     MINIO_BUCKET: str
+    # S3 clients are shared by threads of each process, see `shared.connections`
+    S3_MAX_POOL_CONNECTIONS: int = 20  # keep-alive connections per client
+    S3_CONNECT_TIMEOUT: float = 5.0
+    S3_READ_TIMEOUT: float = 60.0
+    S3_MAX_ATTEMPTS: int = 3  # incl. the first one
+
+    # "offline" is a local stand-in which never leaves the process
+    GEOCODING_BACKEND: Literal["nominatim", "offline"] = "nominatim"
+    GEOCODING_USER_AGENT: str = "my test app"
+    GEOCODING_CACHE_PATH: str = ".cache/geocoding.sqlite3"
+    GEOCODING_CACHE_TTL: float = 30 * 24 * 60 * 60  # addresses rarely change
+    GEOCODING_CACHE_MAX_ENTRIES: int = 100_000
+    GEOCODING_PRECISION: int = 4  # decimal places, ~11 meters
+    GEOCODING_MIN_INTERVAL: float = 1.0  # Nominatim usage policy: max 1 req/s
+
+    # responses of read endpoints, see `api.cache`
+    # "memory" is per process, "redis" is shared by all API workers
+    API_CACHE_BACKEND: Literal["memory", "redis", "off"] = "memory"
+    API_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    API_CACHE_TTL: float = 10 * 60
+    API_CACHE_MAX_ENTRIES: int = 10_000  # memory backend only
+    API_CACHE_GENERATION_INTERVAL: float = 5.0  # seconds between crawl checks
+
+    # push feed of apartments, see `shared.broadcast`
+    FEED_POLL_INTERVAL: float = 1.0  # without change streams (standalone server)
+    FEED_BUFFER_SIZE: int = 1000  # events to resume after, also max per subscriber
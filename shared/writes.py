@@ -0,0 +1,205 @@
+"""
+Writes of apartments shared by the scraper pipeline and the API, so that every
+writer deduplicates them by canonical url, keeps content hash and embedded
+history in sync and records changes to the history collection.
+"""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import datetime
+from typing import TYPE_CHECKING, cast
+
+from beanie.odm.utils.dump import get_dict
+from beanie.odm.utils.encoder import Encoder
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from w3lib.url import canonicalize_url
+
+from shared import history
+from shared.models import Change
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from typing import Any
+
+    from bson import ObjectId
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+    from shared.odm import ApartmentBeanie
+
+    Update = tuple[dict[str, Any], dict[str, Any]]  # filter and update document
+
+
+DUPLICATE_KEY = 11000  # error code of unique index violations
+
+
+@dataclasses.dataclass
+class Upserted:
+    """Outcome of `upsert()`, keyed by indexes of the apartments."""
+
+    created: set[int] = dataclasses.field(default_factory=set)
+    changed: set[int] = dataclasses.field(default_factory=set)  # tracked fields
+    ids: dict[int, ObjectId] = dataclasses.field(default_factory=dict)  # of both
+    errors: dict[int, str] = dataclasses.field(default_factory=dict)
+    duplicates: set[int] = dataclasses.field(default_factory=set)  # url of another
+    modified: int = 0  # documents modified by either of the updates
+
+
+def _updates(apartment: ApartmentBeanie, by_id: bool) -> tuple[Update, Update]:
+    apartment.url = canonicalize_url(apartment.url)  # type: ignore[assignment]
+    apartment.content_hash = history.content_hash(apartment)
+    apartment.updated_at = datetime.datetime.utcnow()
+    document = get_dict(apartment, to_db=True)
+    key = {"_id": document["_id"]} if by_id else {"url": apartment.url}
+    tracked_keys = {*history.TRACKED_FIELDS, "content_hash", "updated_at"}
+    tracked = {k: v for k, v in document.items() if k in tracked_keys}
+    untracked = {
+        k: v for k, v in document.items() if k not in tracked_keys | {"_id", "history"}
+    }
+    on_insert = tracked | {"history": document["history"]}
+    if not by_id:
+        on_insert["_id"] = document["_id"]
+    change = Encoder(to_db=True).encode(
+        Change(what=apartment.dict(include=history.TRACKED_FIELDS))
+    )
+    return (
+        (
+            key | {"content_hash": {"$ne": apartment.content_hash}},
+            {
+                "$set": tracked,
+                "$push": {
+                    "history": {
+                        "$each": [change],
+                        "$slice": -history.EMBEDDED_HISTORY_LIMIT,
+                    }
+                },
+            },
+        ),
+        (key, {"$set": untracked, "$setOnInsert": on_insert}),
+    )
+
+
+def upsert_operations(
+    apartment: ApartmentBeanie, by_id: bool = False
+) -> list[UpdateOne]:
+    """
+    Write operations deduplicating apartments by canonical url (or id), in one request.
+    Order of execution doesn't matter, so they may be part of unordered bulk:
+        - new url: first operation matches nothing, second one inserts the document
+        - changed tracked fields: first operation updates them (and `updated_at`)
+          and appends history, keeping only the last `history.EMBEDDED_HISTORY_LIMIT`
+          changes
+        - other fields (description, photos, ...) are always updated by the second one
+    """
+    (track_filter, track), (key, update) = _updates(apartment, by_id)
+    return [UpdateOne(track_filter, track), UpdateOne(key, update, upsert=True)]
+
+
+async def upsert(
+    collection: AsyncIOMotorCollection,
+    apartments: Sequence[ApartmentBeanie],
+    by_id: bool = False,
+) -> Upserted:
+    """
+    Operations of `upsert_operations()`, telling which apartments are new or changed
+    by results of the writes themselves, so concurrent writers never both see
+    the same change: upserts by one unordered bulk (`upserted_ids` are the new ones),
+    then updates of tracked fields of the others concurrently by `find_one_and_update`
+    (matched ones are the changed ones).
+    """
+    updates = [_updates(apartment, by_id) for apartment in apartments]
+    upserted = Upserted()
+    details: Mapping[str, Any]
+    operations = [UpdateOne(key, update, upsert=True) for _, (key, update) in updates]
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as error:
+        details = error.details
+        for e in details["writeErrors"]:
+            upserted.errors[e["index"]] = e["errmsg"]
+            if e.get("code") == DUPLICATE_KEY:
+                upserted.duplicates.add(e["index"])
+    except PyMongoError as error:
+        upserted.errors = dict.fromkeys(range(len(apartments)), str(error))
+        return upserted
+    # NOTE: by ids, mongomock indexes `upserted` among upserted documents only
+    new = {item["_id"] for item in details.get("upserted", [])}
+    for index, apartment in enumerate(apartments):
+        if (id_ := apartment.id) in new and index not in upserted.errors:
+            new.discard(id_)  # the same apartment repeated in the batch
+            upserted.created.add(index)
+            upserted.ids[index] = cast("ObjectId", id_)
+    upserted.modified = details.get("nModified", 0)
+
+    indexes = [
+        index
+        for index in range(len(apartments))
+        if index not in upserted.errors and index not in upserted.created
+    ]
+    results = await asyncio.gather(
+        *(
+            collection.find_one_and_update(*updates[index][0], projection={"_id": 1})
+            for index in indexes
+        ),
+        return_exceptions=True,
+    )
+    for index, stored in zip(indexes, results):
+        if isinstance(stored, BaseException):
+            if not isinstance(stored, PyMongoError):
+                raise stored
+            upserted.errors[index] = str(stored)
+        elif stored is not None:
+            upserted.changed.add(index)
+            upserted.ids[index] = stored["_id"]
+            upserted.modified += 1
+    return upserted
+
+
+async def record_history(
+    collection: AsyncIOMotorCollection,
+    apartments: Sequence[ApartmentBeanie],
+    upserted: Upserted,
+    when: datetime.datetime | None = None,
+) -> int:
+    """Points of new and changed apartments to the history collection, their number."""
+    when = when or datetime.datetime.utcnow()
+    points = [
+        history.point(upserted.ids[index], apartments[index], when)
+        for index in sorted(upserted.created | upserted.changed)
+    ]
+    if points:
+        await collection.insert_many(points, ordered=False)
+    return len(points)
+
+
+async def dedupe(
+    collection: AsyncIOMotorCollection,
+    history_collection: AsyncIOMotorCollection | None = None,
+) -> int:
+    """
+    Collapses apartments whose urls are the same once canonicalized (stored before
+    urls were canonicalized), so that the unique url index can be created.
+    The oldest one of them is kept under the canonical url and points of the others
+    in the history collection are moved to it. Returns number of deleted apartments.
+    """
+    groups: dict[str, list[tuple[ObjectId, str]]] = {}
+    async for document in collection.find({}, {"url": 1}).sort("_id"):
+        url = canonicalize_url(document["url"])
+        groups.setdefault(url, []).append((document["_id"], document["url"]))
+
+    deleted = 0
+    for url, [(kept, stored_url), *others] in groups.items():
+        ids = [id_ for id_, _ in others]
+        if ids:
+            result = await collection.delete_many({"_id": {"$in": ids}})
+            deleted += result.deleted_count
+            if history_collection is not None:
+                await history_collection.update_many(
+                    {"meta.apartment": {"$in": ids}},
+                    {"$set": {"meta.apartment": kept}},
+                )
+        if stored_url != url:
+            await collection.update_one({"_id": kept}, {"$set": {"url": url}})
+    return deleted
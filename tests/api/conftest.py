@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi.testclient import TestClient
+
+from api import app
+from shared.models import Apartment, Source
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from contextlib import AbstractContextManager
+
+    from shared.settings import Settings
+    from tests.conftest import MotorClientClass, PyMongoClient
+
+
+@pytest.fixture
+def patch_motor_client(
+    motor_client_class: MotorClientClass,
+    pymongo_client: PyMongoClient,
+    test_settings: Settings,
+) -> Iterator[AbstractContextManager[MotorClientClass]]:
+    with patch.dict(os.environ, {"MONGO_DATABASE": test_settings.MONGO_DATABASE}):
+        yield patch("shared.connections.AsyncIOMotorClient", motor_client_class)
+    pymongo_client.drop_database(test_settings.MONGO_DATABASE)
+
+
+@pytest.fixture
+def client(patch_motor_client: AbstractContextManager[None]) -> Iterator[TestClient]:
+    with patch_motor_client:
+        # if it's `yield TestClient(app)`, then lifespan is not called,
+        # so init_beanie() is not awaited and api will fail on attempt
+        # of communicating with db
+        with TestClient(app) as _client:
+            yield _client
+
+
+@pytest.fixture
+def many_apartments(client: TestClient, yit_apartment: Apartment) -> list[Apartment]:
+    apartments = []
+    for i in range(5):
+        apartment = yit_apartment.copy(
+            deep=True,
+            update={"id": PydanticObjectId(), "url": f"{yit_apartment.url}/{i}"},
+        )
+        apartment.price.price = 100_000 * (i + 1)
+        apartment.rooms.amount = i + 1
+        apartment.source = Source.API
+        assert client.post("/apartments", content=apartment.json()).is_success
+        apartments.append(apartment)
+    return apartments
@@ -1,44 +1,20 @@
 from __future__ import annotations
 
 import datetime
-import os
 from typing import TYPE_CHECKING
-from unittest.mock import patch
 
-import pytest
 from beanie import PydanticObjectId
-from fastapi.testclient import TestClient
+from w3lib.url import canonicalize_url
 
-from api import app
+from shared import history
 from shared.models import Apartment, Source
+from shared.odm import ApartmentBeanie
+from shared.writes import upsert_operations
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
-    from contextlib import AbstractContextManager
+    from typing import Any
 
-    from shared.settings import Settings
-    from tests.conftest import MotorClientClass, PyMongoClient
-
-
-@pytest.fixture
-def patch_motor_client(
-    motor_client_class: MotorClientClass,
-    pymongo_client: PyMongoClient,
-    test_settings: Settings,
-) -> Iterator[AbstractContextManager[MotorClientClass]]:
-    with patch.dict(os.environ, {"MONGO_DATABASE": test_settings.MONGO_DATABASE}):
-        yield patch("api.AsyncIOMotorClient", motor_client_class)
-    pymongo_client.drop_database(test_settings.MONGO_DATABASE)
-
-
-@pytest.fixture
-def client(patch_motor_client: AbstractContextManager[None]) -> Iterator[TestClient]:
-    with patch_motor_client:
-        # if it's `yield TestClient(app)`, then lifespan is not called,
-        # so init_beanie() is not awaited and api will fail on attempt
-        # of communicating with db
-        with TestClient(app) as _client:
-            yield _client
+    from fastapi.testclient import TestClient
 
 
 class TestAPI:
@@ -80,6 +56,22 @@ class TestAPI:
         [in_db], by_id = list_response.json(), get_response.json()
         assert Apartment.parse_obj(in_db) == Apartment.parse_obj(by_id) == expected
 
+    def test_create_duplicate_url(
+        self, client: TestClient, yit_apartment: Apartment
+    ) -> None:
+        first = client.post("/apartments", content=yit_apartment.json()).json()
+        yit_apartment.id = PydanticObjectId()
+        yit_apartment.url += "?b=2&a=1"  # type: ignore[assignment]
+        yit_apartment.price.price = 1
+        response = client.post("/apartments", content=yit_apartment.json())
+        assert response.status_code == 200
+        assert response.json() == first  # stored one by canonical url
+
+        [in_db] = client.get("/apartments").json()
+        assert in_db["url"] == canonicalize_url(yit_apartment.url)
+        assert in_db["price"]["price"] == 1
+        assert [change["what"]["price"]["price"] for change in in_db["history"]] == [1]
+
     def test_create_one_without_id_check_timestamp(
         self, client: TestClient, yit_apartment: Apartment
     ) -> None:
@@ -92,3 +84,128 @@ class TestAPI:
         id = response.json()
         timestamp = PydanticObjectId(id).generation_time.replace(tzinfo=None)
         assert past <= timestamp <= future
+
+    def test_replace(self, client: TestClient, yit_apartment: Apartment) -> None:
+        # upsert of not existing one
+        response = client.put(
+            f"/apartments/{yit_apartment.id}", content=yit_apartment.json()
+        )
+        assert response.status_code == 200
+        assert response.json() == str(yit_apartment.id)
+
+        yit_apartment.price.price = 1
+        yit_apartment.id = PydanticObjectId()  # id of the path wins
+        id = response.json()
+        assert client.put(f"/apartments/{id}", content=yit_apartment.json()).is_success
+
+        [in_db] = client.get("/apartments").json()
+        assert in_db["_id"] == id
+        assert in_db["price"]["price"] == 1
+        assert in_db["source"] == Source.API
+
+    def test_replace_keeps_history_and_content_hash(
+        self, client: TestClient, yit_apartment: Apartment
+    ) -> None:
+        yit_apartment.url += "?b=2&a=1"  # type: ignore[assignment]
+        # stored by the scraper pipeline, with canonical url
+        collection = ApartmentBeanie.get_motor_collection()
+        operations = upsert_operations(ApartmentBeanie.parse_obj(yit_apartment))
+        client.portal.call(collection.bulk_write, operations)  # type: ignore[union-attr]
+        stored = client.portal.call(collection.find_one, {"_id": yit_apartment.id})  # type: ignore[union-attr]
+
+        yit_apartment.description = "changed description"
+        response = client.put(
+            f"/apartments/{yit_apartment.id}", content=yit_apartment.json()
+        )
+        assert response.is_success
+
+        document = client.portal.call(collection.find_one, {"_id": yit_apartment.id})  # type: ignore[union-attr]
+        assert document["url"] == stored["url"] != yit_apartment.url
+        assert document["description"] == "changed description"
+        assert document["history"] == stored["history"]
+        assert document["content_hash"] == stored["content_hash"]
+        assert document["content_hash"] == history.content_hash(yit_apartment)
+
+    def test_replace_duplicate_url(
+        self, client: TestClient, yit_apartment: Apartment
+    ) -> None:
+        assert client.post("/apartments", content=yit_apartment.json()).is_success
+        response = client.put(
+            f"/apartments/{PydanticObjectId()}", content=yit_apartment.json()
+        )
+        assert response.status_code == 409
+
+
+class TestListAPI:
+    def test_filters(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get(
+            "/apartments", params={"price_min": 200_000, "rooms_max": 4}
+        )
+        assert response.status_code == 200
+        assert [Apartment.parse_obj(a) for a in response.json()] == many_apartments[1:4]
+
+        response = client.get("/apartments", params={"status": ["SOLD", "RESERVED"]})
+        assert response.json() == []
+
+    def test_keyset_pagination(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        seen: list[str] = []
+        params: dict[str, Any] = {"limit": 2}
+        while True:
+            response = client.get("/apartments", params=params)
+            seen.extend(a["_id"] for a in response.json())
+            if not (cursor := response.headers.get("X-Next-Cursor")):
+                break
+            params["after"] = cursor
+        assert seen == [str(a.id) for a in many_apartments]
+
+    def test_page_size_is_limited(self, client: TestClient) -> None:
+        assert client.get("/apartments", params={"limit": 10_000}).status_code == 422
+
+    def test_exclude_fields(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get(
+            "/apartments", params={"exclude": ["description", "history"]}
+        )
+        for item in response.json():
+            assert "description" not in item
+            assert "history" not in item
+            assert "price" in item
+
+    def test_summary_view(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        params: dict[str, Any] = {"view": "summary", "limit": 3, "rooms_min": 2}
+        response = client.get("/apartments", params=params)
+        first, *_ = items = response.json()
+        assert [item["id"] for item in items] == [
+            str(a.id) for a in many_apartments[1:4]
+        ]
+        assert first == {
+            "id": str(many_apartments[1].id),
+            "url": many_apartments[1].url,
+            "offer_type": "SELL",
+            "status": "FREE",
+            "price": 200_000,
+            "currency": "EUR",
+            "size": 60,
+            "rooms": 2,
+            "floor": 3,
+            "gps": None,
+        }
+
+        params["after"] = response.headers["X-Next-Cursor"]
+        [last] = client.get("/apartments", params=params).json()
+        assert last["id"] == str(many_apartments[4].id)
+
+    def test_summary_view_is_smaller(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        full = client.get("/apartments", params={"exclude": ["history"]})
+        summary = client.get("/apartments", params={"view": "summary"})
+        assert len(summary.json()) == len(full.json())
+        assert len(summary.content) < len(full.content)
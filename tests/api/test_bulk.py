@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import orjson
+import pytest
+from beanie import PydanticObjectId
+
+from api import bulk
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from fastapi.testclient import TestClient
+
+    from shared.models import Apartment
+
+
+def variants(apartment: Apartment, count: int) -> list[Apartment]:
+    return [
+        apartment.copy(
+            deep=True,
+            update={"id": PydanticObjectId(), "url": f"{apartment.url}/{i}"},
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_rows() -> None:
+    async def chunks() -> AsyncIterator[bytes]:
+        for chunk in [b'{"a":', b' 1}\n\n{"b": 2}\n{"c"', b": 3}"]:
+            yield chunk
+
+    assert [row async for row in bulk.ndjson_rows(chunks())] == [
+        b'{"a": 1}',
+        b'{"b": 2}',
+        b'{"c": 3}',
+    ]
+
+
+class TestBulkAPI:
+    def test_json_array(self, client: TestClient, yit_apartment: Apartment) -> None:
+        apartments = variants(yit_apartment, 3)
+        content = orjson.dumps([orjson.loads(a.json()) for a in apartments])
+        response = client.post(
+            "/apartments/bulk",
+            content=content,
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "created": 3,
+            "updated": 0,
+            "failed": 0,
+            "rows": [
+                {"row": i, "status": "created", "id": str(a.id)}
+                for i, a in enumerate(apartments)
+            ],
+        }
+        assert len(client.get("/apartments").json()) == 3
+
+    def test_ndjson_upsert_with_invalid_rows(
+        self,
+        client: TestClient,
+        yit_apartment: Apartment,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 2)
+        stored, new = variants(yit_apartment, 2)
+        assert client.post("/apartments", content=stored.json()).is_success
+
+        stored.price.price = 1
+        lines = [
+            stored.copy(update={"id": PydanticObjectId()}).json(),  # stored id is kept
+            "{not json",
+            '{"url": "https://www.yit.sk/x"}',
+            "",
+            new.json(),
+        ]
+        response = client.post(
+            "/apartments/bulk",
+            content="\n".join(lines),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert (report["created"], report["updated"], report["failed"]) == (1, 1, 2)
+        assert [(x["row"], x["status"], x["id"]) for x in report["rows"]] == [
+            (0, "updated", str(stored.id)),
+            (1, "invalid", None),
+            (2, "invalid", None),
+            (3, "created", str(new.id)),
+        ]
+        missing = {"loc": ["source"], "msg": "field required"}
+        assert missing | {"type": "value_error.missing"} in report["rows"][2]["detail"]
+
+        response = client.get(f"/apartments/{stored.id}")
+        assert response.json()["price"]["price"] == 1
+
+    def test_unsupported_body(self, client: TestClient) -> None:
+        response = client.post(
+            "/apartments/bulk", content="x", headers={"Content-Type": "text/plain"}
+        )
+        assert response.status_code == 415
+        response = client.post("/apartments/bulk", json={"url": "x"})
+        assert response.status_code == 400
+
+
+class TestDeleteManyAPI:
+    def test_delete_many(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        ids = [str(a.id) for a in many_apartments[:3]] + [str(PydanticObjectId())]
+        response = client.request("DELETE", "/apartments", json=ids)
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 3}
+        remaining = [a["_id"] for a in client.get("/apartments").json()]
+        assert remaining == [str(a.id) for a in many_apartments[3:]]
+
+    def test_empty_or_invalid_ids(self, client: TestClient) -> None:
+        assert client.request("DELETE", "/apartments", json=[]).status_code == 422
+        assert client.request("DELETE", "/apartments", json=["x"]).status_code == 422
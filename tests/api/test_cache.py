@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from beanie import PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+
+from api.cache import (
+    CachedResponse,
+    MemoryBackend,
+    ResponseCache,
+    ResponseCacheMiddleware,
+    etag,
+)
+from api.stats import stats_collection
+from shared import rollups
+from shared.odm import ApartmentBeanie
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+    from starlette.types import Message, Receive, Scope, Send
+
+    from shared.models import Apartment
+
+
+class TestMemoryBackend:
+    @pytest.mark.asyncio
+    async def test_ttl(self) -> None:
+        backend = MemoryBackend()
+        await backend.set("a", b"1", ttl=60)
+        await backend.set("b", b"2", ttl=-1)  # already expired
+        assert await backend.get("a") == b"1"
+        assert await backend.get("b") is None
+        assert len(backend) == 1
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_are_evicted(self) -> None:
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", b"1", ttl=60)
+        await backend.set("b", b"2", ttl=60)
+        await backend.get("a")
+        await backend.set("c", b"3", ttl=60)
+        assert [await backend.get(key) for key in "abc"] == [b"1", None, b"3"]
+
+    @pytest.mark.asyncio
+    async def test_clear_increments_epoch(self) -> None:
+        backend = MemoryBackend()
+        await backend.set("a", b"1", ttl=60)
+        assert await backend.epoch() == 0
+        await backend.clear()
+        assert await backend.epoch() == 1
+        assert len(backend) == 0
+
+
+def test_cached_response_roundtrip() -> None:
+    response = CachedResponse(200, [(b"x-next-cursor", b"123")], b'[{"a":"\\n"}]\n')
+    assert CachedResponse.loads(response.dumps()) == response
+    assert response.header(b"x-next-cursor") == b"123"
+    assert response.header(b"etag") is None
+
+
+@pytest.mark.asyncio
+async def test_new_generation_invalidates() -> None:
+    generations = iter([0, 0, 1])
+
+    async def generation() -> int:
+        return next(generations)
+
+    cache = ResponseCache(MemoryBackend(), generation=generation, generation_interval=0)
+    key = await cache.key({"path": "/apartments", "query_string": b"b=2&a=1"})
+    assert key == "0:/apartments?a=1&b=2"
+    await cache.set(key, CachedResponse(200, [], b"[]"))
+    assert await cache.get(key) is not None
+    assert await cache.key({"path": "/apartments", "query_string": b""}) == (
+        "0:/apartments?"
+    )
+    assert await cache.generation() == 1
+    assert await cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_response_read_before_invalidation_is_not_cached() -> None:
+    cache = ResponseCache(MemoryBackend())
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await cache.invalidate()  # by a write request, while this one is running
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    sent: list[Message] = []
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    scope = {"type": "http", "path": "/apartments", "query_string": b"", "headers": []}
+    await ResponseCacheMiddleware(app).read(cache, scope, None, send)  # type: ignore[arg-type]
+    assert [m.get("body") for m in sent] == [None, b"[]"]
+    assert len(cast(MemoryBackend, cache.backend)) == 0
+
+
+class TestResponseCacheMiddleware:
+    def test_hit_and_not_modified(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        miss = client.get("/apartments", params={"limit": 2})
+        assert miss.headers["X-Cache"] == "MISS"
+        hit = client.get("/apartments", params={"limit": 2})
+        assert hit.headers["X-Cache"] == "HIT"
+        assert hit.content == miss.content
+        assert (
+            hit.headers["ETag"] == miss.headers["ETag"] == etag(miss.content).decode()
+        )
+        assert hit.headers["X-Next-Cursor"] == str(many_apartments[1].id)
+
+        response = client.get(
+            "/apartments",
+            params={"limit": 2},
+            headers={"If-None-Match": f'W/"other", {hit.headers["ETag"]}'},
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == hit.headers["ETag"]
+
+    def test_not_found_is_not_cached(
+        self, client: TestClient, random_objectid: PydanticObjectId
+    ) -> None:
+        for _ in range(2):
+            response = client.get(f"/apartments/{random_objectid}")
+            assert response.status_code == 404
+            assert response.headers["X-Cache"] == "MISS"
+            assert "ETag" not in response.headers
+
+    def test_other_routes_are_not_cached(self, client: TestClient) -> None:
+        assert "X-Cache" not in client.get("/apartments/stats").headers
+
+    def test_api_writes_invalidate(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        apartment_id = many_apartments[0].id
+        assert len(client.get("/apartments").json()) == 5
+        assert client.get(f"/apartments/{apartment_id}").status_code == 200
+
+        assert client.delete(f"/apartments/{apartment_id}").is_success
+        assert len(client.get("/apartments").json()) == 4
+        assert client.get(f"/apartments/{apartment_id}").status_code == 404
+
+        another = many_apartments[0].copy(update={"url": f"{many_apartments[0].url}/x"})
+        assert client.post("/apartments", content=another.json()).is_success
+        assert len(client.get("/apartments").json()) == 5
+
+    def test_crawl_invalidates(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        cache = cast(ResponseCache, client.app.state.response_cache)  # type: ignore[attr-defined]
+        cache.generation_interval = 0
+        assert len(client.get("/apartments").json()) == 5
+
+        # written by the scraper, not through the API
+        another = ApartmentBeanie.parse_obj(
+            many_apartments[0].copy(
+                update={"id": PydanticObjectId(), "url": f"{many_apartments[0].url}/x"}
+            )
+        )
+        collection = ApartmentBeanie.get_motor_collection()
+        client.portal.call(collection.insert_one, get_dict(another, to_db=True))  # type: ignore[union-attr]
+        assert len(client.get("/apartments").json()) == 5  # stale
+
+        client.portal.call(rollups.bump_generation, stats_collection())  # type: ignore[union-attr]
+        response = client.get("/apartments")
+        assert response.headers["X-Cache"] == "MISS"
+        assert len(response.json()) == 6
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import TYPE_CHECKING
+
+from api.export import CSV_COLUMNS
+from shared.models import Apartment
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
+
+class TestExportAPI:
+    def test_export_empty_db(self, client: TestClient) -> None:
+        response = client.get("/apartments/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.content == b""
+
+    def test_export_ndjson(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get("/apartments/export", params={"batch_size": 2})
+        lines = response.content.splitlines()
+        assert [Apartment.parse_obj(json.loads(x)) for x in lines] == many_apartments
+
+    def test_export_filtered(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get("/apartments/export", params={"rooms_min": 4})
+        ids = [json.loads(line)["_id"] for line in response.content.splitlines()]
+        assert ids == [str(a.id) for a in many_apartments[3:]]
+
+    def test_export_csv(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get("/apartments/export", params={"format": "csv"})
+        assert response.headers["content-type"].startswith("text/csv")
+
+        header, *rows = csv.reader(io.StringIO(response.text))
+        assert header == list(CSV_COLUMNS)
+        assert len(rows) == len(many_apartments)
+        assert [float(row[header.index("price")]) for row in rows] == [
+            a.price.price for a in many_apartments
+        ]
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from beanie import PydanticObjectId
+
+from api.feed import messages, server_sent_events
+from api.filters import ApartmentFilter
+from shared.broadcast import Broadcaster, Event
+from shared.models import Status
+from tests.shared.test_broadcast import QueueSource
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from fastapi.testclient import TestClient
+
+    from shared.models import Apartment
+
+
+def filters(**kwargs: Any) -> ApartmentFilter:
+    """Without fastapi, parameters with `Query()` defaults have to be passed."""
+    defaults = dict.fromkeys(["size_min", "size_max", "status", "offer_type"])
+    return ApartmentFilter(**defaults | kwargs)
+
+
+def test_filter_matches(yit_apartment: Apartment) -> None:
+    document = yit_apartment.dict(by_alias=True)
+    assert filters().matches(document)
+    assert filters(price_min=300_000, rooms_max=3).matches(document)
+    assert not filters(price_min=300_001).matches(document)
+    assert not filters(floor_min=100).matches(document)
+    assert filters(status=[Status.FREE]).matches(document)
+    assert not filters(status=[Status.SOLD]).matches(document)
+
+    del document["floor"]
+    assert not filters(floor_min=0).matches(document)
+
+
+@pytest.mark.asyncio
+async def test_server_sent_events(yit_apartment: Apartment) -> None:
+    source = QueueSource()
+    broadcaster = Broadcaster(source)
+    expensive = yit_apartment.dict(by_alias=True) | {"price": {"price": 1e6}}
+    stream = server_sent_events(
+        messages(
+            broadcaster.subscribe(),
+            filters(price_max=500_000),
+            ["description", "photos"],
+            keepalive=0.05,
+        )
+    )
+    deleted = PydanticObjectId()
+    for event in [
+        Event("1", "insert", yit_apartment.id, expensive),  # filtered out
+        Event("2", "update", yit_apartment.id, yit_apartment.dict(by_alias=True)),
+        Event("3", "delete", deleted),
+    ]:
+        source.queue.put_nowait(event)
+
+    update = await asyncio.wait_for(anext(stream), 1)
+    assert update.startswith(b"id: 2\nevent: update\ndata: {")
+    assert b'"description"' not in update and b'"status":"FREE"' in update
+    assert update.endswith(b"}\n\n")
+    assert await anext(stream) == b'id: 3\nevent: delete\ndata: {"_id":"%s"}\n\n' % (
+        str(deleted).encode()
+    )
+    assert await asyncio.wait_for(anext(stream), 1) == b": keepalive\n\n"
+
+    await broadcaster.close()
+    assert [x async for x in stream] == []
+
+
+class TestFeedAPI:
+    def test_websocket(self, client: TestClient, yit_apartment: Apartment) -> None:
+        client.app.state.broadcaster.source.interval = 0.01  # type: ignore[attr-defined]
+        cheap, expensive = (
+            yit_apartment.copy(
+                deep=True,
+                update={"id": PydanticObjectId(), "url": f"{yit_apartment.url}/{i}"},
+            )
+            for i in range(2)
+        )
+        expensive.price.price = 1e6
+
+        with client.websocket_connect("/apartments/feed/ws?price_max=500000") as ws:
+            assert client.post("/apartments", content=expensive.json()).is_success
+            assert client.post("/apartments", content=cheap.json()).is_success
+            message = ws.receive_json()
+        assert message["id"] == message["data"]["_id"] == str(cheap.id)
+        assert message["event"] == "insert"
+
+        # resumed after the token, without filters
+        url = f"/apartments/feed/ws?after={message['id']}"
+        with client.websocket_connect(url) as ws:
+            assert ws.receive_json()["id"] == str(expensive.id)
+            third = cheap.copy(
+                update={"id": PydanticObjectId(), "url": f"{cheap.url}/3"}
+            )
+            assert client.post("/apartments", content=third.json()).is_success
+            assert ws.receive_json()["id"] == str(third.id)
+
+        with client.websocket_connect("/apartments/feed/ws?after=unknown") as ws:
+            assert ws.receive_json() == {"id": "", "event": "reset", "data": {}}
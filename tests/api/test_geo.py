@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import geojson
+import pytest
+
+from api.geo import bbox_query, near_pipeline
+from shared.models import Apartment, Location
+from tests.conftest import is_mongo_running
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Any
+
+    from fastapi.testclient import TestClient
+
+BRATISLAVA = (17.1077, 48.1486)  # lng, lat
+KOSICE = (21.2611, 48.7164)
+
+requires_mongo = pytest.mark.skipif(
+    not is_mongo_running(), reason="mongomock doesn't support geospatial queries"
+)
+
+
+def locate(apartments: Sequence[Apartment]) -> None:
+    """Sorted by distance from Bratislava, the last one is in Kosice."""
+    for i, apartment in enumerate(apartments):
+        lng, lat = KOSICE if i == len(apartments) - 1 else BRATISLAVA
+        apartment.location = Location(
+            country_code="sk", gps=geojson.Point((lng + i / 1000, lat)), address=None
+        )
+
+
+@pytest.fixture
+def located_apartments(
+    client: TestClient, many_apartments: list[Apartment]
+) -> list[Apartment]:
+    """Apartments of `locate()` stored in the database."""
+    locate(many_apartments)
+    for apartment in many_apartments:
+        client.delete(f"/apartments/{apartment.id}")
+        assert client.post("/apartments", content=apartment.json()).is_success
+    return many_apartments
+
+
+class TestGeoQueries:
+    """Generated queries, their results are checked with MongoDB by `TestGeoAPI`."""
+
+    def test_near_pipeline(self) -> None:
+        pipeline = near_pipeline(*BRATISLAVA, 1_000, {"floor": 3}, 20, 10, {"url": 1})
+        assert pipeline == [
+            {
+                "$geoNear": {
+                    "near": {"type": "Point", "coordinates": list(BRATISLAVA)},
+                    "key": "location.gps",
+                    "distanceField": "distance",
+                    "maxDistance": 1_000,
+                    "spherical": True,
+                    "query": {"floor": 3},
+                }
+            },
+            {"$skip": 20},
+            {"$limit": 10},
+            {"$project": {"url": 1, "distance": 1}},
+        ]
+
+    def test_bbox_query(self) -> None:
+        ring = [[17, 48], [18, 48], [18, 49], [17, 49], [17, 48]]
+        assert bbox_query(17, 48, 18, 49) == {
+            "location.gps": {
+                "$geoWithin": {
+                    "$geometry": {"type": "Polygon", "coordinates": [ring]}
+                }
+            }
+        }
+
+    def test_wide_bbox_is_split(self) -> None:
+        query = bbox_query(-180, -10, 180, 10)
+        rings = [
+            part["location.gps"]["$geoWithin"]["$geometry"]["coordinates"][0]
+            for part in query["$or"]
+        ]
+        assert [(ring[0][0], ring[1][0]) for ring in rings] == [
+            (-180, -90),
+            (-90, 0),
+            (0, 90),
+            (90, 180),
+        ]
+        assert {(ring[0][1], ring[2][1]) for ring in rings} == {(-10, 10)}
+
+
+class TestGeoAPI:
+    @pytest.mark.parametrize(
+        "params",
+        (
+            {"latitude": 91, "longitude": 17, "radius": 100},
+            {"latitude": 48, "longitude": 17, "radius": 0},
+            {"latitude": 48, "longitude": 17, "radius": 10**9},
+        ),
+    )
+    def test_near_validation(self, client: TestClient, params: dict[str, int]) -> None:
+        assert client.get("/apartments/near", params=params).status_code == 422
+
+    def test_within_validation(self, client: TestClient) -> None:
+        params = {
+            "min_latitude": 49,
+            "min_longitude": 17,
+            "max_latitude": 48,
+            "max_longitude": 18,
+        }
+        assert client.get("/apartments/within", params=params).status_code == 422
+
+    @requires_mongo
+    def test_near(
+        self, client: TestClient, located_apartments: list[Apartment]
+    ) -> None:
+        lng, lat = BRATISLAVA
+        params: dict[str, Any] = {
+            "latitude": lat,
+            "longitude": lng,
+            "radius": 10_000,
+            "limit": 2,
+        }
+        response = client.get("/apartments/near", params=params)
+        first_page = response.json()
+        assert [a["_id"] for a in first_page] == [
+            str(a.id) for a in located_apartments[:2]
+        ]
+        assert first_page[0]["distance"] < first_page[1]["distance"]
+
+        params["skip"] = response.headers["X-Next-Skip"]
+        rest = client.get("/apartments/near", params=params).json()
+        assert [a["_id"] for a in rest] == [str(a.id) for a in located_apartments[2:4]]
+
+    @requires_mongo
+    def test_within(
+        self, client: TestClient, located_apartments: list[Apartment]
+    ) -> None:
+        params = {
+            "min_latitude": 48,
+            "min_longitude": 17,
+            "max_latitude": 48.5,
+            "max_longitude": 18,
+        }
+        response = client.get("/apartments/within", params=params)
+        assert [a["_id"] for a in response.json()] == [
+            str(a.id) for a in located_apartments[:-1]
+        ]
+
+    @requires_mongo
+    def test_within_wide_bbox(
+        self, client: TestClient, located_apartments: list[Apartment]
+    ) -> None:
+        params = {
+            "min_latitude": 0,
+            "min_longitude": -170,
+            "max_latitude": 60,
+            "max_longitude": 170,
+        }
+        response = client.get("/apartments/within", params=params)
+        assert len(response.json()) == len(located_apartments)
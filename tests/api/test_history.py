@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from beanie import PydanticObjectId
+from bson import ObjectId
+
+from api.history import history_collection
+from shared import history
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from fastapi.testclient import TestClient
+
+    from shared.models import Apartment
+
+
+def record(client: TestClient, apartments: list[Apartment], day: int) -> None:
+    when = datetime.datetime(2026, 1, day)
+    points = [history.point(cast(ObjectId, a.id), a, when) for a in apartments]
+    # NOTE: in the event loop of the app, mongomock clients don't share data
+    client.portal.call(history_collection().insert_many, points)  # type: ignore[union-attr]
+
+
+@pytest.fixture
+def many_apartments(
+    client: TestClient, many_apartments: list[Apartment]
+) -> list[Apartment]:
+    """Without points recorded when they were created by the API."""
+    client.portal.call(history_collection().delete_many, {})  # type: ignore[union-attr]
+    return many_apartments
+
+
+class TestHistoryAPI:
+    def test_not_existing_apartment(self, client: TestClient) -> None:
+        response = client.get(f"/apartments/{PydanticObjectId()}/history")
+        assert response.status_code == 404
+
+    def test_apartment_without_changes(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        response = client.get(f"/apartments/{many_apartments[0].id}/history")
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_apartment_history(
+        self,
+        client: TestClient,
+        many_apartments: list[Apartment],
+    ) -> None:
+        apartment = many_apartments[0]
+        record(client, [apartment], day=1)
+        apartment.price.price = 90_000
+        record(client, [apartment], day=2)
+
+        response = client.get(f"/apartments/{apartment.id}/history")
+        assert [(p["period"], p["price"]) for p in response.json()] == [
+            ("2026-01-01", 100_000),
+            ("2026-01-02", 90_000),
+        ]
+        response = client.get(
+            f"/apartments/{apartment.id}/history",
+            params={"interval": "month", "since": "2026-01-02T00:00:00"},
+        )
+        [point] = response.json()
+        assert point["period"] == "2026-01"
+        assert point["changes"] == 1
+
+    def test_trends(
+        self,
+        client: TestClient,
+        many_apartments: list[Apartment],
+    ) -> None:
+        record(client, many_apartments, day=1)
+        response = client.get("/apartments/trends", params={"group_by": "city"})
+        assert response.status_code == 200
+        # urls of many_apartments are .../flats-for-sale/bratislava/foo/bar/123456/{i}
+        assert response.json() == [
+            {
+                "group": "bratislava",
+                "period": "2026-01",
+                "price": 300_000,
+                "price_min": 100_000,
+                "price_max": 500_000,
+                "price_per_m2": 5_000,
+                "apartments": 5,
+            }
+        ]
+        response = client.get("/apartments/trends", params={"group": "other"})
+        assert response.json() == []
+
+    def test_api_writes_are_recorded(
+        self, client: TestClient, yit_apartment: Apartment
+    ) -> None:
+        id = client.post("/apartments", content=yit_apartment.json()).json()
+        yit_apartment.price.price = 1
+        assert client.put(f"/apartments/{id}", content=yit_apartment.json()).is_success
+        yit_apartment.price.price, yit_apartment.id = 2, PydanticObjectId()
+        response = client.post(
+            "/apartments/bulk",
+            content=f"[{yit_apartment.json()}]",
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.json()["rows"][0]["id"] == id
+        yit_apartment.description = "untracked change"
+        assert client.post("/apartments", content=yit_apartment.json()).json() == id
+
+        async def points() -> list[dict[str, Any]]:
+            cursor = history_collection().find({}, sort=[("when", 1)])
+            return await cursor.to_list(None)
+
+        recorded = client.portal.call(points)  # type: ignore[union-attr]
+        assert [point["price"] for point in recorded] == [300_000, 1, 2]
+        assert {point["meta"]["apartment"] for point in recorded} == {ObjectId(id)}
+        [in_db] = client.get("/apartments").json()
+        assert [change["what"]["price"]["price"] for change in in_db["history"]] == [
+            1,
+            2,
+        ]
+
+    def test_trends_wrong_interval(self, client: TestClient) -> None:
+        response = client.get("/apartments/trends", params={"interval": "week"})
+        assert response.status_code == 422
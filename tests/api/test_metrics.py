@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from beanie import PydanticObjectId
+
+from shared.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
+
+class TestMetricsAPI:
+    def test_latency_by_route_template(self, client: TestClient) -> None:
+        REGISTRY.clear()
+        for _ in range(2):
+            client.get(f"/apartments/{PydanticObjectId()}")
+        client.get("/not-existing")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        assert (
+            'http_request_duration_seconds_count{method="GET",'
+            'route="/apartments/{id}",status="404"} 2'
+        ) in lines
+        # unmatched paths must not create a label set per path
+        assert not any("/not-existing" in line for line in lines)
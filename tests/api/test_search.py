@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from shared.models import Location
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from fastapi.testclient import TestClient
+
+    from shared.models import Apartment
+
+
+@pytest.fixture
+def described(client: TestClient, many_apartments: list[Apartment]) -> list[str]:
+    """Ids of many_apartments, described and updated through the API."""
+    descriptions = [
+        "Pekný byt s balkónom",
+        "Byt v novostavbe, byt s terasou",
+        "Rodinný dom so záhradou",
+        "Garsónka",
+        None,
+    ]
+    for apartment, description in zip(many_apartments, descriptions):
+        apartment.description = description
+    many_apartments[3].location = Location(
+        country_code="sk", gps=None, address="Hlavná 1, Žilina"
+    )
+    for apartment in many_apartments:
+        response = client.put(f"/apartments/{apartment.id}", content=apartment.json())
+        assert response.is_success
+    return [str(apartment.id) for apartment in many_apartments]
+
+
+class TestSearchAPI:
+    def test_relevance(self, client: TestClient, described: list[str]) -> None:
+        response = client.get("/apartments/search", params={"q": "BYT zahrada"})
+        assert response.status_code == 200
+        items = response.json()
+        assert [item["_id"] for item in items] == [described[1], described[0]]
+        assert items[0]["score"] > items[1]["score"] > 0
+        assert "X-Next-Offset" not in response.headers
+
+        response = client.get("/apartments/search", params={"q": "zahradou"})
+        assert [item["_id"] for item in response.json()] == [described[2]]
+
+    def test_address(self, client: TestClient, described: list[str]) -> None:
+        response = client.get("/apartments/search", params={"q": "ZILINA -byt"})
+        assert [item["_id"] for item in response.json()] == [described[3]]
+
+    def test_filters_and_pages(self, client: TestClient, described: list[str]) -> None:
+        params: dict[str, Any] = {
+            "q": "byt",
+            "rooms_max": 1,
+            "exclude": ["description"],
+        }
+        [item] = client.get("/apartments/search", params=params).json()
+        assert item["_id"] == described[0]
+        assert "description" not in item
+
+        response = client.get("/apartments/search", params={"q": "byt", "limit": 1})
+        assert [item["_id"] for item in response.json()] == [described[1]]
+        assert response.headers["X-Next-Offset"] == "1"
+        params = {"q": "byt", "limit": 1, "offset": 1}
+        response = client.get("/apartments/search", params=params)
+        assert [item["_id"] for item in response.json()] == [described[0]]
+
+    def test_empty_query(self, client: TestClient) -> None:
+        assert client.get("/apartments/search", params={"q": ""}).status_code == 422
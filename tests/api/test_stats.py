@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from beanie import PydanticObjectId
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
+    from shared.models import Apartment
+
+
+class TestStatsAPI:
+    def test_empty_db(self, client: TestClient) -> None:
+        response = client.get("/apartments/stats")
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["overall"] is None
+        assert stats["by_rooms"] == stats["by_status"] == stats["by_country"] == []
+
+    def test_stats_are_materialised(
+        self, client: TestClient, many_apartments: list[Apartment]
+    ) -> None:
+        stats = client.get("/apartments/stats").json()
+        assert stats["overall"]["apartments"] == 5
+        assert stats["overall"]["price_avg"] == 300_000
+        assert [x["rooms"] for x in stats["by_rooms"]] == [1, 2, 3, 4, 5]
+        assert stats["by_status"] == [{"status": "FREE", "apartments": 5}]
+
+        # refreshed by the scraper at the end of a crawl, not by API writes
+        another = many_apartments[0].copy(
+            update={"id": PydanticObjectId(), "url": f"{many_apartments[0].url}/new"}
+        )
+        assert client.post("/apartments", content=another.json()).is_success
+        assert client.get("/apartments/stats").json() == stats
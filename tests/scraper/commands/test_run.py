@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING
+
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import get_project_settings
+
+from scraper.commands.run import Job, merge_stats, plan
+from scraper.feeds import uri_params
+from scraper.spiders.yit import YitSkFlatsForSale
+
+if TYPE_CHECKING:
+    from typing import Any
+
+
+def test_plan_single_worker() -> None:
+    loader = SpiderLoader.from_settings(get_project_settings())
+    assert list(plan(loader, 1, {})) == [Job("yit.sk", {})]
+
+
+def test_plan_shards_shardable_spider() -> None:
+    loader = SpiderLoader.from_settings(get_project_settings())
+    jobs = list(plan(loader, 3, {"foo": "bar"}))
+    assert jobs == [
+        Job("yit.sk", {"foo": "bar", "shard": shard, "shards": 3}) for shard in range(3)
+    ]
+
+
+def test_merge_stats() -> None:
+    start = datetime.datetime(2023, 1, 1)
+    stats: list[dict[str, Any]] = [
+        {
+            "start_time": start,
+            "finish_time": start + datetime.timedelta(seconds=10),
+            "item_scraped_count": 10,
+            "finish_reason": "finished",
+            "memusage/max": 1.5,
+            "yit/page_size": 100,
+            "mongo/generation": 7,
+        },
+        {
+            "start_time": start + datetime.timedelta(seconds=1),
+            "finish_time": start + datetime.timedelta(seconds=20),
+            "item_scraped_count": 5,
+            "finish_reason": "finished",
+            "memusage/max": 2.5,
+            "yit/page_size": 100,
+            "mongo/generation": 6,
+            "photos/errors": 1,
+        },
+    ]
+    assert merge_stats(stats) == {
+        "start_time": start,
+        "finish_time": start + datetime.timedelta(seconds=20),
+        "elapsed_time_seconds": 20.0,
+        "item_scraped_count": 15,
+        "finish_reason": "finished",
+        "memusage/max": 2.5,
+        "yit/page_size": 100,
+        "mongo/generation": 7,
+        "photos/errors": 1,
+    }
+
+
+def test_merge_stats_hit_ratio() -> None:
+    stats: list[dict[str, Any]] = [
+        {"httpcache/hit": 9, "httpcache/miss": 1, "httpcache/hit_ratio": 0.9},
+        {"httpcache/hit": 0, "httpcache/miss": 10, "httpcache/hit_ratio": 0.0},
+    ]
+    assert merge_stats(stats)["httpcache/hit_ratio"] == 0.45
+
+
+def test_merge_stats_different_values() -> None:
+    stats = [{"finish_reason": "finished"}, {"finish_reason": "shutdown"}]
+    assert merge_stats(stats) == {"finish_reason": "finished, shutdown"}
+
+
+def test_feed_uri_params() -> None:
+    assert uri_params({"name": "yit.sk"}, YitSkFlatsForSale())["shard"] == ""
+    spider = YitSkFlatsForSale(shard=1, shards=4)
+    assert uri_params({}, spider) == {"shard": ".2-of-4"}
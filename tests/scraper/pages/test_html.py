@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import parsel
+
+from scraper.pages.html import HtmlAttribute, scan
+
+HTML = b"""<!DOCTYPE html>
+<html><head><title>Byt</title></head>
+<body>
+  <div class="gallery">
+    <img src="placeholder.gif" data-src="/render/1.jpg">
+    <IMG data-src='/render/2.jpg' alt="&#382;">
+    <img src="no-data-src.jpg"><imgx data-src="/not-img.jpg">
+    <!-- <img data-src="/commented.jpg"> -->
+    <script>document.write('<img data-src="/script.jpg">')</script>
+    <img
+      class=lazy data-src=/render/unquoted.jpg?a=1&amp;b=2 data-src="/second.jpg" />
+    <p>nested <span><img data-src="/render/3.jpg"></span>
+  </div>
+  <footer><img data-src="/logo.svg"></footer>
+</body></html>
+"""
+
+
+class TestScan:
+    def test_same_as_parsel(self) -> None:
+        expected = parsel.Selector(body=HTML).css("img::attr(data-src)").getall()
+        fields = {"photos": HtmlAttribute("img", "data-src")}
+        assert scan(HTML, fields) == {"photos": expected}
+
+    def test_stop_at(self) -> None:
+        fields = {"photos": HtmlAttribute("img", "data-src", stop_at="footer")}
+        assert scan(HTML, fields) == {
+            "photos": [
+                "/render/1.jpg",
+                "/render/2.jpg",
+                "/render/unquoted.jpg?a=1&b=2",
+                "/render/3.jpg",
+            ]
+        }
+
+    def test_several_fields(self) -> None:
+        fields = {
+            "first": HtmlAttribute("img", "data-src", limit=1),
+            "sources": HtmlAttribute("img", "src"),
+        }
+        assert scan(HTML, fields) == {
+            "first": ["/render/1.jpg"],
+            "sources": ["placeholder.gif", "no-data-src.jpg"],
+        }
+
+    def test_encoding(self) -> None:
+        body = '<img data-src="/fotka-č.jpg">'.encode("cp1250")
+        fields = {"photos": HtmlAttribute("img", "data-src")}
+        assert scan(body, fields, encoding="cp1250") == {"photos": ["/fotka-č.jpg"]}
+
+    def test_non_ascii_before_tags(self) -> None:
+        # lowercasing "İ" changes length of the text, offsets must not drift
+        body = '<p>İİİ</p><IMG data-src="/1.jpg"><img data-src="/2.jpg">'.encode()
+        fields = {"photos": HtmlAttribute("img", "data-src")}
+        assert scan(body, fields) == {"photos": ["/1.jpg", "/2.jpg"]}
+
+    def test_not_ascii_compatible_encoding(self) -> None:
+        body = '<img data-src="/fotka-č.jpg">'.encode("utf-16")
+        fields = {"photos": HtmlAttribute("img", "data-src")}
+        assert scan(body, fields, encoding="utf-16") == {"photos": ["/fotka-č.jpg"]}
+
+    def test_empty(self) -> None:
+        assert scan(b"", {"photos": HtmlAttribute("img", "data-src")}) == {"photos": []}
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 
 import pytest
 from pytest_lazyfixture import lazy_fixture
+from scrapy.http import HtmlResponse
 
 from scraper.pages.yit import YitSkJsonApartmentPage
 
@@ -27,3 +28,16 @@ class TestYitSkJsonApartmentPage:
         assert item.dict(exclude={"id"}) == expected.dict(exclude={"id"})
         item.id, expected.id = None, None
         assert item == expected
+
+    def test_photos(self, yit_apartment_from_server: dict[str, Any]) -> None:
+        body = (
+            b"<html><body><div><img data-src='/a.jpg'><img data-src='/b.jpg'></div>"
+            b"<footer><img data-src='/logo.svg'></footer></body></html>"
+        )
+        response = HtmlResponse("https://www.yit.sk/foo", body=body)
+        page = YitSkJsonApartmentPage(
+            response=response, data=yit_apartment_from_server["Fields"]
+        )
+        assert page.photos == ["/a.jpg", "/b.jpg", "/logo.svg"]
+        assert page.photos == response.css("img::attr(data-src)").getall()
+        assert YitSkJsonApartmentPage(response=None, data={}).photos is None
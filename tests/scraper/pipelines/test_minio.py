@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from scraper.pipelines.minio import SaveToMinioApartmentPhotos
+from shared.cache import DiskCache
+from shared.s3 import InMemoryS3Client
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from shared.models import Apartment
+
+BUCKET = "test-bucket"
+PHOTOS = {
+    "https://www.yit.sk/render/a.jpg": b"render a",
+    "https://www.yit.sk/render/b.PNG": b"render b",
+    "https://cdn.yit.sk/copy-of-a.jpg": b"render a",
+}
+
+
+class FakeDownloadPhotos(SaveToMinioApartmentPhotos):
+    downloads: list[str]
+
+    async def download(self, url: str) -> bytes:
+        self.downloads.append(url)
+        await asyncio.sleep(0)
+        return PHOTOS[url]
+
+
+@pytest.fixture
+def s3() -> InMemoryS3Client:
+    client = InMemoryS3Client()
+    client.create_bucket(Bucket=BUCKET)
+    return client
+
+
+@pytest.fixture
+def photos_pipeline(
+    s3: InMemoryS3Client, tmp_path: Path
+) -> Iterator[FakeDownloadPhotos]:
+    pipeline = FakeDownloadPhotos(
+        s3=s3, bucket=BUCKET, index=DiskCache(tmp_path / "photos.sqlite3")
+    )
+    pipeline.downloads = []
+    yield pipeline
+    pipeline.close_spider(None)
+
+
+class TestSaveToMinioApartmentPhotos:
+    @pytest.mark.asyncio
+    async def test_photos_are_replaced_by_keys(
+        self, photos_pipeline: FakeDownloadPhotos, yit_apartment: Apartment
+    ) -> None:
+        yit_apartment.photos = list(PHOTOS)
+        item = await photos_pipeline.process_item(yit_apartment, None)
+
+        # copy of "a" under another url is stored once
+        assert len(item.photos) == 2
+        assert item.photos[0].startswith("photos/") and item.photos[0].endswith(".jpg")
+        assert item.photos[1].endswith(".png")
+        assert set(item.photos) == set(photos_pipeline.s3.buckets[BUCKET])
+
+    @pytest.mark.asyncio
+    async def test_shared_photos_are_downloaded_once(
+        self, photos_pipeline: FakeDownloadPhotos, yit_apartment: Apartment
+    ) -> None:
+        items = [yit_apartment.copy(update={"photos": list(PHOTOS)}) for _ in range(5)]
+        results = await asyncio.gather(
+            *(photos_pipeline.process_item(item, None) for item in items)
+        )
+        assert len({tuple(item.photos) for item in results}) == 1
+        assert sorted(photos_pipeline.downloads) == sorted(PHOTOS)
+        assert photos_pipeline.s3.calls.count("PutObject") == 2
+
+    @pytest.mark.asyncio
+    async def test_next_run_skips_known_photos(
+        self,
+        s3: InMemoryS3Client,
+        tmp_path: Path,
+        yit_apartment: Apartment,
+    ) -> None:
+        for _ in range(2):
+            pipeline = FakeDownloadPhotos(
+                s3=s3, bucket=BUCKET, index=DiskCache(tmp_path / "photos.sqlite3")
+            )
+            pipeline.downloads = []
+            item = yit_apartment.copy(update={"photos": list(PHOTOS)})
+            await pipeline.process_item(item, None)
+            pipeline.close_spider(None)
+        assert pipeline.downloads == []
+        assert s3.calls.count("PutObject") == 2
+
+    @pytest.mark.asyncio
+    async def test_existing_object_is_not_uploaded(
+        self, photos_pipeline: FakeDownloadPhotos, yit_apartment: Apartment
+    ) -> None:
+        url = next(iter(PHOTOS))
+        key = photos_pipeline.key(url, PHOTOS[url])
+        photos_pipeline.s3.put_object(Bucket=BUCKET, Key=key, Body=PHOTOS[url])
+
+        yit_apartment.photos = [url]
+        item = await photos_pipeline.process_item(yit_apartment, None)
+        assert item.photos == [key]
+        assert photos_pipeline.s3.calls.count("PutObject") == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_photo_is_skipped(
+        self, photos_pipeline: FakeDownloadPhotos, yit_apartment: Apartment
+    ) -> None:
+        yit_apartment.photos = ["https://www.yit.sk/missing.jpg", next(iter(PHOTOS))]
+        item = await photos_pipeline.process_item(yit_apartment, None)
+        assert len(item.photos) == 1
@@ -4,8 +4,12 @@ import asyncio
 from typing import TYPE_CHECKING
 
 import pytest
+from beanie import PydanticObjectId
+from scrapy.exceptions import DropItem
 
 from scraper.pipelines.mongo import SaveToMongoWithDuplicatesCheck
+from shared import rollups
+from shared.history import EMBEDDED_HISTORY_LIMIT
 from shared.models import Apartment
 from shared.odm import ApartmentBeanie
 
@@ -76,13 +80,234 @@ class TestSaveToMongoWithDuplicatesCheck:
         await collection.find().to_list(None) == [yit_apartment]
         await ApartmentBeanie.find_all().to_list() == [yit_apartment]
 
-    @pytest.mark.xfail(reason="Not yet implemented")
     @pytest.mark.asyncio
-    async def test_is_duplicate(
+    async def test_process_item_twice_is_deduplicated(
         self,
         mongo_pipeline: SaveToMongoWithDuplicatesCheck,
         yit_apartment: Apartment,
     ) -> None:
-        apartment = ApartmentBeanie.parse_obj(yit_apartment)
-        await apartment.insert()
-        assert await mongo_pipeline.is_duplicate(apartment) is True
+        await mongo_pipeline.process_item(yit_apartment, None)
+        again = yit_apartment.copy(update={"id": PydanticObjectId()})
+        assert await mongo_pipeline.process_item(again, None) == again
+
+        [in_db] = await ApartmentBeanie.find_all().to_list()
+        assert in_db.id == yit_apartment.id
+        assert in_db.history == []
+
+    @pytest.mark.asyncio
+    async def test_changes_are_appended_to_history(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        await mongo_pipeline.process_item(yit_apartment, None)
+        cheaper = yit_apartment.copy(deep=True, update={"id": PydanticObjectId()})
+        cheaper.price.price = 250_000
+        await mongo_pipeline.process_item(cheaper, None)
+        await mongo_pipeline.process_item(cheaper, None)  # no change this time
+
+        [in_db] = await ApartmentBeanie.find_all().to_list()
+        assert in_db.id == yit_apartment.id
+        assert in_db.price == cheaper.price
+        [change] = in_db.history
+        assert change.what["price"]["price"] == 250_000
+        assert change.what["status"] == cheaper.status
+
+    @pytest.mark.asyncio
+    async def test_untracked_changes_are_saved_without_history(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        await mongo_pipeline.process_item(yit_apartment, None)
+        described = yit_apartment.copy(deep=True, update={"id": PydanticObjectId()})
+        described.description = "new description"
+        await mongo_pipeline.process_item(described, None)
+
+        [in_db] = await ApartmentBeanie.find_all().to_list()
+        assert in_db.id == yit_apartment.id
+        assert in_db.description == "new description"
+        assert in_db.history == []
+        assert mongo_pipeline.history is not None
+        assert await mongo_pipeline.history.count_documents({}) == 1
+
+    @pytest.mark.asyncio
+    async def test_changes_are_recorded_to_history_collection(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        cheaper = yit_apartment.copy(deep=True, update={"id": PydanticObjectId()})
+        cheaper.price.price = 250_000
+        for item in (yit_apartment, cheaper, cheaper):
+            await mongo_pipeline.process_item(item, None)
+
+        assert mongo_pipeline.history is not None
+        points = await mongo_pipeline.history.find().sort("when").to_list(None)
+        assert [point["price"] for point in points] == [300_000, 250_000]
+        # keyed by id of the stored apartment, not of the scraped item
+        assert {point["meta"]["apartment"] for point in points} == {yit_apartment.id}
+
+    @pytest.mark.asyncio
+    async def test_embedded_history_is_capped(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        prices = range(100_000, 100_000 + EMBEDDED_HISTORY_LIMIT + 3)
+        for price in prices:
+            item = yit_apartment.copy(deep=True, update={"id": PydanticObjectId()})
+            item.price.price = price
+            await mongo_pipeline.process_item(item, None)
+
+        [in_db] = await ApartmentBeanie.find_all().to_list()
+        assert [c.what["price"]["price"] for c in in_db.history] == list(
+            prices[-EMBEDDED_HISTORY_LIMIT:]
+        )
+        assert mongo_pipeline.history is not None
+        assert await mongo_pipeline.history.count_documents({}) == len(prices)
+
+    @pytest.mark.asyncio
+    async def test_refresh_stats(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        await mongo_pipeline.process_item(yit_apartment, None)
+        await mongo_pipeline.refresh_stats()
+
+        assert mongo_pipeline.stats_collection is not None
+        database = mongo_pipeline.client[mongo_pipeline.database]
+        collection = database[mongo_pipeline.stats_collection]
+        stats = await collection.find_one({"_id": rollups.ROLLUP_ID})
+        assert stats is not None
+        assert stats["overall"]["apartments"] == 1
+
+        assert await rollups.generation(collection) == 1
+        await mongo_pipeline.refresh_stats()
+        assert await rollups.generation(collection) == 2
+
+    @pytest.mark.asyncio
+    async def test_url_is_canonicalized(
+        self,
+        mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        yit_apartment.url = "https://WWW.YIT.sk/foo?b=2&a=1"  # type: ignore[assignment]
+        await mongo_pipeline.process_item(yit_apartment, None)
+        [in_db] = await ApartmentBeanie.find_all().to_list()
+        assert in_db.url == "https://www.yit.sk/foo?a=1&b=2"
+
+
+@pytest.fixture
+def bulk_mongo_pipeline(
+    test_settings: Settings,
+    motor_client_class: MotorClientClass,
+    pymongo_client: PyMongoClient,
+) -> Iterator[SaveToMongoWithDuplicatesCheck]:
+    pipeline = SaveToMongoWithDuplicatesCheck(
+        client=motor_client_class(test_settings.MONGO_URL),
+        database=test_settings.MONGO_DATABASE,
+        bulk_size=3,
+        flush_interval=0.05,
+    )
+    pipeline.open_spider(None)
+    yield pipeline
+    pipeline.close_spider(None)
+    pymongo_client.drop_database(pipeline.database)
+
+
+def make_apartments(apartment: Apartment, amount: int) -> list[Apartment]:
+    return [
+        apartment.copy(update={"id": PydanticObjectId(), "url": f"{apartment.url}/{i}"})
+        for i in range(amount)
+    ]
+
+
+class TestBulkSaveToMongo:
+    @pytest.mark.asyncio
+    async def test_flush_when_full(
+        self,
+        bulk_mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        bulk_mongo_pipeline.flush_interval = 60  # never flushed by timer
+        items = make_apartments(yit_apartment, 3)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(bulk_mongo_pipeline.process_item(i, None) for i in items)),
+            timeout=5,
+        )
+        assert results == items
+        assert await ApartmentBeanie.count() == 3
+
+    @pytest.mark.asyncio
+    async def test_flush_by_timer(
+        self,
+        bulk_mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        await asyncio.wait_for(
+            bulk_mongo_pipeline.process_item(yit_apartment, None), timeout=5
+        )
+        assert await ApartmentBeanie.count() == 1
+
+    @pytest.mark.asyncio
+    async def test_flush_on_close(
+        self,
+        bulk_mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        bulk_mongo_pipeline.flush_interval = 60
+        task = asyncio.create_task(
+            bulk_mongo_pipeline.process_item(yit_apartment, None)
+        )
+        await asyncio.sleep(0)
+        assert await ApartmentBeanie.count() == 0
+
+        closing = bulk_mongo_pipeline.close_spider(None)
+        assert closing is not None
+        await closing.asFuture(asyncio.get_running_loop())
+        assert await task == yit_apartment
+        assert await ApartmentBeanie.count() == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_mapped_to_items(
+        self,
+        bulk_mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        first, second = make_apartments(yit_apartment, 2)
+        duplicate = first.copy(update={"url": f"{first.url}/other"})  # same _id
+        results = await asyncio.gather(
+            *(
+                bulk_mongo_pipeline.process_item(item, None)
+                for item in (first, duplicate, second)
+            ),
+            return_exceptions=True,
+        )
+        assert results[0] == first
+        assert isinstance(results[1], DropItem)
+        assert results[2] == second
+        assert await ApartmentBeanie.count() == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_flushes_record_change_once(
+        self,
+        bulk_mongo_pipeline: SaveToMongoWithDuplicatesCheck,
+        yit_apartment: Apartment,
+    ) -> None:
+        bulk_mongo_pipeline.bulk_size = 1  # every item written by its own request
+        await bulk_mongo_pipeline.process_item(yit_apartment, None)
+        cheaper = [
+            yit_apartment.copy(deep=True, update={"id": PydanticObjectId()})
+            for _ in range(2)
+        ]
+        for item in cheaper:
+            item.price.price = 250_000
+        await asyncio.gather(
+            *(bulk_mongo_pipeline.process_item(item, None) for item in cheaper)
+        )
+
+        assert bulk_mongo_pipeline.history is not None
+        points = await bulk_mongo_pipeline.history.find().sort("when").to_list(None)
+        assert [point["price"] for point in points] == [300_000, 250_000]
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import copy
 import json
 from typing import TYPE_CHECKING
 
 import pytest
+from scrapy.utils.test import get_crawler
 
 from scraper.spiders.yit import YitSkFlatsForSale
 from tests.scraper.spiders import make_fake_json_response
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from typing import Any
 
     from shared.models import Apartment
@@ -16,7 +19,7 @@ if TYPE_CHECKING:
 
 
 class TestYitSkFlatsForSale:
-    spider = YitSkFlatsForSale()
+    spider = YitSkFlatsForSale(page_size=10)
 
     def test_start_requests(self) -> None:
         [request] = self.spider.start_requests()
@@ -24,10 +27,10 @@ class TestYitSkFlatsForSale:
         assert request.method == "POST"
         assert request.callback == self.spider.continue_requests
         assert json.loads(request.body)["StartPage"] == 0
-        assert json.loads(request.body)["PageSize"] == self.spider.PER_PAGE
+        assert json.loads(request.body)["PageSize"] == self.spider.page_size
 
     @pytest.mark.parametrize(
-        # NOTE: expected_extra_requests is calculated with PER_PAGE=10
+        # NOTE: expected_extra_requests is calculated with page_size=10
         "total_hits,expected_extra_requests",
         ((0, 0), (1, 0), (10, 0), (11, 1), (100, 9), (319, 31)),
     )
@@ -45,7 +48,7 @@ class TestYitSkFlatsForSale:
             assert request.method == "POST"
             assert request.callback == self.spider.process_listing
             assert json.loads(request.body)["StartPage"] == index
-            assert json.loads(request.body)["PageSize"] == self.spider.PER_PAGE
+            assert json.loads(request.body)["PageSize"] == self.spider.page_size
 
     def test_continue_requests(self) -> None:
         fake_body: FakeYitApiResponse = {
@@ -58,13 +61,13 @@ class TestYitSkFlatsForSale:
                         "_Url": f"/foo{i}",
                     },
                 }
-                for i in range(self.spider.PER_PAGE)
+                for i in range(self.spider.page_size)
             ],
         }
         iterator = self.spider.continue_requests(make_fake_json_response(fake_body))
-        *photo_requests, extra_api_request = tuple(iterator)
+        extra_api_request, *photo_requests = tuple(iterator)
 
-        assert len(photo_requests) == self.spider.PER_PAGE
+        assert len(photo_requests) == self.spider.page_size
         for index, request in enumerate(photo_requests):
             assert request.method == "GET"
             assert request.url.endswith(str(index))
@@ -72,6 +75,36 @@ class TestYitSkFlatsForSale:
         assert extra_api_request.method == "POST"
         assert extra_api_request.url == self.spider.API_URL
 
+    def test_continue_requests_capped_page_size(self) -> None:
+        spider = YitSkFlatsForSale(page_size=100)
+        fake_body: FakeYitApiResponse = {
+            "TotalHits": 319,
+            "Hits": [
+                {
+                    "Fields": {
+                        "ProductItemForSale": True,
+                        "ProductItemForRent": False,
+                        "_Url": f"/foo{i}",
+                    },
+                }
+                for i in range(50)
+            ],
+        }
+        requests = tuple(spider.continue_requests(make_fake_json_response(fake_body)))
+        api_requests = [r for r in requests if r.method == "POST"]
+
+        assert len(api_requests) == 6
+        assert all(r.priority > requests[-1].priority for r in api_requests)
+        assert {json.loads(r.body)["PageSize"] for r in api_requests} == {50}
+        assert [json.loads(r.body)["StartPage"] for r in api_requests] == [*range(1, 7)]
+
+    def test_page_size_setting(self) -> None:
+        crawler = get_crawler(YitSkFlatsForSale, {"YIT_PAGE_SIZE": 42})
+        spider = YitSkFlatsForSale.from_crawler(crawler)
+        [request] = spider.start_requests()
+        assert json.loads(request.body)["PageSize"] == 42
+        assert YitSkFlatsForSale.from_crawler(crawler, page_size="7").page_size == 7
+
     def test_process_listing_empty(self) -> None:
         response = make_fake_json_response({"Hits": []})
         assert tuple(self.spider.process_listing(response)) == ()
@@ -87,13 +120,17 @@ class TestYitSkFlatsForSale:
             "https://www.yit.sk" + yit_apartment_from_server["Fields"]["_Url"]
         )
 
-    def test_yield_item(
+    @pytest.mark.asyncio
+    async def test_yield_item(
         self, yit_apartment_from_server: dict[str, Any], yit_apartment: Apartment
     ) -> None:
         expected = yit_apartment
-        apartments = tuple(
-            self.spider.yield_item(None, yit_apartment_from_server["Fields"])
-        )
+        apartments = [
+            item
+            async for item in self.spider.yield_item(
+                None, yit_apartment_from_server["Fields"]
+            )
+        ]
         assert len(apartments) == 1
 
         [result] = apartments
@@ -101,3 +138,73 @@ class TestYitSkFlatsForSale:
 
         result.id, expected.id = None, None
         assert result == expected
+
+
+class TestYitSkFlatsForSaleSharded:
+    @pytest.mark.parametrize("shard,shards", ((1, 1), (-1, 2), ("3", "3")))
+    def test_invalid_shard(self, shard: int | str, shards: int | str) -> None:
+        with pytest.raises(ValueError):
+            YitSkFlatsForSale(shard=shard, shards=shards)
+
+    def test_shards_split_pages(self) -> None:
+        fake_body: FakeYitApiResponse = {
+            "TotalHits": 100,
+            "Hits": [
+                {
+                    "Fields": {
+                        "ProductItemForSale": True,
+                        "ProductItemForRent": False,
+                        "_Url": f"/foo{i}",
+                    },
+                }
+                for i in range(10)
+            ],
+        }
+        pages: list[int] = []
+        for shard in range(3):
+            spider = YitSkFlatsForSale(shard=str(shard), shards="3", page_size=10)
+            requests = tuple(
+                spider.continue_requests(make_fake_json_response(fake_body))
+            )
+            api_requests = [r for r in requests if r.method == "POST"]
+            pages.extend(json.loads(r.body)["StartPage"] for r in api_requests)
+            # first page (already downloaded by every shard) is processed by one
+            assert len(requests) - len(api_requests) == (10 if shard == 0 else 0)
+
+        assert sorted(pages) == list(range(1, 10))
+
+
+class TestYitSkFlatsForSaleIncremental:
+    @pytest.fixture
+    def spider(self) -> Iterator[YitSkFlatsForSale]:
+        crawler = get_crawler(
+            YitSkFlatsForSale,
+            {"INCREMENTAL": True, "INCREMENTAL_STORE_PATH": ":memory:"},
+        )
+        spider = YitSkFlatsForSale.from_crawler(crawler)
+        yield spider
+        spider.closed("finished")
+
+    def test_unchanged_apartments_are_skipped(
+        self,
+        spider: YitSkFlatsForSale,
+        yit_apartment_from_server: dict[str, Any],
+        yit_apartment: Apartment,
+    ) -> None:
+        response = make_fake_json_response({"Hits": [yit_apartment_from_server]})
+        [request] = spider.process_listing(response)
+        # not scraped (e.g. dropped by pipeline), so requested again
+        [request] = spider.process_listing(response)
+
+        yit_apartment.url = request.url
+        spider.item_scraped(yit_apartment)
+        assert tuple(spider.process_listing(response)) == ()
+
+        changed = copy.deepcopy(yit_apartment_from_server)
+        changed["Fields"]["SalesPrice"] += 1
+        [_] = spider.process_listing(make_fake_json_response({"Hits": [changed]}))
+
+        assert spider.crawler.stats is not None
+        assert spider.crawler.stats.get_value("incremental/new") == 2
+        assert spider.crawler.stats.get_value("incremental/skipped") == 1
+        assert spider.crawler.stats.get_value("incremental/changed") == 1
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from tempfile import NamedTemporaryFile
+from typing import TYPE_CHECKING
+
+import geojson
+import pytest
+from pydantic.json import pydantic_encoder
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.extensions.postprocessing import PostProcessingManager
+
+from scraper.feeds import JsonLinesExporter, MultipartS3FeedStorage, ParquetItemExporter
+from shared.models import Change, Location
+from shared.s3 import InMemoryS3Client
+
+if TYPE_CHECKING:
+    from shared.models import Apartment
+
+
+@pytest.fixture
+def apartment(yit_apartment: Apartment) -> Apartment:
+    yit_apartment.location = Location(
+        country_code="sk", gps=geojson.Point((17.1, 48.1)), address="Bratislava"
+    )
+    yit_apartment.photos = ["photos/1.jpg"]
+    yit_apartment.history = [Change(what={"price": 310_000})]
+    return yit_apartment
+
+
+def export(
+    apartments: list[Apartment], exporter_class: type, **kwargs: object
+) -> bytes:
+    file = io.BytesIO()
+    exporter = exporter_class(file, **kwargs)
+    exporter.start_exporting()
+    for apartment in apartments:
+        exporter.export_item(apartment)
+    exporter.finish_exporting()
+    return file.getvalue()
+
+
+class TestJsonLinesExporter:
+    def test_same_as_scrapy_exporter(self, apartment: Apartment) -> None:
+        ours = export([apartment, apartment], JsonLinesExporter)
+        scrapys = export(
+            [apartment, apartment], JsonLinesItemExporter, default=pydantic_encoder
+        )
+        assert len(ours.splitlines()) == 2
+        assert list(map(json.loads, ours.splitlines())) == list(
+            map(json.loads, scrapys.splitlines())
+        )
+
+
+class TestCompression:
+    def test_gzip_leaves_file_open_for_storage(self, apartment: Apartment) -> None:
+        with NamedTemporaryFile() as file:
+            plugins = ["scraper.feeds.GzipPlugin"]
+            manager = PostProcessingManager(plugins, file, {})
+            manager.write(b'{"a": 1}\n')
+            manager.close()
+            file.seek(0)
+            assert gzip.decompress(file.read()) == b'{"a": 1}\n'
+
+    def test_zstd(self) -> None:
+        zstandard = pytest.importorskip("zstandard")
+        with NamedTemporaryFile() as file:
+            plugins = ["scraper.feeds.ZstdPlugin"]
+            manager = PostProcessingManager(plugins, file, {"zstd_level": 1})
+            manager.write(b'{"a": 1}\n' * 100)
+            manager.close()
+            file.seek(0)
+            reader = zstandard.ZstdDecompressor().stream_reader(file)
+            assert reader.read() == b'{"a": 1}\n' * 100
+
+
+class TestParquetItemExporter:
+    def test_schema_and_row_groups(self, apartment: Apartment) -> None:
+        pq = pytest.importorskip("pyarrow.parquet")
+        apartments = [apartment.copy(update={"floor": i}) for i in range(5)]
+        apartments[1].location = None
+        body = export(apartments, ParquetItemExporter, row_group_size=2)
+
+        parquet = pq.ParquetFile(io.BytesIO(body))
+        assert parquet.metadata.num_row_groups == 3
+        assert parquet.schema_arrow.field("price").type.get_field_index("price") == 0
+        rows = parquet.read().to_pylist()
+        assert [row["floor"] for row in rows] == [0, 1, 2, 3, 4]
+        assert rows[0]["location"]["gps"]["coordinates"] == [17.1, 48.1]
+        assert rows[1]["location"] is None
+        assert rows[0]["status"] == "FREE"
+        assert json.loads(rows[0]["history"][0]["what"]) == {"price": 310_000}
+
+
+class TestMultipartS3FeedStorage:
+    @pytest.fixture
+    def storage(self) -> MultipartS3FeedStorage:
+        storage = MultipartS3FeedStorage("s3://feeds/apartments.jsonl.gz", part_size=5)
+        storage.s3_client = InMemoryS3Client()
+        storage.s3_client.create_bucket(Bucket="feeds")
+        return storage
+
+    def store(self, storage: MultipartS3FeedStorage, body: bytes) -> bytes:
+        file = io.BytesIO(body)
+        storage._store_in_thread(file)
+        assert file.closed
+        stored: bytes = storage.s3_client.buckets["feeds"]["apartments.jsonl.gz"]
+        return stored
+
+    def test_small_file_single_put(self, storage: MultipartS3FeedStorage) -> None:
+        assert self.store(storage, b"1234") == b"1234"
+        assert "CreateMultipartUpload" not in storage.s3_client.calls
+
+    def test_multipart(self, storage: MultipartS3FeedStorage) -> None:
+        assert self.store(storage, b"0123456789abc") == b"0123456789abc"
+        assert storage.s3_client.calls.count("UploadPart") == 3
+        assert storage.s3_client.uploads == {}
+
+    def test_failed_upload_is_aborted(self, storage: MultipartS3FeedStorage) -> None:
+        storage.s3_client.upload_part = None  # not callable
+        with pytest.raises(TypeError):
+            self.store(storage, b"0123456789abc")
+        assert "AbortMultipartUpload" in storage.s3_client.calls
+        assert storage.s3_client.uploads == {}
+        assert "apartments.jsonl.gz" not in storage.s3_client.buckets["feeds"]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from scraper.httpcache import BoundedFilesystemCacheStorage, HttpCacheHitRatio
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture
+def spider(tmp_path: Path) -> Spider:
+    crawler = get_crawler(
+        Spider,
+        {
+            "HTTPCACHE_DIR": str(tmp_path),
+            "HTTPCACHE_GZIP": True,
+            "HTTPCACHE_MAX_SIZE": 1600,
+        },
+    )
+    return crawler._create_spider("test")
+
+
+@pytest.fixture
+def storage(spider: Spider) -> Iterator[BoundedFilesystemCacheStorage]:
+    storage = BoundedFilesystemCacheStorage(spider.crawler.settings)
+    storage.open_spider(spider)
+    yield storage
+    storage.close_spider(spider)
+
+
+def store(storage: BoundedFilesystemCacheStorage, spider: Spider, url: str) -> Request:
+    request = Request(url)
+    body = url.encode() + bytes(range(256)) * 2
+    response = HtmlResponse(url, body=body, headers={"ETag": '"foo"'})
+    storage.store_response(spider, request, response)
+    return request
+
+
+class TestBoundedFilesystemCacheStorage:
+    def test_store_and_retrieve(
+        self, storage: BoundedFilesystemCacheStorage, spider: Spider
+    ) -> None:
+        request = store(storage, spider, "https://www.yit.sk/foo")
+        response = storage.retrieve_response(spider, request)
+        assert response is not None
+        assert response.body.startswith(b"https://www.yit.sk/foo")
+        assert response.headers["ETag"] == b'"foo"'
+        assert storage.size > 0
+
+    def test_least_recently_used_are_evicted(
+        self, storage: BoundedFilesystemCacheStorage, spider: Spider
+    ) -> None:
+        first = store(storage, spider, "https://www.yit.sk/1")
+        second = store(storage, spider, "https://www.yit.sk/2")
+        assert storage.retrieve_response(spider, first) is not None  # used again
+        store(storage, spider, "https://www.yit.sk/3")
+
+        assert storage.size <= storage.max_size
+        assert storage.retrieve_response(spider, second) is None
+        assert storage.retrieve_response(spider, first) is not None
+        assert spider.crawler.stats.get_value("httpcache/evicted") >= 1
+
+    def test_entries_are_loaded_on_open(
+        self, storage: BoundedFilesystemCacheStorage, spider: Spider
+    ) -> None:
+        store(storage, spider, "https://www.yit.sk/foo")
+        reopened = BoundedFilesystemCacheStorage(spider.crawler.settings)
+        reopened.open_spider(spider)
+        assert reopened.size == storage.size
+
+
+@pytest.mark.parametrize(
+    "stats,expected",
+    (
+        ({}, None),
+        ({"httpcache/miss": 4}, 0),
+        ({"httpcache/hit": 1, "httpcache/revalidate": 2, "httpcache/miss": 1}, 0.75),
+        ({"httpcache/revalidate": 1, "httpcache/invalidate": 1}, 0.5),
+    ),
+)
+def test_hit_ratio(spider: Spider, stats: dict[str, int], expected: float) -> None:
+    spider.crawler.stats.set_stats(stats)
+    HttpCacheHitRatio.from_crawler(spider.crawler).spider_closed(spider)
+    assert spider.crawler.stats.get_value("httpcache/hit_ratio") == expected
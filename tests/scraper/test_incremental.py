@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from scraper.incremental import Fingerprints
+from shared.cache import DiskCache
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@pytest.fixture
+def fingerprints() -> Iterator[Fingerprints]:
+    store = Fingerprints(DiskCache(":memory:"))
+    yield store
+    store.close()
+
+
+class TestFingerprints:
+    def test_fingerprint_ignores_key_order(self) -> None:
+        assert Fingerprints.fingerprint({"a": 1, "b": 2}) == Fingerprints.fingerprint(
+            {"b": 2, "a": 1}
+        )
+        assert Fingerprints.fingerprint({"a": 1}) != Fingerprints.fingerprint({"a": 2})
+
+    def test_check(self, fingerprints: Fingerprints) -> None:
+        fields = {"SalesPrice": 100_000, "ReservationStatusKey": "Free"}
+        state, fingerprint = fingerprints.check("/foo", fields)
+        assert state == "new"
+        # not saved until `.seen()`
+        assert fingerprints.check("/foo", fields)[0] == "new"
+
+        fingerprints.seen("/foo", fingerprint)
+        assert fingerprints.check("/foo", fields) == ("skipped", fingerprint)
+        assert fingerprints.check("/foo", fields | {"SalesPrice": 1})[0] == "changed"
+        assert fingerprints.cache.get("/foo")["last_seen"] > 0
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import fail, succeed
+
+from scraper.metrics import PipelineMetrics, metrics_file, timed_pipeline, to_stats
+from shared.metrics import Registry
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+    from typing import Any
+
+
+REGISTRY = Registry()
+
+
+class Pipeline:
+    @timed_pipeline(REGISTRY)
+    def process_item(self, item: Any, spider: Spider) -> Any:
+        if item == "drop":
+            raise DropItem
+        return item
+
+
+class DeferredPipeline:
+    @timed_pipeline(REGISTRY)
+    def process_item(self, item: Any, spider: Spider) -> Any:
+        if item == "error":
+            return fail(ValueError())
+        return succeed(item) if item != "drop" else fail(DropItem())
+
+
+class AsyncPipeline:
+    @timed_pipeline(REGISTRY)
+    async def process_item(self, item: Any, spider: Spider) -> Any:
+        if item == "drop":
+            raise DropItem
+        return item
+
+
+@pytest.fixture(autouse=True)
+def registry() -> Iterator[Registry]:
+    yield REGISTRY
+    REGISTRY.metrics.clear()
+
+
+@pytest.fixture
+def extension(tmp_path: Path, registry: Registry) -> PipelineMetrics:
+    crawler = get_crawler(Spider, {"METRICS_FILE": str(tmp_path / "scraper.prom")})
+    return PipelineMetrics(
+        crawler, path=crawler.settings["METRICS_FILE"], registry=registry
+    )
+
+
+def outcomes(registry: Registry, pipeline: str) -> dict[str, float]:
+    counter = registry.counter("pipeline_items_total")
+    return {
+        dict(labels)["outcome"]: value
+        for labels, value in counter.values.items()
+        if dict(labels)["pipeline"] == pipeline
+    }
+
+
+class TestTimedPipeline:
+    def test_sync(self, registry: Registry) -> None:
+        pipeline = Pipeline()
+        assert pipeline.process_item("item", None) == "item"
+        with pytest.raises(DropItem):
+            pipeline.process_item("drop", None)
+        assert outcomes(registry, "Pipeline") == {"ok": 1, "dropped": 1}
+        histogram = registry.histogram("pipeline_seconds")
+        assert list(histogram.values) == [(("pipeline", "Pipeline"),)]
+
+    def test_deferred(self, registry: Registry) -> None:
+        pipeline = DeferredPipeline()
+        results: list[Any] = []
+        pipeline.process_item("item", None).addCallback(results.append)
+        for item in ("drop", "error"):
+            pipeline.process_item(item, None).addErrback(
+                lambda failure: results.append(failure.type)
+            )
+        assert results == ["item", DropItem, ValueError]
+        assert outcomes(registry, "DeferredPipeline") == {
+            "ok": 1,
+            "dropped": 1,
+            "error": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_async(self, registry: Registry) -> None:
+        pipeline = AsyncPipeline()
+        assert await pipeline.process_item("item", None) == "item"
+        with pytest.raises(DropItem):
+            await pipeline.process_item("drop", None)
+        assert outcomes(registry, "AsyncPipeline") == {"ok": 1, "dropped": 1}
+
+
+class TestPipelineMetrics:
+    def test_closed_writes_file_and_stats(
+        self, extension: PipelineMetrics, tmp_path: Path
+    ) -> None:
+        Pipeline().process_item("item", None)
+        extension.spider_closed(Spider("test"))
+
+        text = (tmp_path / "scraper.prom").read_text()
+        assert 'pipeline_items_total{outcome="ok",pipeline="Pipeline"} 1' in text
+        assert [path.name for path in tmp_path.iterdir()] == ["scraper.prom"]
+        assert extension.crawler.stats is not None
+        stats = extension.crawler.stats.get_stats()
+        assert stats["metrics/pipeline_items_total/outcome=ok/pipeline=Pipeline"] == 1
+        assert stats["metrics/pipeline_seconds/pipeline=Pipeline/count"] == 1
+
+    def test_failed_write_is_logged(
+        self,
+        extension: PipelineMetrics,
+        tmp_path: Path,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        (tmp_path / "scraper.prom").mkdir()  # can't be replaced by a file
+        extension.write()
+        assert "Cannot write metrics" in caplog.text
+        assert [path.name for path in tmp_path.iterdir()] == ["scraper.prom"]
+
+
+def test_metrics_file() -> None:
+    assert metrics_file(".cache/scraper.prom", "yit") == ".cache/scraper.yit.prom"
+    assert metrics_file(".cache/scraper.prom", "yit", 0) == ".cache/scraper.yit-0.prom"
+
+
+def test_to_stats_is_additive() -> None:
+    registry = Registry()
+    registry.histogram("seconds", buckets=(1,)).observe(0.25, field="price")
+    registry.gauge("in_use").set(3)
+    crawler = get_crawler(Spider)
+    assert crawler.stats is not None
+    to_stats(registry, crawler.stats)
+    assert crawler.stats.get_stats() == {
+        "metrics/seconds/field=price/count": 1,
+        "metrics/seconds/field=price/sum": 0.25,
+    }
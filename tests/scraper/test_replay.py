@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import HtmlResponse, JsonRequest, Response, TextResponse
+from scrapy.utils.test import get_crawler
+
+from scraper.replay import Archive, ReplayMiddleware
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def make_middleware(mode: str | None, path: Path) -> ReplayMiddleware:
+    crawler = get_crawler(Spider, {"REPLAY_MODE": mode, "REPLAY_ARCHIVE": str(path)})
+    return ReplayMiddleware.from_crawler(crawler)
+
+
+class TestArchive:
+    def test_save_and_load(self, tmp_path: Path) -> None:
+        api = JsonRequest("https://www.yit.sk/api", data={"StartPage": 1})
+        page = Request("https://www.yit.sk/foo")
+        photo = Request("https://www.yit.sk/foo.jpg")
+
+        archive = Archive()
+        archive.add(api, TextResponse(api.url, body=b'{"Hits": []}'))
+        archive.add(
+            page,
+            HtmlResponse(
+                page.url,
+                body="<p>byt</p>".encode(),
+                headers={"Content-Type": "text/html", "Content-Encoding": "gzip"},
+            ),
+        )
+        archive.add(photo, Response(photo.url, body=b"\xff\xd8\xff"))
+        archive.save(tmp_path / "archive.har.json")
+
+        loaded = Archive.load(tmp_path / "archive.har.json")
+        assert len(loaded) == 3
+
+        api_response = loaded.get(api)
+        assert isinstance(api_response, TextResponse)
+        assert api_response.json() == {"Hits": []}
+        assert loaded.get(api.replace(body=b'{"StartPage": 2}')) is None
+
+        page_response = loaded.get(page)
+        assert isinstance(page_response, HtmlResponse)
+        assert page_response.text == "<p>byt</p>"
+        assert b"Content-Encoding" not in page_response.headers
+
+        photo_response = loaded.get(photo)
+        assert photo_response is not None
+        assert photo_response.body == b"\xff\xd8\xff"
+        assert "replayed" in photo_response.flags
+
+
+class TestReplayMiddleware:
+    def test_disabled_by_default(self, tmp_path: Path) -> None:
+        with pytest.raises(NotConfigured):
+            make_middleware(None, tmp_path / "archive.har.json")
+
+    def test_record_and_replay(self, tmp_path: Path) -> None:
+        path = tmp_path / "archive.har.json"
+        spider = Spider("test")
+        request = Request(
+            "https://www.yit.sk/foo/", meta={"redirect_urls": ["https://yit.sk/foo"]}
+        )
+
+        recorder = make_middleware("record", path)
+        assert recorder.process_request(request, spider) is None
+        recorder.process_response(
+            request, HtmlResponse(request.url, body=b"<p>byt</p>"), spider
+        )
+        recorder.spider_closed(spider)
+
+        replayer = make_middleware("replay", path)
+        for url in ("https://www.yit.sk/foo/", "https://yit.sk/foo"):
+            response = replayer.process_request(Request(url), spider)
+            assert response is not None
+            assert response.body == b"<p>byt</p>"
+        with pytest.raises(IgnoreRequest):
+            replayer.process_request(Request("https://www.yit.sk/bar"), spider)
+        assert replayer.stats is not None
+        assert replayer.stats.get_value("replay/hit") == 2
+        assert replayer.stats.get_value("replay/missing") == 1
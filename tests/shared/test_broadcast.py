@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from shared import broadcast
+from shared.broadcast import (
+    RESET,
+    Broadcaster,
+    ChangeStreamSource,
+    Event,
+    PollingSource,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+    from typing import Any
+
+
+class QueueSource:
+    """Events put to the queue, exceptions are raised."""
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[Event | Exception] = asyncio.Queue()
+        self.calls = 0
+
+    async def events(self) -> AsyncIterator[Event]:
+        self.calls += 1
+        while True:
+            event = await self.queue.get()
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+def insert(token: str) -> Event:
+    return Event(token=token, operation="insert", id=token, document={"_id": token})
+
+
+async def receive(subscription: broadcast.Subscription, count: int) -> list[str]:
+    events = [await asyncio.wait_for(anext(subscription), 1) for _ in range(count)]
+    return [event.token for event in events]
+
+
+class TestBroadcaster:
+    @pytest.mark.asyncio
+    async def test_fan_out(self) -> None:
+        source = QueueSource()
+        broadcaster = Broadcaster(source)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        for token in "abc":
+            source.queue.put_nowait(insert(token))
+        assert await receive(first, 3) == await receive(second, 3) == list("abc")
+        assert source.calls == 1  # one source for all subscribers
+
+        await broadcaster.close()
+        assert [event async for event in first] == []
+
+    @pytest.mark.asyncio
+    async def test_resume(self) -> None:
+        source = QueueSource()
+        broadcaster = Broadcaster(source, buffer_size=3, max_pending=10)
+        subscription = broadcaster.subscribe()
+        for token in "abcd":
+            source.queue.put_nowait(insert(token))
+        await receive(subscription, 4)
+
+        assert await receive(broadcaster.subscribe(after="c"), 1) == ["d"]
+        assert await receive(broadcaster.subscribe(after="a"), 1) == [RESET.token]
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_reset(self) -> None:
+        broadcaster = Broadcaster(QueueSource(), max_pending=2)
+        subscription = broadcaster.subscribe()
+        for token in "abc":
+            broadcaster.publish(insert(token))
+        assert [event async for event in subscription] == [RESET]
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_source_failure_is_retried(self) -> None:
+        source = QueueSource()
+        broadcaster = Broadcaster(source, retry_interval=0)
+        subscription = broadcaster.subscribe()
+        source.queue.put_nowait(insert("a"))
+        source.queue.put_nowait(PyMongoError("lost connection"))
+        source.queue.put_nowait(insert("b"))
+        assert await receive(subscription, 2) == ["a", "b"]
+        assert source.calls == 2
+        await broadcaster.close()
+
+
+class TestPollingSource:
+    @pytest.mark.asyncio
+    async def test_new_and_changed_apartments(self) -> None:
+        collection = AsyncMongoMockClient()["feed"]["apartments"]
+        now = datetime.datetime.utcnow
+        # stored before the first poll, not an event
+        await collection.insert_one({"_id": ObjectId(), "updated_at": now()})
+        source = PollingSource(collection, interval=0.01)
+        events = source.events()
+
+        new, late = ObjectId(), ObjectId()
+        poll = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)  # the first poll
+        await collection.insert_one({"_id": new, "updated_at": now(), "history": []})
+        event = await asyncio.wait_for(poll, 1)
+        assert (event.operation, event.id) == ("insert", new)
+
+        # written earlier, stored late, still in the overlap
+        written = now() - datetime.timedelta(seconds=2)
+        await collection.insert_one({"_id": late, "updated_at": written})
+        event = await asyncio.wait_for(anext(events), 1)
+        assert (event.operation, event.id) == ("insert", late)
+
+        await collection.update_one(
+            {"_id": new},
+            {"$set": {"updated_at": now()}, "$push": {"history": {"what": {}}}},
+        )
+        event = await asyncio.wait_for(anext(events), 1)
+        assert (event.operation, event.id) == ("update", new)
+        assert event.document is not None
+        assert event.document["history"] == [{"what": {}}]
+
+
+@pytest.mark.asyncio
+async def test_mongomock_is_polled() -> None:
+    database = AsyncMongoMockClient()["feed"]
+    assert not await broadcast.supports_change_streams(database)
+    assert isinstance(await broadcast.source(database, "apartments"), PollingSource)
+
+
+class FakeChangeStream:
+    """Changes of `watch()`, exceptions are raised, then waits forever."""
+
+    def __init__(self, changes: list[dict[str, Any] | Exception]) -> None:
+        self.changes = changes
+
+    async def __aenter__(self) -> FakeChangeStream:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        pass
+
+    async def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        for change in self.changes:
+            if isinstance(change, Exception):
+                raise change
+            yield change
+        await asyncio.Event().wait()
+
+
+class FakeCollection:
+    def __init__(self, *streams: list[dict[str, Any] | Exception]) -> None:
+        self.streams = list(streams)
+        self.resumed_after: list[Any] = []
+
+    def watch(self, full_document: str, resume_after: Any) -> FakeChangeStream:
+        self.resumed_after.append(resume_after)
+        return FakeChangeStream(self.streams.pop(0))
+
+
+def change(token: str, operation: str = "insert") -> dict[str, Any]:
+    return {
+        "_id": {"_data": token},
+        "operationType": operation,
+        "documentKey": {"_id": token},
+        "fullDocument": {"_id": token},
+    }
+
+
+class TestChangeStreamSource:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "end",
+        [
+            OperationFailure("resume token not found", code=286),
+            change("x", operation="invalidate"),
+        ],
+        ids=["history_lost", "invalidate"],
+    )
+    async def test_reset_and_new_stream(self, end: dict[str, Any] | Exception) -> None:
+        collection = FakeCollection([change("a"), end], [change("b")])
+        source = ChangeStreamSource(collection)  # type: ignore[arg-type]
+        broadcaster = Broadcaster(source, retry_interval=0)
+        subscription = broadcaster.subscribe()
+        assert await receive(subscription, 3) == ["a", RESET.token, "b"]
+        assert collection.resumed_after == [None, None]  # not the lost token again
+
+        # buffered events before RESET don't resume
+        assert await receive(broadcaster.subscribe(after="a"), 1) == [RESET.token]
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_failure_is_resumed(self) -> None:
+        collection = FakeCollection([change("a"), PyMongoError("lost")], [change("b")])
+        source = ChangeStreamSource(collection)  # type: ignore[arg-type]
+        broadcaster = Broadcaster(source, retry_interval=0)
+        subscription = broadcaster.subscribe()
+        assert await receive(subscription, 2) == ["a", "b"]
+        assert collection.resumed_after == [None, {"_data": "a"}]
+        await broadcaster.close()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+
+from shared.cache import DiskCache
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def disk_cache(tmp_path: Path) -> DiskCache:
+    return DiskCache(tmp_path / "cache.sqlite3")
+
+
+class TestDiskCache:
+    def test_get_set(self, disk_cache: DiskCache) -> None:
+        assert disk_cache.get("foo") is None
+        assert disk_cache.get("foo", default=False) is False
+
+        disk_cache.set("foo", {"bar": [1, 2]})
+        assert disk_cache.get("foo") == {"bar": [1, 2]}
+        assert "foo" in disk_cache
+        assert len(disk_cache) == 1
+
+        disk_cache.delete("foo")
+        assert "foo" not in disk_cache
+
+    def test_persistence(self, tmp_path: Path) -> None:
+        DiskCache(tmp_path / "cache.sqlite3").set("foo", None)
+        assert "foo" in DiskCache(tmp_path / "cache.sqlite3")
+
+    def test_shared_by_connections(self, tmp_path: Path) -> None:
+        first = DiskCache(tmp_path / "cache.sqlite3")
+        second = DiskCache(tmp_path / "cache.sqlite3", timeout=0.1)
+        [mode] = first._db.execute("PRAGMA journal_mode").fetchone()
+        assert mode == "wal"
+        with first._lock, first._db:  # uncommitted write doesn't block readers
+            first._db.execute("INSERT INTO cache VALUES ('foo', '1', 0, 0)")
+            assert second.get("foo") is None
+        assert second.get("foo") == 1
+
+    def test_ttl(self, tmp_path: Path) -> None:
+        cache = DiskCache(tmp_path / "cache.sqlite3", ttl=10)
+        with patch("time.time", return_value=1_000):
+            cache.set("foo", 1)
+        with patch("time.time", return_value=1_005):
+            assert cache.get("foo") == 1
+        with patch("time.time", return_value=1_011):
+            assert cache.get("foo") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self) -> None:
+        cache = DiskCache(":memory:", max_entries=2)
+        with patch("time.time", side_effect=range(1_000, 2_000, 100)):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            cache.get("a")  # "b" becomes least recently used
+            cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_access_time_is_updated_after_interval(self) -> None:
+        cache = DiskCache(":memory:", touch_interval=60)
+        with patch("time.time", return_value=1_000):
+            cache.set("foo", 1)
+        accessed = "SELECT accessed FROM cache WHERE key = 'foo'"
+        with patch("time.time", return_value=1_030):
+            assert cache.get("foo") == 1
+        assert cache._db.execute(accessed).fetchone() == (1_000,)
+        with patch("time.time", return_value=1_060):
+            assert cache.get("foo") == 1
+        assert cache._db.execute(accessed).fetchone() == (1_060,)
+
+    def test_eviction_is_batched(self) -> None:
+        cache = DiskCache(":memory:", max_entries=10, evict_every=3)
+        with patch("time.time", side_effect=range(1_000, 1_100)):
+            for i in range(11):
+                cache.set(str(i), i)
+            assert len(cache) == 11  # over the limit until the next eviction
+            cache.set("11", 11)
+            assert len(cache) == 10
+            assert "0" not in cache and "1" not in cache and "2" in cache
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import monitoring
+
+from shared import connections
+from shared.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from shared.settings import Settings
+
+ADDRESS = ("test-pool", 27017)
+
+
+@pytest.fixture
+def mock_motor_client() -> Iterator[None]:
+    with patch("shared.connections.AsyncIOMotorClient", AsyncMongoMockClient):
+        yield
+
+
+class TestMongo:
+    def test_options(self, test_settings: Settings) -> None:
+        test_settings.MONGO_COMPRESSORS = "zstd,snappy"
+        test_settings.MONGO_SOCKET_TIMEOUT = None
+        options = connections.mongo_options(test_settings)
+        assert options["connectTimeoutMS"] == test_settings.MONGO_CONNECT_TIMEOUT * 1000
+        assert options["socketTimeoutMS"] is None
+        assert options["compressors"] == "zstd,snappy"
+        test_settings.MONGO_COMPRESSORS = ""
+        assert "compressors" not in connections.mongo_options(test_settings)
+
+    @pytest.mark.usefixtures("mock_motor_client")
+    def test_shared_until_released(self, test_settings: Settings) -> None:
+        api, pipeline = [connections.mongo_client(test_settings) for _ in range(2)]
+        assert api is pipeline
+        connections.close_mongo_client(api)
+        assert connections.mongo_client(test_settings) is pipeline  # still in use
+        connections.close_mongo_client(pipeline)
+        connections.close_mongo_client(pipeline)
+        new = connections.mongo_client(test_settings)
+        assert new is not pipeline
+        test_settings.MONGO_MAX_POOL_SIZE = 5
+        other = connections.mongo_client(test_settings)
+        assert other is not new
+        for client in (new, other):
+            connections.close_mongo_client(client)
+        assert not connections._mongo_clients
+
+    def test_not_shared_client_is_closed(self) -> None:
+        client = MagicMock()
+        connections.close_mongo_client(client)
+        client.close.assert_called_once_with()
+
+    def test_pool_metrics(self) -> None:
+        listener, address = connections.PoolMetrics(), "test-pool:27017"
+        listener.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {"maxPoolSize": 5}))
+        for id in (1, 2):
+            listener.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, id))
+            listener.connection_checked_out(
+                monitoring.ConnectionCheckedOutEvent(ADDRESS, id)
+            )
+        listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+        listener.connection_check_out_failed(
+            monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout")
+        )
+        labels = (("address", address),)
+        assert REGISTRY.gauge("mongo_pool_max_size").values[labels] == 5
+        assert REGISTRY.gauge("mongo_pool_connections").values[labels] == 2
+        assert REGISTRY.gauge("mongo_pool_in_use").values[labels] == 1
+        failures = REGISTRY.counter("mongo_pool_checkout_failures_total")
+        assert failures.values[(("address", address), ("reason", "timeout"))] == 1
+
+        listener.pool_closed(monitoring.PoolClosedEvent(ADDRESS))
+        assert REGISTRY.gauge("mongo_pool_connections").values[labels] == 0
+
+
+class TestS3:
+    def test_shared_client(self, test_settings: Settings) -> None:
+        args = ("login", "password", "http://s3.test:9000")
+        client = connections.s3_client(*args, test_settings)
+        assert connections.s3_client(*args, test_settings) is client
+        assert client.meta.config.tcp_keepalive
+        assert (
+            client.meta.config.max_pool_connections
+            == test_settings.S3_MAX_POOL_CONNECTIONS
+        )
+        test_settings.S3_MAX_POOL_CONNECTIONS += 1
+        assert connections.s3_client(*args, test_settings) is not client
+
+    def test_requests_in_flight(self, test_settings: Settings) -> None:
+        endpoint = "http://127.0.0.1:9"  # refused
+        test_settings.S3_MAX_ATTEMPTS = 2
+        client = connections.s3_client("login", "password", endpoint, test_settings)
+        in_flight = REGISTRY.gauge("s3_requests_in_flight").values
+        labels = (("endpoint", endpoint),)
+        sending: list[float] = []
+        client.meta.events.register(
+            "before-send.s3", lambda **_: sending.append(in_flight[labels])
+        )
+        with pytest.raises(EndpointConnectionError):
+            client.head_bucket(Bucket="photos")
+        assert sending == [1, 1]  # each attempt, the failed one was finished
+        assert in_flight[labels] == 0
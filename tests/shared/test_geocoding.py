@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from shared.geocoding import Geocoder, OfflineBackend, Place, get_geocoder
+from shared.models import Location
+
+BRATISLAVA = Place(country_code="sk", address="Bratislava, Slovensko")
+
+
+@pytest.fixture
+def backend() -> OfflineBackend:
+    return OfflineBackend(places={(48.1486, 17.1077): BRATISLAVA})
+
+
+@pytest.fixture
+def geocoder(backend: OfflineBackend) -> Geocoder:
+    return Geocoder(backend=backend, min_interval=0)
+
+
+class TestGeocoder:
+    def test_reverse_is_cached_by_rounded_coordinates(
+        self, geocoder: Geocoder, backend: OfflineBackend
+    ) -> None:
+        assert geocoder.reverse(48.14861, 17.10771) == BRATISLAVA
+        assert geocoder.reverse(48.14859, 17.10769) == BRATISLAVA
+        assert backend.calls == 1
+
+    def test_negative_result_is_cached(
+        self, geocoder: Geocoder, backend: OfflineBackend
+    ) -> None:
+        assert geocoder.reverse(0, 0) is None
+        assert geocoder.cached(0, 0) == (True, None)
+        assert geocoder.reverse(0, 0) is None
+        assert backend.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_areverse_coalesces_concurrent_lookups(
+        self, geocoder: Geocoder, backend: OfflineBackend
+    ) -> None:
+        places = await asyncio.gather(
+            *(geocoder.areverse(48.1486, 17.1077) for _ in range(10))
+        )
+        assert places == [BRATISLAVA] * 10
+        assert backend.calls == 1
+        assert geocoder._inflight == {}
+
+    def test_min_interval(self, backend: OfflineBackend) -> None:
+        geocoder = Geocoder(backend=backend, min_interval=5)
+        with patch("time.sleep") as sleep:
+            geocoder.reverse(1, 1)
+            geocoder.reverse(2, 2)
+        [call] = sleep.call_args_list
+        assert 0 < call.args[0] <= 5
+
+
+def test_offline_backend_is_not_throttled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GEOCODING_BACKEND", "offline")
+    monkeypatch.setenv("GEOCODING_CACHE_PATH", ":memory:")
+    get_geocoder.cache_clear()
+    try:
+        geocoder = get_geocoder()
+        assert isinstance(geocoder.backend, OfflineBackend)
+        assert geocoder.min_interval == 0
+    finally:
+        get_geocoder.cache_clear()
+
+
+class TestLocationGeolocate:
+    @pytest.mark.parametrize("latitude, longitude", ((None, None), ("48", 17)))
+    def test_not_coordinates(self, latitude: float, longitude: float) -> None:
+        with patch("shared.models.get_geocoder") as get_geocoder:
+            assert Location.geolocate(latitude, longitude) is None
+        get_geocoder.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_geolocate(self, geocoder: Geocoder) -> None:
+        with patch("shared.models.get_geocoder", return_value=geocoder):
+            expected = await Location.ageolocate(48.1486, 17.1077)
+            assert Location.geolocate(48.1486, 17.1077) == expected
+
+        assert expected is not None
+        assert expected.country_code == BRATISLAVA.country_code
+        assert expected.address == BRATISLAVA.address
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, cast
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from shared import history
+from shared.models import Status
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from shared.models import Apartment
+
+
+def make_point(
+    apartment: Apartment, when: str, price: float, **meta: Any
+) -> dict[str, Any]:
+    apartment.price.price = price
+    when_ = datetime.datetime.fromisoformat(when)
+    point = history.point(cast(ObjectId, apartment.id), apartment, when_)
+    point["meta"] |= meta
+    return point
+
+
+@pytest.fixture
+def collection() -> Any:
+    return mongomock.MongoClient().db.history
+
+
+def test_url_groups() -> None:
+    url = "https://www.yit.sk/en/flats-for-sale/bratislava/slnecnice/a-123?x=1"
+    assert history.url_groups(url) == ("bratislava", "slnecnice")
+    url = "https://www.yit.sk/en/flats-for-sale/bratislava/foo/bar/123456"
+    assert history.url_groups(url) == ("bratislava", "foo")
+    url = "https://www.yit.sk/en/flats-for-sale/bratislava"
+    assert history.url_groups(url) == ("bratislava", "")
+    assert history.url_groups("https://www.yit.sk/123") == ("", "")
+
+
+def test_point(yit_apartment: Apartment) -> None:
+    when = datetime.datetime(2026, 1, 1)
+    apartment_id = cast(ObjectId, yit_apartment.id)
+    assert history.point(apartment_id, yit_apartment, when) == {
+        "when": when,
+        "meta": {"apartment": apartment_id, "project": "foo", "city": "bratislava"},
+        "price": 300_000,
+        "currency": "EUR",
+        "size": 60,
+        "status": "FREE",
+    }
+
+
+class TestAggregations:
+    def test_apartment_trend(self, collection: Any, yit_apartment: Apartment) -> None:
+        apartment_id = cast(ObjectId, yit_apartment.id)
+        collection.insert_many(
+            [
+                make_point(yit_apartment, "2026-01-01T10:00", 300_000),
+                make_point(yit_apartment, "2026-01-20T10:00", 280_000),
+                make_point(yit_apartment, "2026-01-10T10:00", 310_000),
+                make_point(yit_apartment, "2026-02-01T10:00", 290_000),
+                make_point(
+                    yit_apartment.copy(update={"id": ObjectId()}), "2026-01-01", 1
+                ),
+            ]
+        )
+        pipeline = history.apartment_trend_pipeline(apartment_id, "month")
+        assert list(collection.aggregate(pipeline)) == [
+            {
+                "period": "2026-01",
+                "price": 280_000,  # the last one, not the last inserted
+                "price_min": 280_000,
+                "price_max": 310_000,
+                "status": Status.FREE,
+                "changes": 3,
+            },
+            {
+                "period": "2026-02",
+                "price": 290_000,
+                "price_min": 290_000,
+                "price_max": 290_000,
+                "status": Status.FREE,
+                "changes": 1,
+            },
+        ]
+        since = datetime.datetime(2026, 1, 15)
+        pipeline = history.apartment_trend_pipeline(apartment_id, "day", since)
+        periods = [point["period"] for point in collection.aggregate(pipeline)]
+        assert periods == ["2026-01-20", "2026-02-01"]
+
+    def test_group_trend(self, collection: Any, yit_apartment: Apartment) -> None:
+        other = yit_apartment.copy(deep=True, update={"id": ObjectId()})
+        collection.insert_many(
+            [
+                make_point(yit_apartment, "2026-01-01", 300_000),
+                make_point(yit_apartment, "2026-01-02", 240_000),
+                make_point(other, "2026-01-03", 120_000),
+                make_point(other, "2026-01-04", 180_000, project="other"),
+            ]
+        )
+        pipeline = history.group_trend_pipeline("project", "month")
+        assert list(collection.aggregate(pipeline)) == [
+            {
+                "group": "foo",
+                "period": "2026-01",
+                "price": 180_000,  # 240k and 120k, each apartment once
+                "price_min": 120_000,
+                "price_max": 240_000,
+                "price_per_m2": 3_000,
+                "apartments": 2,
+            },
+            {
+                "group": "other",
+                "period": "2026-01",
+                "price": 180_000,
+                "price_min": 180_000,
+                "price_max": 180_000,
+                "price_per_m2": 3_000,
+                "apartments": 1,
+            },
+        ]
+        pipeline = history.group_trend_pipeline("city", "day", "bratislava")
+        assert [p["period"] for p in collection.aggregate(pipeline)] == [
+            "2026-01-01",
+            "2026-01-02",
+            "2026-01-03",
+            "2026-01-04",
+        ]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from shared.metrics import REGISTRY, Registry, timed
+
+
+@pytest.fixture
+def registry() -> Registry:
+    return Registry()
+
+
+class TestRegistry:
+    def test_counter(self, registry: Registry) -> None:
+        counter = registry.counter("items_total", "Items")
+        counter.inc(outcome="ok")
+        counter.inc(2, outcome="ok")
+        counter.inc(outcome="dropped")
+        assert registry.counter("items_total") is counter
+        assert counter.values == {
+            (("outcome", "ok"),): 3,
+            (("outcome", "dropped"),): 1,
+        }
+
+    def test_gauge(self, registry: Registry) -> None:
+        gauge = registry.gauge("in_use", "Connections")
+        gauge.inc(2, address="a")
+        gauge.dec(address="a")
+        gauge.set(5, address="b")
+        assert registry.gauge("in_use") is gauge
+        assert gauge.values == {(("address", "a"),): 1, (("address", "b"),): 5}
+        assert "# TYPE in_use gauge\n" in registry.render()
+
+    def test_render(self, registry: Registry) -> None:
+        registry.counter("items_total", "Items").inc(page='a "quoted"\nname')
+        registry.histogram("seconds", buckets=(0.1, 1)).observe(0.5)
+        assert registry.render() == (
+            "# HELP items_total Items\n"
+            "# TYPE items_total counter\n"
+            'items_total{page="a \\"quoted\\"\\nname"} 1\n'
+            "# TYPE seconds histogram\n"
+            'seconds_bucket{le="0.1"} 0\n'
+            'seconds_bucket{le="1"} 1\n'
+            'seconds_bucket{le="+Inf"} 1\n'
+            "seconds_sum 0.5\n"
+            "seconds_count 1\n"
+        )
+
+    def test_render_large_values(self, registry: Registry) -> None:
+        registry.counter("bytes_total").inc(1_234_567)
+        registry.gauge("ratio").set(1_234_567.25)
+        registry.gauge("limit").set(float("inf"))
+        lines = registry.render().splitlines()
+        assert "bytes_total 1234567" in lines
+        assert "ratio 1234567.25" in lines
+        assert "limit +Inf" in lines
+
+    def test_histogram_quantile(self, registry: Registry) -> None:
+        histogram = registry.histogram("seconds", buckets=(1, 2, 4))
+        assert histogram.quantile(0.5) is None
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value, stage="a")
+        assert histogram.quantile(0.5, stage="a") == pytest.approx(1.75)
+        assert histogram.quantile(0.2, stage="a") == pytest.approx(1)
+        # values above the last bound are reported as the last bound
+        assert histogram.quantile(1, stage="a") == 4
+
+
+class TestTimed:
+    def test_sync(self) -> None:
+        @timed("test_sync_seconds", stage="sync")
+        def function(x: int) -> int:
+            return x + 1
+
+        assert function(1) == 2
+        _, _, count = REGISTRY.histogram("test_sync_seconds").values[
+            (("stage", "sync"),)
+        ]
+        assert count == 1
+
+    def test_async_and_exception(self) -> None:
+        @timed("test_async_seconds")
+        async def function() -> None:
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            asyncio.run(function())
+        _, _, count = REGISTRY.histogram("test_async_seconds").values[()]
+        assert count == 1
@@ -1,10 +1,24 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import countryinfo
+import geojson
 import pytest
 from pydantic import ValidationError
 from pytest_lazyfixture import lazy_fixture
 
-from shared.models import Apartment
+from shared.models import (
+    SUMMARY_PATHS,
+    Apartment,
+    ApartmentSummary,
+    Location,
+    country_codes,
+)
+
+if TYPE_CHECKING:
+    from typing import Any
 
 
 @pytest.mark.parametrize("apartment", (lazy_fixture("yit_apartment"),))
@@ -28,3 +42,53 @@ class TestApartment:
 
         with pytest.raises(ValidationError, match="history"):
             Apartment.parse_raw(apartment.json())
+
+
+class TestApartmentSummary:
+    def test_from_document(self, yit_apartment: Apartment) -> None:
+        yit_apartment.location = Location(
+            country_code="sk", gps=geojson.Point((17.1, 48.1)), address=None
+        )
+        document = yit_apartment.dict(by_alias=True)
+        summary = ApartmentSummary.from_document(document)
+        assert summary == ApartmentSummary(
+            id=yit_apartment.id,  # type: ignore[arg-type]
+            url=yit_apartment.url,
+            offer_type=yit_apartment.offer_type,
+            status=yit_apartment.status,
+            price=300_000,
+            currency="EUR",
+            size=60,
+            rooms=3,
+            floor=3,
+            gps=[17.1, 48.1],
+        )
+        assert not hasattr(summary, "__dict__")
+
+    def test_projected_without_location(self, yit_apartment: Apartment) -> None:
+        # projection of "location.gps.coordinates" leaves what exists of the path
+        document: dict[str, Any] = yit_apartment.dict(by_alias=True)
+        document["location"] = {}
+        assert ApartmentSummary.from_document(document).gps is None
+        assert {path.split(".")[0] for path in SUMMARY_PATHS} <= set(document)
+
+
+class TestLocation:
+    @pytest.mark.parametrize(
+        "country_code", ("sk", "SK", "Slovakia", "Slovenská republika", "cz", "US")
+    )
+    def test_valid_country_code(self, country_code: str) -> None:
+        location = Location(country_code=country_code, gps=None, address=None)
+        assert location.country_code == country_code
+
+    @pytest.mark.parametrize("country_code", ("xx", "svk", "Slovakistan"))
+    def test_invalid_country_code(self, country_code: str) -> None:
+        with pytest.raises(ValidationError, match="Not existing country code"):
+            Location(country_code=country_code, gps=None, address=None)
+
+    def test_country_codes_are_loaded_once(self) -> None:
+        country_codes.cache_clear()
+        with patch("countryinfo.CountryInfo", wraps=countryinfo.CountryInfo) as info:
+            for _ in range(10):
+                Location(country_code="sk", gps=None, address=None)
+        info.assert_called_once()
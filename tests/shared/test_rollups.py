@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from beanie import PydanticObjectId, init_beanie
+from beanie.odm.utils.dump import get_dict
+from mongomock_motor import AsyncMongoMockClient
+
+from shared import rollups
+from shared.models import Location, Status
+from shared.odm import ApartmentBeanie
+
+if TYPE_CHECKING:
+    from shared.models import Apartment
+
+
+@pytest.mark.asyncio
+async def test_refresh(yit_apartment: Apartment) -> None:
+    database = AsyncMongoMockClient()["rollups"]
+    await init_beanie(database, document_models=[ApartmentBeanie])  # type: ignore[arg-type]
+    apartments, stats = ApartmentBeanie.get_motor_collection(), database["stats"]
+    assert (await rollups.refresh(apartments, stats))["overall"] is None
+
+    documents = []
+    for i, (rooms, price) in enumerate([(3, 300_000), (3, 240_000), (1, 120_000)]):
+        apartment = yit_apartment.copy(
+            deep=True,
+            update={"id": PydanticObjectId(), "url": f"{yit_apartment.url}/{i}"},
+        )
+        apartment.rooms.amount, apartment.price.price = rooms, price
+        documents.append(apartment)
+    documents[2].status = Status.SOLD
+    documents[2].location = Location(country_code="sk", gps=None, address=None)
+    await apartments.insert_many(
+        [get_dict(ApartmentBeanie.parse_obj(d), to_db=True) for d in documents]
+    )
+
+    await rollups.refresh(apartments, stats)
+    document = await stats.find_one({"_id": rollups.ROLLUP_ID})
+    assert document is not None
+    assert document["overall"] == {
+        "apartments": 3,
+        "price_avg": 220_000,
+        "price_min": 120_000,
+        "price_max": 300_000,
+        "size_avg": 60,
+        "price_per_m2_avg": pytest.approx(3_666.67),
+    }
+    by_rooms = [
+        (x["rooms"], x["apartments"], x["price_avg"]) for x in document["by_rooms"]
+    ]
+    assert by_rooms == [(1, 1, 120_000), (3, 2, 270_000)]
+    assert document["by_status"] == [
+        {"status": "FREE", "apartments": 2},
+        {"status": "SOLD", "apartments": 1},
+    ]
+    assert [x["country_code"] for x in document["by_country"]] == [None, "sk"]
+    assert await stats.count_documents({}) == 1  # replaced, not appended
+
+
+@pytest.mark.asyncio
+async def test_generation() -> None:
+    stats = AsyncMongoMockClient()["rollups"]["stats"]
+    assert await rollups.generation(stats) == 0
+    assert await rollups.bump_generation(stats) == 1
+    assert await rollups.bump_generation(stats) == 2
+    assert await rollups.generation(stats) == 2
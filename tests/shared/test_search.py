@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from shared import search
+
+
+def test_tokenize() -> None:
+    assert search.tokenize("Pekný 3-izbový BYT, Žilina") == [
+        "pekny",
+        "3",
+        "izbovy",
+        "byt",
+        "zilina",
+    ]
+
+
+def test_text() -> None:
+    document = {"description": "Byt", "location": {"address": "Bratislava"}}
+    assert search.text(document) == "Byt Bratislava"
+    assert search.text({"description": None, "location": None}) == ""
+
+
+def test_text_query() -> None:
+    query = search.TextQuery('byt -Dom "s Balkónom" -"bez výťahu"')
+    assert query.terms == {"byt", "s", "balkonom"}
+    assert query.excluded_terms == {"dom"}
+    assert query.phrases == ["s balkonom"]
+    assert query.excluded_phrases == ["bez vytahu"]
+    assert query.matches("byt s balkonom")
+    assert not query.matches("byt s balkonom bez vytahu")
+    assert not query.matches("byt balkonom")
+
+
+class TestInvertedIndex:
+    def test_search(self) -> None:
+        index = search.InvertedIndex()
+        index.add(1, "Pekný 3-izbový byt s balkónom")
+        index.add(2, "Byt v novostavbe, byt s terasou")
+        index.add(3, "Rodinný dom")
+
+        assert [id for id, _ in index.search("BYT")] == [2, 1]  # byt twice in 2
+        assert [id for id, _ in index.search("byt dom")] == [2, 3, 1]
+        assert [id for id, _ in index.search("byt -terasou")] == [1]
+        assert [id for id, _ in index.search('"s balkonom"')] == [1]
+        assert index.search("garaz") == []
+
+    def test_rare_terms_score_more(self) -> None:
+        index = search.InvertedIndex()
+        for id in range(5):
+            index.add(id, "byt")
+        index.add(5, "byt garaz")
+        [(best, best_score), *_, (_, worst_score)] = index.search("byt garaz")
+        assert best == 5
+        assert best_score > 2 * worst_score
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from shared import writes
+
+
+@pytest.mark.asyncio
+async def test_dedupe() -> None:
+    database = AsyncMongoMockClient()["writes"]
+    apartments, history = database["apartments"], database["history"]
+    url = "https://www.yit.sk/en/flats-for-sale/bratislava/foo/bar/1"
+    first, second, third, other = (ObjectId() for _ in range(4))
+    await apartments.insert_many(
+        [
+            {"_id": first, "url": f"{url}?b=2&a=1"},
+            {"_id": second, "url": url},
+            {"_id": third, "url": f"{url}?a=1&b=2"},
+            {"_id": other, "url": f"{url}0"},
+        ]
+    )
+    await history.insert_many([{"meta": {"apartment": id_}} for id_ in (first, third)])
+
+    assert await writes.dedupe(apartments, history) == 1
+    documents = await apartments.find().sort("_id").to_list(None)
+    assert documents == [
+        {"_id": first, "url": f"{url}?a=1&b=2"},  # the oldest one is kept
+        {"_id": second, "url": url},
+        {"_id": other, "url": f"{url}0"},
+    ]
+    points = await history.find().to_list(None)
+    assert {point["meta"]["apartment"] for point in points} == {first}
+
+    assert await writes.dedupe(apartments, history) == 0